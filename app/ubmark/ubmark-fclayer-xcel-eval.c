@@ -0,0 +1,47 @@
+//========================================================================
+// ubmark-fclayer-xcel-eval
+//========================================================================
+// Same layer shape as ubmark-fclayer-eval (8 input vectors, 32 input
+// channels, 32 output channels), but the reference outputs use the
+// arithmetic of the accelerator datapath (generated with
+// sim/mlp_xcel/mlp-dat-gen --arith fc-datapath).
+
+#include "ece6745.h"
+#include "ubmark-fclayer-xcel.h"
+#include "ubmark-fclayer-xcel.dat"
+
+int main( void )
+{
+  // Run the evaluation, the whole layer is one accelerator job
+
+  int* output = ece6745_malloc( eval_size * (int)sizeof(int) );
+  ece6745_stats_on();
+  ubmark_fclayer_xcel( eval_input, eval_weight, eval_bias, output, 8, 32, 32 );
+  ece6745_stats_off();
+
+  // Verify the results
+
+  for ( int i = 0; i < eval_size; i++ ) {
+    if ( output[i] != eval_ref[i] ) {
+      ece6745_wprintf( L"\n FAILED: output[%d] != eval_ref[%d] (%d != %d)\n\n",
+                       i, i, output[i], eval_ref[i] );
+      ece6745_exit(1);
+    }
+  }
+
+  ece6745_free( output );
+
+  // Check for no memory leaks
+
+  if ( ece6745_get_heap_usage() != 0 ) {
+    ece6745_wprintf( L"\n FAILED: memory leak of %d bytes!\n\n",
+                     ece6745_get_heap_usage() );
+    ece6745_exit(1);
+  }
+
+  // Otherwise we passed
+
+  ece6745_wprintf( L"\n **PASSED** \n\n" );
+
+  return 0;
+}
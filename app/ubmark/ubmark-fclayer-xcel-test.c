@@ -0,0 +1,124 @@
+//========================================================================
+// Unit tests for ubmark fclayer xcel
+//========================================================================
+
+#include "ece6745.h"
+#include "ubmark-fclayer-xcel.h"
+
+//------------------------------------------------------------------------
+// ref_fclayer
+//------------------------------------------------------------------------
+// Element by element reference for the accelerator datapath
+
+void ref_fclayer( int* input, int* weights, int* bias, int* output,
+                  int batch, int channel_in, int channel_out )
+{
+  for ( int i = 0; i < batch; i++ ) {
+    for ( int j = 0; j < channel_out; j++ ) {
+      int accum = bias[j];
+      for ( int k = 0; k < channel_in; k++ )
+        accum += ( input[i*channel_in + k] * weights[k*channel_out + j] ) & 0xfff;
+      accum = accum & 0xfff;
+      output[i*channel_out + j] = ( accum & 0x800 ) ? accum - 0x1000 : accum;
+    }
+  }
+}
+
+//------------------------------------------------------------------------
+// test_case_1_small
+//------------------------------------------------------------------------
+// A layer which fits in the array of the RTL model (3x2) with products
+// which do not wrap around
+
+void test_case_1_small()
+{
+  ECE6745_CHECK( L"test_case_1_small" );
+
+  int input[]   = { 1, 2, 3, 4, 5, 6 };
+  int weights[] = { 10, 20, 30, 40, 50, 60 };
+  int bias[]    = { 7, -8 };
+  int output[4];
+
+  ubmark_fclayer_xcel( input, weights, bias, output, 2, 3, 2 );
+
+  ECE6745_CHECK_INT_EQ( output[0],  7 + 1*10 + 2*30 + 3*50 );
+  ECE6745_CHECK_INT_EQ( output[1], -8 + 1*20 + 2*40 + 3*60 );
+  ECE6745_CHECK_INT_EQ( output[2],  7 + 4*10 + 5*30 + 6*50 );
+  ECE6745_CHECK_INT_EQ( output[3], -8 + 4*20 + 5*40 + 6*60 );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_2_tiled
+//------------------------------------------------------------------------
+// A layer larger than the array in both dimensions, so it runs one
+// weight tile at a time, with products which wrap around
+
+void test_case_2_tiled()
+{
+  ECE6745_CHECK( L"test_case_2_tiled" );
+
+  int input[3*7];
+  int weights[7*5];
+  int bias[5];
+  int output[3*5];
+  int output_ref[3*5];
+
+  for ( int i = 0; i < 3*7; i++ )
+    input[i] = ( i*37 + 11 ) % 128;
+  for ( int i = 0; i < 7*5; i++ )
+    weights[i] = ( i*53 + 5 ) % 256 - 128;
+  for ( int i = 0; i < 5; i++ )
+    bias[i] = i*29 - 64;
+
+  ubmark_fclayer_xcel( input, weights, bias, output, 3, 7, 5 );
+  ref_fclayer( input, weights, bias, output_ref, 3, 7, 5 );
+
+  for ( int i = 0; i < 3*5; i++ )
+    ECE6745_CHECK_INT_EQ( output[i], output_ref[i] );
+}
+
+//------------------------------------------------------------------------
+// test_case_3_multiple_jobs
+//------------------------------------------------------------------------
+// One input vector per job with the same weights
+
+void test_case_3_multiple_jobs()
+{
+  ECE6745_CHECK( L"test_case_3_multiple_jobs" );
+
+  int input[4*5];
+  int weights[5*3];
+  int bias[]  = { 100, -100, 2047 };
+  int output[4*3];
+  int output_ref[4*3];
+
+  for ( int i = 0; i < 4*5; i++ )
+    input[i] = ( i*71 + 3 ) % 256 - 128;
+  for ( int i = 0; i < 5*3; i++ )
+    weights[i] = ( i*19 + 7 ) % 128;
+
+  for ( int b = 0; b < 4; b++ )
+    ubmark_fclayer_xcel( &input[b*5], weights, bias, &output[b*3], 1, 5, 3 );
+  ref_fclayer( input, weights, bias, output_ref, 4, 5, 3 );
+
+  for ( int i = 0; i < 4*3; i++ )
+    ECE6745_CHECK_INT_EQ( output[i], output_ref[i] );
+}
+
+//------------------------------------------------------------------------
+// main
+//------------------------------------------------------------------------
+
+int main( int argc, char** argv )
+{
+  __n = ( argc == 1 ) ? 0 : ece6745_atoi( argv[1] );
+
+  if ( (__n <= 0) || (__n == 1) ) test_case_1_small();
+  if ( (__n <= 0) || (__n == 2) ) test_case_2_tiled();
+  if ( (__n <= 0) || (__n == 3) ) test_case_3_multiple_jobs();
+
+  ece6745_wprintf( L"\n\n" );
+  return ece6745_check_status;
+}
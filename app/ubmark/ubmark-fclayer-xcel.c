@@ -0,0 +1,75 @@
+//========================================================================
+// ubmark-fclayer-xcel
+//========================================================================
+// The FC layer accelerator runs a whole layer (one batch of input
+// vectors) per job.
+
+#include "ece6745.h"
+#include "ubmark-fclayer-xcel.h"
+
+//------------------------------------------------------------------------
+// ubmark_fclayer_xcel
+//------------------------------------------------------------------------
+
+#ifdef _RISCV
+void ubmark_fclayer_xcel( int* input, int* weights, int* bias, int* output,
+                          int batch, int channel_in, int channel_out )
+{
+  if ( batch <= 0 )
+    return;
+
+  // We always write all of the registers since they keep their values
+  // from the previous job.
+
+  __asm__ (
+    "csrw 0x7e1, %[weights]    ;\n"
+    "csrw 0x7e2, %[bias]       ;\n"
+    "csrw 0x7e3, %[input]      ;\n"
+    "csrw 0x7e4, %[output]     ;\n"
+    "csrw 0x7e5, %[channel_in] ;\n"
+    "csrw 0x7e6, %[channel_out];\n"
+    "csrw 0x7e7, %[batch]      ;\n"
+    "csrw 0x7e0, x0            ;\n"
+    "csrr x0,    0x7e0         ;\n"
+
+    // Outputs from the inline assembly block
+
+    :
+
+    // Inputs to the inline assembly block
+
+    : [weights]     "r"(weights),
+      [bias]        "r"(bias),
+      [input]       "r"(input),
+      [output]      "r"(output),
+      [channel_in]  "r"(channel_in),
+      [channel_out] "r"(channel_out),
+      [batch]       "r"(batch)
+
+    // Tell the compiler this accelerator read/writes memory
+
+    : "memory"
+  );
+}
+
+#else
+
+// Software version of the accelerator datapath
+
+void ubmark_fclayer_xcel( int* input, int* weights, int* bias, int* output,
+                          int batch, int channel_in, int channel_out )
+{
+  for ( int i = 0; i < batch; i++ ) {
+    for ( int j = 0; j < channel_out; j++ ) {
+      int accum = bias[j] & 0xfff;
+      for ( int k = 0; k < channel_in; k++ ) {
+        int product = ( input[i*channel_in + k] & 0xfff )
+                    * ( weights[k*channel_out + j] & 0xfff );
+        accum = ( accum + ( product & 0xfff ) ) & 0xfff;
+      }
+      output[i*channel_out + j] = ( accum ^ 0x800 ) - 0x800;
+    }
+  }
+}
+
+#endif
@@ -0,0 +1,20 @@
+//========================================================================
+// ubmark-fclayer-xcel
+//========================================================================
+// This microbenchmark runs a fully connected layer on the FC layer
+// accelerator (mlp-fl/mlp-rtl in pmx-sim), which fetches the layer from
+// memory and writes the outputs back itself.
+
+#ifndef UBMARK_FCLAYER_XCEL_H
+#define UBMARK_FCLAYER_XCEL_H
+
+// Same arguments as ubmark_fclayer_fixed, but the layer computes with
+// the arithmetic of the accelerator datapath: only the low 12 bits of
+// each input, weight and bias are used, only the low 12 bits of each
+// product are kept, the sums wrap around at 12 bits, and each output is
+// the 12-bit sum sign-extended to an int.
+
+void ubmark_fclayer_xcel( int* input, int* weights, int* bias, int* output,
+                          int batch, int channel_in, int channel_out );
+
+#endif /* UBMARK_FCLAYER_XCEL_H */
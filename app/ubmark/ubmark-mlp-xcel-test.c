@@ -0,0 +1,114 @@
+//========================================================================
+// Unit tests for ubmark mlp xcel
+//========================================================================
+
+#include "ece6745.h"
+#include "ubmark-mlp.h"
+#include "ubmark-mlp-xcel.h"
+
+//------------------------------------------------------------------------
+// Network
+//------------------------------------------------------------------------
+// Small network with 4 inputs, hidden layers of 3 and 2, and 2 outputs
+// (Q4.7 values). Every input vector goes through both the accelerator
+// and mnist_inference, which have to agree exactly.
+
+int fc1_weights[] = { 13, 26, 38, -13, 13, 26, 38, 13, 26, 26, 38, 13 };
+int fc1_bias[]    = { 13, 13, 13 };
+int fc2_weights[] = { 13, 26, 38, 13, 26, 38 };
+int fc2_bias[]    = { 13, 26 };
+int fc3_weights[] = { 13, -26, 38, 13 };
+int fc3_bias[]    = { 13, -13 };
+
+void run_ref( int* input, int* output, int batch_size )
+{
+  mnist_inference( input, fc1_weights, fc1_bias, fc2_weights, fc2_bias,
+                   fc3_weights, fc3_bias, output, batch_size, 4, 3, 2, 2 );
+}
+
+void run_xcel( int* input, int* output, int batch_size, int mode )
+{
+  mnist_inference_xcel_mode( input, fc1_weights, fc1_bias, fc2_weights,
+                             fc2_bias, fc3_weights, fc3_bias, output,
+                             batch_size, 4, 3, 2, 2, mode );
+}
+
+//------------------------------------------------------------------------
+// test_case_1_small
+//------------------------------------------------------------------------
+
+void test_case_1_small()
+{
+  ECE6745_CHECK( L"test_case_1_small" );
+
+  int input[] = { 64, -38, 90, 13 };
+  int output[2];
+  int output_ref[2];
+
+  run_xcel( input, output, 1, 0 );
+  run_ref( input, output_ref, 1 );
+
+  for ( int i = 0; i < 2; i++ )
+    ECE6745_CHECK_INT_EQ( output[i], output_ref[i] );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_2_negative
+//------------------------------------------------------------------------
+// Inputs which drive the hidden layers negative, so ReLU matters
+
+void test_case_2_negative()
+{
+  ECE6745_CHECK( L"test_case_2_negative" );
+
+  int input[] = { -512, -256, -900, -1000 };
+  int output[2];
+  int output_ref[2];
+
+  run_xcel( input, output, 1, 0 );
+  run_ref( input, output_ref, 1 );
+
+  for ( int i = 0; i < 2; i++ )
+    ECE6745_CHECK_INT_EQ( output[i], output_ref[i] );
+}
+
+//------------------------------------------------------------------------
+// test_case_3_argmax
+//------------------------------------------------------------------------
+
+void test_case_3_argmax()
+{
+  ECE6745_CHECK( L"test_case_3_argmax" );
+
+  int input[] = { 64, -38, 90, 13, -512, -256, -900, -1000 };
+  int classes[2];
+  int output_ref[4];
+
+  run_xcel( input, classes, 2, MLP_XCEL_ARGMAX );
+  run_ref( input, output_ref, 2 );
+
+  // With two outputs the class is 1 only if the second one is larger
+
+  for ( int b = 0; b < 2; b++ )
+    ECE6745_CHECK_INT_EQ( classes[b], output_ref[2*b+1] > output_ref[2*b] );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// main
+//------------------------------------------------------------------------
+
+int main( int argc, char** argv )
+{
+  __n = ( argc == 1 ) ? 0 : ece6745_atoi( argv[1] );
+
+  if ( (__n <= 0) || (__n == 1) ) test_case_1_small();
+  if ( (__n <= 0) || (__n == 2) ) test_case_2_negative();
+  if ( (__n <= 0) || (__n == 3) ) test_case_3_argmax();
+
+  ece6745_wprintf( L"\n\n" );
+  return ece6745_check_status;
+}
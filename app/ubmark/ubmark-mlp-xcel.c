@@ -0,0 +1,159 @@
+//========================================================================
+// ubmark-mlp-xcel
+//========================================================================
+// The fused MLP accelerator runs all three layers (with ReLU between
+// them) in one job, so the hidden layer activations never go through
+// memory. The accelerator computes exactly what mnist_inference
+// computes.
+
+#include "ece6745.h"
+#include "ubmark-mlp.h"
+#include "ubmark-mlp-xcel.h"
+
+//------------------------------------------------------------------------
+// mnist_inference_xcel_mode
+//------------------------------------------------------------------------
+
+#ifdef _RISCV
+void mnist_inference_xcel_mode(
+  int* input,
+  int* fc1_weights,
+  int* fc1_bias,
+  int* fc2_weights,
+  int* fc2_bias,
+  int* fc3_weights,
+  int* fc3_bias,
+  int* output,
+  int batch_size,
+  int input_size,
+  int hidden1_size,
+  int hidden2_size,
+  int output_size,
+  int mode
+) {
+  if ( batch_size <= 0 )
+    return;
+
+  // We always write all of the registers since they keep their values
+  // from the previous job.
+
+  __asm__ (
+    "csrw 0x7e1, %[input]       ;\n"
+    "csrw 0x7e2, %[fc1_weights] ;\n"
+    "csrw 0x7e3, %[fc1_bias]    ;\n"
+    "csrw 0x7e4, %[fc2_weights] ;\n"
+    "csrw 0x7e5, %[fc2_bias]    ;\n"
+    "csrw 0x7e6, %[fc3_weights] ;\n"
+    "csrw 0x7e7, %[fc3_bias]    ;\n"
+    "csrw 0x7e8, %[output]      ;\n"
+    "csrw 0x7e9, %[batch_size]  ;\n"
+    "csrw 0x7ea, %[input_size]  ;\n"
+    "csrw 0x7eb, %[hidden1_size];\n"
+    "csrw 0x7ec, %[hidden2_size];\n"
+    "csrw 0x7ed, %[output_size] ;\n"
+    "csrw 0x7ee, %[mode]        ;\n"
+    "csrw 0x7e0, x0             ;\n"
+    "csrr x0,    0x7e0          ;\n"
+
+    // Outputs from the inline assembly block
+
+    :
+
+    // Inputs to the inline assembly block
+
+    : [input]        "r"(input),
+      [fc1_weights]  "r"(fc1_weights),
+      [fc1_bias]     "r"(fc1_bias),
+      [fc2_weights]  "r"(fc2_weights),
+      [fc2_bias]     "r"(fc2_bias),
+      [fc3_weights]  "r"(fc3_weights),
+      [fc3_bias]     "r"(fc3_bias),
+      [output]       "r"(output),
+      [batch_size]   "r"(batch_size),
+      [input_size]   "r"(input_size),
+      [hidden1_size] "r"(hidden1_size),
+      [hidden2_size] "r"(hidden2_size),
+      [output_size]  "r"(output_size),
+      [mode]         "r"(mode)
+
+    // Tell the compiler this accelerator read/writes memory
+
+    : "memory"
+  );
+}
+
+#else
+
+// Software version of the accelerator: the inference in software, then
+// argmax over the outputs of each input vector if requested
+
+void mnist_inference_xcel_mode(
+  int* input,
+  int* fc1_weights,
+  int* fc1_bias,
+  int* fc2_weights,
+  int* fc2_bias,
+  int* fc3_weights,
+  int* fc3_bias,
+  int* output,
+  int batch_size,
+  int input_size,
+  int hidden1_size,
+  int hidden2_size,
+  int output_size,
+  int mode
+) {
+  if ( batch_size <= 0 )
+    return;
+
+  if ( !(mode & MLP_XCEL_ARGMAX) ) {
+    mnist_inference( input, fc1_weights, fc1_bias, fc2_weights, fc2_bias,
+                     fc3_weights, fc3_bias, output, batch_size, input_size,
+                     hidden1_size, hidden2_size, output_size );
+    return;
+  }
+
+  int* logits = ece6745_malloc( batch_size * output_size * (int)sizeof(int) );
+
+  mnist_inference( input, fc1_weights, fc1_bias, fc2_weights, fc2_bias,
+                   fc3_weights, fc3_bias, logits, batch_size, input_size,
+                   hidden1_size, hidden2_size, output_size );
+
+  for ( int b = 0; b < batch_size; b++ ) {
+    int best = 0;
+    for ( int o = 1; o < output_size; o++ ) {
+      if ( logits[b*output_size + o] > logits[b*output_size + best] )
+        best = o;
+    }
+    output[b] = best;
+  }
+
+  ece6745_free( logits );
+}
+
+#endif
+
+//------------------------------------------------------------------------
+// mnist_inference_xcel
+//------------------------------------------------------------------------
+
+void mnist_inference_xcel(
+  int* input,
+  int* fc1_weights,
+  int* fc1_bias,
+  int* fc2_weights,
+  int* fc2_bias,
+  int* fc3_weights,
+  int* fc3_bias,
+  int* output,
+  int batch_size,
+  int input_size,
+  int hidden1_size,
+  int hidden2_size,
+  int output_size
+) {
+  mnist_inference_xcel_mode( input, fc1_weights, fc1_bias, fc2_weights,
+                             fc2_bias, fc3_weights, fc3_bias, output,
+                             batch_size, input_size, hidden1_size,
+                             hidden2_size, output_size, 0 );
+}
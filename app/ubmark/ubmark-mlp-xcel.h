@@ -0,0 +1,53 @@
+//========================================================================
+// ubmark-mlp-xcel
+//========================================================================
+// This microbenchmark runs a whole three layer MLP inference (see
+// ubmark-mlp) as a single accelerator job.
+
+#ifndef UBMARK_MLP_XCEL_H
+#define UBMARK_MLP_XCEL_H
+
+// Modes for mnist_inference_xcel_mode (see MLPXcel_FL for details)
+
+#define MLP_XCEL_ARGMAX 0x1 // write the index of the largest output
+
+// Same arguments and results as mnist_inference
+
+void mnist_inference_xcel(
+  int* input,
+  int* fc1_weights,
+  int* fc1_bias,
+  int* fc2_weights,
+  int* fc2_bias,
+  int* fc3_weights,
+  int* fc3_bias,
+  int* output,
+  int batch_size,
+  int input_size,
+  int hidden1_size,
+  int hidden2_size,
+  int output_size
+);
+
+// Run the inference in the given mode. With MLP_XCEL_ARGMAX the output
+// buffer only needs batch_size elements: the index of the largest
+// output (the lowest index on ties) of each input vector.
+
+void mnist_inference_xcel_mode(
+  int* input,
+  int* fc1_weights,
+  int* fc1_bias,
+  int* fc2_weights,
+  int* fc2_bias,
+  int* fc3_weights,
+  int* fc3_bias,
+  int* output,
+  int batch_size,
+  int input_size,
+  int hidden1_size,
+  int hidden2_size,
+  int output_size,
+  int mode
+);
+
+#endif /* UBMARK_MLP_XCEL_H */
@@ -1,6 +1,12 @@
 //========================================================================
 // Unit tests for ubmark sort
 //========================================================================
+// The tests pass with any sort accelerator, but the accelerator is only
+// used for everything (larger arrays, modes, top-k) if it implements the
+// extended protocol, e.g.:
+//
+//  % ../../sim/pmx/pmx-sim --xcel-impl sort-fl ./ubmark-sort-xcel-test
+//
 
 #include "ece6745.h"
 #include "ubmark-sort-xcel.h"
@@ -361,6 +367,276 @@ void test_case_13_sort_eval_dataset()
   ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
 }
 
+//------------------------------------------------------------------------
+// test_case_14_sort_random_1000
+//------------------------------------------------------------------------
+// Larger than the on-chip buffer, so the array is sorted in runs which
+// are then merged.
+
+void test_case_14_sort_random_1000()
+{
+  ECE6745_CHECK( L"test_case_14_sort_random_1000" );
+
+  ece6745_srand(0x0000f00d);
+
+  int  size = 1000;
+  int* a = ece6745_malloc( size * (int) sizeof(int) );
+
+  for ( int i = 0; i < size; i++ )
+    a[i] = 0x0000ffff & ece6745_rand();
+
+  ubmark_sort_xcel( a, size );
+
+  ECE6745_CHECK_TRUE( is_sorted( a, size ) );
+
+  ece6745_free( a );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_15_sort_signed_descending
+//------------------------------------------------------------------------
+
+void test_case_15_sort_signed_descending()
+{
+  ECE6745_CHECK( L"test_case_15_sort_signed_descending" );
+
+  int a[]     = { 4, -3, 6, -5, 0 };
+  int a_ref[] = { -5, -3, 0, 4, 6 };
+
+  ubmark_sort_xcel_mode( a, 0, 5, SORT_XCEL_SIGNED, 0 );
+
+  for ( int i = 0; i < 5; i++ )
+    ECE6745_CHECK_INT_EQ( a[i] , a_ref[i] );
+
+  int b[]     = { 4, -3, 6, -5, 0 };
+  int b_ref[] = { 6, 4, 0, -3, -5 };
+
+  ubmark_sort_xcel_mode( b, 0, 5, SORT_XCEL_SIGNED | SORT_XCEL_DESCENDING, 0 );
+
+  for ( int i = 0; i < 5; i++ )
+    ECE6745_CHECK_INT_EQ( b[i] , b_ref[i] );
+
+  // Unsigned order puts negative numbers last
+
+  int c[]     = { 4, -3, 6, -5, 0 };
+  int c_ref[] = { 0, 4, 6, -5, -3 };
+
+  ubmark_sort_xcel_mode( c, 0, 5, 0, 0 );
+
+  for ( int i = 0; i < 5; i++ )
+    ECE6745_CHECK_INT_EQ( c[i] , c_ref[i] );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_16_sort_payload
+//------------------------------------------------------------------------
+
+void test_case_16_sort_payload()
+{
+  ECE6745_CHECK( L"test_case_16_sort_payload" );
+
+  int a[]     = { 30, 10, 20, 10 };
+  int v[]     = { 0xa, 0xb, 0xc, 0xd };
+  int a_ref[] = { 10, 10, 20, 30 };
+  int v_ref[] = { 0xb, 0xd, 0xc, 0xa };
+
+  ubmark_sort_xcel_mode( a, v, 4, SORT_XCEL_PAYLOAD, 0 );
+
+  for ( int i = 0; i < 4; i++ ) {
+    ECE6745_CHECK_INT_EQ( a[i] , a_ref[i] );
+    ECE6745_CHECK_INT_EQ( v[i] , v_ref[i] );
+  }
+
+  // Argsort ignores the payload and writes the permutation instead
+
+  int b[]     = { 30, 10, 20, 10 };
+  int p[4];
+  int p_ref[] = { 1, 3, 2, 0 };
+
+  ubmark_sort_xcel_mode( b, p, 4, SORT_XCEL_ARGSORT, 0 );
+
+  for ( int i = 0; i < 4; i++ )
+    ECE6745_CHECK_INT_EQ( p[i] , p_ref[i] );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_17_sort_top_k
+//------------------------------------------------------------------------
+
+void test_case_17_sort_top_k()
+{
+  ECE6745_CHECK( L"test_case_17_sort_top_k" );
+
+  ece6745_srand(0x0000d00d);
+
+  int  size = 300;
+  int  k    = 10;
+  int* a    = ece6745_malloc( size * (int) sizeof(int) );
+  int* b    = ece6745_malloc( size * (int) sizeof(int) );
+  int* c    = ece6745_malloc( size * (int) sizeof(int) );
+  int* d    = ece6745_malloc( size * (int) sizeof(int) );
+  int* v    = ece6745_malloc( size * (int) sizeof(int) );
+
+  for ( int i = 0; i < size; i++ ) {
+    a[i] = 0x0000ffff & ece6745_rand();
+    b[i] = a[i];
+    c[i] = a[i];
+    d[i] = a[i];
+  }
+
+  ubmark_sort_xcel_mode( a, 0, size, 0, k );
+  ubmark_sort_xcel_mode( c, v, size, SORT_XCEL_ARGSORT, k );
+  ubmark_sort_xcel( b, size );
+
+  // The first k elements are the k smallest in order, and with argsort
+  // the payload has the original index of each of them
+
+  for ( int i = 0; i < k; i++ ) {
+    ECE6745_CHECK_INT_EQ( a[i], b[i] );
+    ECE6745_CHECK_INT_EQ( c[i], b[i] );
+    ECE6745_CHECK_INT_EQ( d[v[i]], b[i] );
+  }
+
+  ece6745_free( v );
+  ece6745_free( d );
+  ece6745_free( c );
+  ece6745_free( b );
+  ece6745_free( a );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_18_sort_async
+//------------------------------------------------------------------------
+// Start sorting two arrays without waiting and fill in a third array
+// while the accelerator works on them.
+
+void test_case_18_sort_async()
+{
+  ECE6745_CHECK( L"test_case_18_sort_async" );
+
+  ece6745_srand(0x0000a5a5);
+
+  int  size    = 200;
+  int* a       = ece6745_malloc( size * (int) sizeof(int) );
+  int* b       = ece6745_malloc( size * (int) sizeof(int) );
+  int* c       = ece6745_malloc( size * (int) sizeof(int) );
+  int* scratch = ece6745_malloc( size * (int) sizeof(int) );
+
+  for ( int i = 0; i < size; i++ ) {
+    a[i] = 0x0000ffff & ece6745_rand();
+    b[i] = 0x0000ffff & ece6745_rand();
+  }
+
+  ubmark_sort_xcel_start( a, scratch, 100 );
+  ubmark_sort_xcel_start( b, 0, 50 );
+
+  for ( int i = 0; i < size; i++ )
+    c[i] = 0x0000ffff & ece6745_rand();
+
+  ubmark_sort_xcel_wait();
+  ECE6745_CHECK_INT_EQ( ubmark_sort_xcel_status(), 0 );
+
+  // A third job after the first two are done, this one in chunks. With
+  // the extended protocol the job is still running when start returns,
+  // and the accelerator leaves the sorted runs of 128 elements in the
+  // scratch buffer, which we fill in descending order first.
+
+  for ( int i = 0; i < size; i++ )
+    scratch[i] = size - i;
+
+  ubmark_sort_xcel_start( c, scratch, size );
+  if ( ubmark_sort_xcel_extended() )
+    ECE6745_CHECK_TRUE( ubmark_sort_xcel_status() >= 1 );
+  while ( ubmark_sort_xcel_status() != 0 );
+
+  ECE6745_CHECK_TRUE( is_sorted( a, 100 ) );
+  ECE6745_CHECK_TRUE( is_sorted( b, 50 ) );
+  ECE6745_CHECK_TRUE( is_sorted( c, size ) );
+
+  if ( ubmark_sort_xcel_extended() ) {
+    ECE6745_CHECK_TRUE( is_sorted( scratch, 128 ) );
+    ECE6745_CHECK_TRUE( is_sorted( scratch + 128, size - 128 ) );
+  }
+
+  ece6745_free( scratch );
+  ece6745_free( c );
+  ece6745_free( b );
+  ece6745_free( a );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
+//------------------------------------------------------------------------
+// test_case_19_sort_runs
+//------------------------------------------------------------------------
+// Larger than the on-chip buffer and with few unique keys, so with the
+// extended protocol the runs and their payload go through the scratch
+// buffer. Equal keys keep their order, so the payload (the original
+// index of each key) is increasing for equal keys.
+
+int sort_runs_check( int* x, int* orig, int* index, int n )
+{
+  for ( int i = 0; i < n; i++ ) {
+    if ( index[i] < 0 || index[i] >= n || x[i] != orig[index[i]] )
+      return 0;
+    if ( i > 0 && ( x[i-1] < x[i] ||
+                    ( x[i-1] == x[i] && index[i-1] > index[i] ) ) )
+      return 0;
+  }
+  return 1;
+}
+
+void test_case_19_sort_runs()
+{
+  ECE6745_CHECK( L"test_case_19_sort_runs" );
+
+  ece6745_srand(0x0000b0b0);
+
+  int  size = 1000;
+  int* orig = ece6745_malloc( size * (int) sizeof(int) );
+  int* a    = ece6745_malloc( size * (int) sizeof(int) );
+  int* v    = ece6745_malloc( size * (int) sizeof(int) );
+
+  for ( int i = 0; i < size; i++ ) {
+    orig[i] = ( 0x000000ff & ece6745_rand() ) - 128;
+    a[i]    = orig[i];
+    v[i]    = i;
+  }
+
+  // Signed descending with the payload
+
+  ubmark_sort_xcel_mode( a, v, size,
+    SORT_XCEL_SIGNED | SORT_XCEL_DESCENDING | SORT_XCEL_PAYLOAD, 0 );
+
+  ECE6745_CHECK_TRUE( sort_runs_check( a, orig, v, size ) );
+
+  // Same order with argsort instead
+
+  for ( int i = 0; i < size; i++ ) {
+    a[i] = orig[i];
+    v[i] = 0;
+  }
+
+  ubmark_sort_xcel_mode( a, v, size,
+    SORT_XCEL_SIGNED | SORT_XCEL_DESCENDING | SORT_XCEL_ARGSORT, 0 );
+
+  ECE6745_CHECK_TRUE( sort_runs_check( a, orig, v, size ) );
+
+  ece6745_free( v );
+  ece6745_free( a );
+  ece6745_free( orig );
+
+  ECE6745_CHECK_INT_EQ( ece6745_get_heap_usage(), 0 );
+}
+
 //------------------------------------------------------------------------
 // main
 //------------------------------------------------------------------------
@@ -382,6 +658,12 @@ int main( int argc, char** argv )
   if ( (__n <= 0) || (__n == 11) ) test_case_11_sort_random_64();
   if ( (__n <= 0) || (__n == 12) ) test_case_12_sort_random_67();
   if ( (__n <= 0) || (__n == 13) ) test_case_13_sort_eval_dataset();
+  if ( (__n <= 0) || (__n == 14) ) test_case_14_sort_random_1000();
+  if ( (__n <= 0) || (__n == 15) ) test_case_15_sort_signed_descending();
+  if ( (__n <= 0) || (__n == 16) ) test_case_16_sort_payload();
+  if ( (__n <= 0) || (__n == 17) ) test_case_17_sort_top_k();
+  if ( (__n <= 0) || (__n == 18) ) test_case_18_sort_async();
+  if ( (__n <= 0) || (__n == 19) ) test_case_19_sort_runs();
 
   ece6745_wprintf( L"\n\n" );
   return ece6745_check_status;
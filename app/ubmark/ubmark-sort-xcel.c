@@ -8,31 +8,293 @@
 // software/hardware co-design. But make sure you modify the FL model
 // appropriately!
 
+#include "ece6745.h"
 #include "ubmark-sort.h"
 #include "ubmark-sort-xcel.h"
 
 //------------------------------------------------------------------------
-// sort_xcel
+// sort_xcel_mode
+//------------------------------------------------------------------------
+// The software version of the accelerator sorts in place without any
+// copies. We flip bits of the keys so that every mode becomes a signed
+// ascending sort: flipping the sign bit turns the unsigned order into
+// the signed order, and flipping all bits reverses the order. Returns
+// the bits to flip (with xor) for the given mode.
+
+int sort_xcel_flip( int mode )
+{
+  unsigned int flip = 0x80000000u;
+
+  if ( mode & SORT_XCEL_SIGNED )
+    flip = 0;
+
+  if ( mode & SORT_XCEL_DESCENDING )
+    flip = ~flip;
+
+  return (int) flip;
+}
+
+void sort_xcel_flip_keys( int* x, int size, int flip )
+{
+  for ( int i = 0; i < size; i++ )
+    x[i] ^= flip;
+}
+
+// Swap elements i and j of the keys and of the payload if there is one
+
+void sort_xcel_swap( int* x, int* v, int i, int j )
+{
+  ubmark_sort_swap( &x[i], &x[j] );
+  if ( v )
+    ubmark_sort_swap( &v[i], &v[j] );
+}
+
+// Returns 1 if element i goes before element j. Equal keys are ordered
+// by their payload if there is one, which is how argsort keeps equal
+// keys in their original order.
+
+int sort_xcel_less( int* x, int* v, int i, int j )
+{
+  if ( x[i] != x[j] )
+    return x[i] < x[j];
+  return v && v[i] < v[j];
+}
+
+// Heap selection: keep the first k elements of the sorted order in a
+// heap in x[0..k) whose root is the last of them, replace the root with
+// any element of the rest of the array which goes before it, and then
+// sort the heap. This takes O(n log k) time, and with k == n it is a
+// heap sort.
+
+void sort_xcel_sift( int* x, int* v, int i, int n )
+{
+  while ( 2*i+1 < n ) {
+    int c = 2*i+1;
+    if ( c+1 < n && sort_xcel_less( x, v, c, c+1 ) )
+      c = c+1;
+    if ( !sort_xcel_less( x, v, i, c ) )
+      return;
+    sort_xcel_swap( x, v, i, c );
+    i = c;
+  }
+}
+
+void sort_xcel_select( int* x, int* v, int size, int k )
+{
+  for ( int i = k/2 - 1; i >= 0; i-- )
+    sort_xcel_sift( x, v, i, k );
+
+  for ( int i = k; i < size; i++ ) {
+    if ( sort_xcel_less( x, v, i, 0 ) ) {
+      sort_xcel_swap( x, v, 0, i );
+      sort_xcel_sift( x, v, 0, k );
+    }
+  }
+
+  for ( int n = k-1; n > 0; n-- ) {
+    sort_xcel_swap( x, v, 0, n );
+    sort_xcel_sift( x, v, 0, n );
+  }
+}
+
+// Stable merge sort for keys with an arbitrary payload, where we cannot
+// order equal keys by their payload. We insertion sort small blocks and
+// then merge them in place by rotating ranges (SymMerge by Kim and
+// Kutzner), which takes O(n log n) comparisons and O(n log^2 n) swaps.
+
+void sort_xcel_reverse( int* x, int* v, int lo, int hi )
+{
+  for ( hi = hi-1; lo < hi; lo++, hi-- )
+    sort_xcel_swap( x, v, lo, hi );
+}
+
+void sort_xcel_rotate( int* x, int* v, int lo, int mid, int hi )
+{
+  sort_xcel_reverse( x, v, lo,  mid );
+  sort_xcel_reverse( x, v, mid, hi  );
+  sort_xcel_reverse( x, v, lo,  hi  );
+}
+
+// Merge the sorted ranges x[lo..mid) and x[mid..hi)
+
+void sort_xcel_merge( int* x, int* v, int lo, int mid, int hi )
+{
+  // A single element on the left goes after the smaller elements on
+  // the right, and a single element on the right goes before the larger
+  // elements on the left
+
+  if ( mid - lo == 1 ) {
+    int i = mid;
+    int j = hi;
+    while ( i < j ) {
+      int h = i + (j-i)/2;
+      if ( x[h] < x[lo] )
+        i = h+1;
+      else
+        j = h;
+    }
+    sort_xcel_rotate( x, v, lo, mid, i );
+    return;
+  }
+
+  if ( hi - mid == 1 ) {
+    int i = lo;
+    int j = mid;
+    while ( i < j ) {
+      int h = i + (j-i)/2;
+      if ( x[mid] < x[h] )
+        j = h;
+      else
+        i = h+1;
+    }
+    sort_xcel_rotate( x, v, i, mid, hi );
+    return;
+  }
+
+  // Find where to split both ranges around the middle of the merged
+  // range, swap the two inner parts, and merge each half
+
+  int half  = lo + (hi-lo)/2;
+  int n     = half + mid;
+  int start = lo;
+  int end   = mid;
+
+  if ( mid > half ) {
+    start = n - hi;
+    end   = half;
+  }
+
+  while ( start < end ) {
+    int c = start + (end-start)/2;
+    if ( x[n-1-c] < x[c] )
+      end = c;
+    else
+      start = c+1;
+  }
+
+  end = n - start;
+
+  if ( start < mid && mid < end )
+    sort_xcel_rotate( x, v, start, mid, end );
+  if ( lo < start && start < half )
+    sort_xcel_merge( x, v, lo, start, half );
+  if ( half < end && end < hi )
+    sort_xcel_merge( x, v, half, end, hi );
+}
+
+void sort_xcel_stable( int* x, int* v, int size )
+{
+  const int BLOCK_SIZE = 16;
+
+  for ( int lo = 0; lo < size; lo += BLOCK_SIZE ) {
+    int hi = ( size - lo < BLOCK_SIZE ) ? size : lo + BLOCK_SIZE;
+    for ( int i = lo+1; i < hi; i++ ) {
+      for ( int j = i; j > lo && x[j] < x[j-1]; j-- )
+        sort_xcel_swap( x, v, j, j-1 );
+    }
+  }
+
+  for ( int width = BLOCK_SIZE; width < size; width = 2*width ) {
+    for ( int lo = 0; lo < size - width; lo += 2*width ) {
+      int hi = ( size - lo < 2*width ) ? size : lo + 2*width;
+      sort_xcel_merge( x, v, lo, lo + width, hi );
+    }
+  }
+}
+
+// Software version of the accelerator. Top-k leaves the rest of the
+// array (and payload) in an unspecified order.
+
+void sort_xcel_mode_sw( int* x, int* payload, int size, int mode, int k )
+{
+  if ( size <= 0 )
+    return;
+
+  if ( k <= 0 || k > size )
+    k = size;
+
+  int* v = 0;
+  if ( mode & (SORT_XCEL_PAYLOAD | SORT_XCEL_ARGSORT) )
+    v = payload;
+
+  if ( mode & SORT_XCEL_ARGSORT ) {
+    for ( int i = 0; i < size; i++ )
+      v[i] = i;
+  }
+
+  int flip = sort_xcel_flip( mode );
+  sort_xcel_flip_keys( x, size, flip );
+
+  if ( mode & SORT_XCEL_PAYLOAD )
+    sort_xcel_stable( x, v, size );
+  else
+    sort_xcel_select( x, v, size, k );
+
+  sort_xcel_flip_keys( x, size, flip );
+}
+
 //------------------------------------------------------------------------
+// sort_xcel_extended
+//------------------------------------------------------------------------
+// Software reads the protocol version from xr9. SortXcel.v answers every
+// read with 1 while it is idle, so only SortXcelFL reports the extended
+// protocol (version 2). We only read xr9 once.
 
 #ifdef _RISCV
-void ubmark_sort_xcel(int* x, int size) {
+int ubmark_sort_xcel_extended( void )
+{
+  static int version = 0;
+
+  if ( version == 0 ) {
+    __asm__ __volatile__ (
+      "csrr %[version], 0x7e9;\n"
+      : [version] "=r"(version)
+    );
+  }
+
+  return version >= 2;
+}
+
+void ubmark_sort_xcel_mode( int* x, int* payload, int size, int mode, int k )
+{
   // We might want to handle special cases in software instead of
   // hardware. So for example, we explicitly check to make sure size is
   // greater than one before trying to use the accelerator.
-  
-  if (size <= 1)
+
+  if ( size <= 1 ) {
+    if ( size == 1 && (mode & SORT_XCEL_ARGSORT) )
+      payload[0] = 0;
     return;
-    
+  }
+
+  // The accelerator can only sort MAX_ACCEL_SIZE elements on chip.
+
   const int MAX_ACCEL_SIZE = 128;
-  
-  if (size <= MAX_ACCEL_SIZE) {
+
+  // The basic protocol (xr0-xr2) only sorts unsigned keys which fit in
+  // the buffer, so the payload modes and larger arrays are handled in
+  // software. The other modes flip bits of the keys around the sort
+  // like the software version does, except that the accelerator sorts
+  // in unsigned order, and top-k just sorts all elements.
+
+  if ( !ubmark_sort_xcel_extended() ) {
+
+    if ( (mode & (SORT_XCEL_PAYLOAD | SORT_XCEL_ARGSORT))
+         || size > MAX_ACCEL_SIZE ) {
+      sort_xcel_mode_sw( x, payload, size, mode, k );
+      return;
+    }
+
+    int flip = sort_xcel_flip( mode ^ SORT_XCEL_SIGNED );
+    if ( flip )
+      sort_xcel_flip_keys( x, size, flip );
+
     __asm__ (
       "csrw 0x7e1, %[x]   ;\n"
       "csrw 0x7e2, %[size];\n"
       "csrw 0x7e0, x0     ;\n"
       "csrr x0,    0x7e0  ;\n"
-      
+
       // Outputs from the inline assembly block
 
       :
@@ -46,10 +308,82 @@ void ubmark_sort_xcel(int* x, int size) {
 
       : "memory"
     );
+
+    if ( flip )
+      sort_xcel_flip_keys( x, size, flip );
+
+    return;
   }
-  else {
-    ubmark_sort(x, size);
-  }
+
+  // With the extended protocol larger arrays are sorted in runs of
+  // MAX_ACCEL_SIZE elements into a scratch buffer which the accelerator
+  // then merges back into the array. The scratch buffer also holds the
+  // payload of each run if there is one. We always write all of the
+  // registers since they keep their values from the previous job.
+
+  int scratch_size = size;
+  if ( mode & (SORT_XCEL_PAYLOAD | SORT_XCEL_ARGSORT) )
+    scratch_size = 2*size;
+
+  int* scratch = 0;
+  if ( size > MAX_ACCEL_SIZE )
+    scratch = ece6745_malloc( scratch_size * (int)sizeof(int) );
+
+  __asm__ (
+    "csrw 0x7e1, %[x]      ;\n"
+    "csrw 0x7e2, %[size]   ;\n"
+    "csrw 0x7e3, %[run_len];\n"
+    "csrw 0x7e4, %[scratch];\n"
+    "csrw 0x7e5, %[mode]   ;\n"
+    "csrw 0x7e6, %[payload];\n"
+    "csrw 0x7e7, %[k]      ;\n"
+    "csrw 0x7e0, x0        ;\n"
+    "csrr x0,    0x7e0     ;\n"
+
+    // Outputs from the inline assembly block
+
+    :
+
+    // Inputs to the inline assembly block
+
+    : [x]       "r"(x),
+      [size]    "r"(size),
+      [run_len] "r"(MAX_ACCEL_SIZE),
+      [scratch] "r"(scratch),
+      [mode]    "r"(mode),
+      [payload] "r"(payload),
+      [k]       "r"(k)
+
+    // Tell the compiler this accelerator read/writes memory
+
+    : "memory"
+  );
+
+  if ( scratch )
+    ece6745_free( scratch );
+}
+
+#else
+
+int ubmark_sort_xcel_extended( void )
+{
+  return 0;
+}
+
+void ubmark_sort_xcel_mode( int* x, int* payload, int size, int mode, int k )
+{
+  sort_xcel_mode_sw( x, payload, size, mode, k );
+}
+
+#endif
+
+//------------------------------------------------------------------------
+// sort_xcel
+//------------------------------------------------------------------------
+
+#ifdef _RISCV
+void ubmark_sort_xcel(int* x, int size) {
+  ubmark_sort_xcel_mode( x, 0, size, 0, 0 );
 }
 
 #else
@@ -58,3 +392,86 @@ void ubmark_sort_xcel(int* x, int size) {
 }
 #endif
 
+//------------------------------------------------------------------------
+// sort_xcel_start/status/wait
+//------------------------------------------------------------------------
+// SortXcel.v has neither the status register (xr8) nor a job queue, so
+// without the extended protocol start just sorts with the blocking
+// interface and there is never an outstanding job.
+
+#ifdef _RISCV
+int ubmark_sort_xcel_status( void )
+{
+  if ( !ubmark_sort_xcel_extended() )
+    return 0;
+
+  int status;
+  __asm__ __volatile__ ( "csrr %[status], 0x7e8;\n" : [status] "=r"(status) );
+  return status;
+}
+
+void ubmark_sort_xcel_start( int* x, int* scratch, int size )
+{
+  if ( !ubmark_sort_xcel_extended() ) {
+    ubmark_sort_xcel(x, size);
+    return;
+  }
+
+  if ( size <= 1 )
+    return;
+
+  const int MAX_ACCEL_SIZE = 128;
+
+  // Wait for a free slot if two jobs are already outstanding
+
+  while ( ubmark_sort_xcel_status() >= 2 );
+
+  __asm__ __volatile__ (
+    "csrw 0x7e1, %[x]      ;\n"
+    "csrw 0x7e2, %[size]   ;\n"
+    "csrw 0x7e3, %[run_len];\n"
+    "csrw 0x7e4, %[scratch];\n"
+    "csrw 0x7e5, x0        ;\n"
+    "csrw 0x7e6, x0        ;\n"
+    "csrw 0x7e7, x0        ;\n"
+    "csrw 0x7e0, x0        ;\n"
+
+    // Outputs from the inline assembly block
+
+    :
+
+    // Inputs to the inline assembly block
+
+    : [x]       "r"(x),
+      [size]    "r"(size),
+      [run_len] "r"(MAX_ACCEL_SIZE),
+      [scratch] "r"(scratch)
+
+    // Tell the compiler this accelerator read/writes memory
+
+    : "memory"
+  );
+}
+
+void ubmark_sort_xcel_wait( void )
+{
+  if ( ubmark_sort_xcel_extended() )
+    __asm__ __volatile__ ( "csrr x0, 0x7e0;\n" : : : "memory" );
+}
+
+#else
+int ubmark_sort_xcel_status( void )
+{
+  return 0;
+}
+
+void ubmark_sort_xcel_start( int* x, int* scratch, int size )
+{
+  (void) scratch;
+  ubmark_sort_xcel(x, size);
+}
+
+void ubmark_sort_xcel_wait( void )
+{
+}
+#endif
@@ -3,10 +3,50 @@
 //========================================================================
 // This microbenchmark sorts an array of integers.
 
-#ifndef UBMARK_SORT_H
-#define UBMARK_SORT_H
+#ifndef UBMARK_SORT_XCEL_H
+#define UBMARK_SORT_XCEL_H
+
+// SortXcel.v only implements the basic accelerator protocol, which sorts
+// up to 128 unsigned keys in place, while SortXcelFL also implements the
+// extended protocol with larger arrays, the sort modes and top-k. We
+// check which protocol the accelerator implements at run time, and with
+// the basic protocol everything else is handled in software. Without
+// the extended protocol the non-blocking interface sorts before
+// returning from start.
+
+// Sort modes for ubmark_sort_xcel_mode (see SortXcelFL for details)
+
+#define SORT_XCEL_SIGNED     0x1 // compare keys as signed integers
+#define SORT_XCEL_DESCENDING 0x2 // sort largest key first
+#define SORT_XCEL_PAYLOAD    0x4 // permute payload along with the keys
+#define SORT_XCEL_ARGSORT    0x8 // write original index of each key to payload
 
 void ubmark_sort_xcel( int* x, int size );
 
-#endif /* UBMARK_SORT_H */
+// Returns 1 if the accelerator implements the extended protocol and 0 if
+// it only implements the basic protocol (or there is no accelerator).
+
+int ubmark_sort_xcel_extended( void );
+
+// Sort the keys in x in the given mode. Payload can be NULL unless the
+// mode includes SORT_XCEL_PAYLOAD or SORT_XCEL_ARGSORT. If k is between
+// 1 and size-1 only the first k elements of the sorted order are written
+// to x (and payload) and the rest are left in no particular order,
+// otherwise all elements are sorted.
+
+void ubmark_sort_xcel_mode( int* x, int* payload, int size, int mode, int k );
+
+// Non-blocking interface. Start returns as soon as the accelerator has
+// the job, so software can prepare the next array in the meantime; at
+// most two jobs are outstanding, so start waits if there already are
+// two. Arrays with more than 128 elements need a scratch buffer of size
+// elements which must stay allocated until the job is done. Status
+// returns the number of outstanding jobs and wait blocks until all of
+// them are done.
+
+void ubmark_sort_xcel_start( int* x, int* scratch, int size );
+int  ubmark_sort_xcel_status( void );
+void ubmark_sort_xcel_wait( void );
+
+#endif /* UBMARK_SORT_XCEL_H */
 
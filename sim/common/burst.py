@@ -0,0 +1,152 @@
+#=========================================================================
+# burst
+#=========================================================================
+# Burst (line-sized) memory transactions for accelerator memory ports.
+# Reading or writing an array one 4B word at a time through
+# MemRequesterAdapterFL costs a request and a response per word, so an
+# FL accelerator which streams arrays spends most of its time on memory
+# message overhead. Instead the accelerator can use a memory port whose
+# data field is a whole line of nwords words:
+#
+#  >>> MemReqMsg, MemRespMsg = mk_burst_mem_msg( 4 )
+#  >>> s.mem_adapter = MemRequesterAdapterFL( MemReqMsg, MemRespMsg )
+#  >>> s.burst       = BurstAdapter( s.mem_adapter, 4 )
+#  >>> words = s.burst.read_words( base_addr, n )
+#  >>> s.burst.write_words( base_addr, sorted(words) )
+#  >>> s.burst.schedule_caller( s, up_xcel )
+#
+# The scheduler only orders an update block around the blocks of the
+# adapter if the block calls the adapter methods itself, so each block
+# which uses the BurstAdapter has to be registered with schedule_caller.
+# Otherwise the adapter can clear a request after sending it again, and
+# the memory sees every request twice.
+#
+# BurstAdapter packs consecutive words into one request per line. A
+# transfer which does not start or end on a line boundary uses partial
+# bursts (i.e., a smaller len) for the first and last line so that no
+# request ever crosses a line. Test memories like MemoryFL already
+# service a request of any size supported by their port as a single
+# transaction, so they only need to be given the burst message types.
+#
+# Long arrays can also be streamed a line at a time with stream_words and
+# BurstWriter, e.g., to merge sorted runs without holding them on chip.
+
+from pymtl3 import *
+from pymtl3.stdlib.mem import mk_mem_msg
+
+#-------------------------------------------------------------------------
+# mk_burst_mem_msg
+#-------------------------------------------------------------------------
+# Memory request/response types for bursts of nwords 32-bit words.
+
+def mk_burst_mem_msg( nwords=4 ):
+  return mk_mem_msg( 8, 32, 32*nwords )
+
+#-------------------------------------------------------------------------
+# split_bursts
+#-------------------------------------------------------------------------
+# Splits the nbytes starting at addr into (addr, nbytes) chunks which do
+# not cross a line boundary.
+
+def split_bursts( addr, nbytes, line_nbytes ):
+  end = addr + nbytes
+  while addr < end:
+    line_end = ( addr // line_nbytes + 1 ) * line_nbytes
+    chunk    = min( end, line_end ) - addr
+    yield addr, chunk
+    addr += chunk
+
+#-------------------------------------------------------------------------
+# pack_words/unpack_words
+#-------------------------------------------------------------------------
+# Words are packed little-endian like the memory, so the word at the
+# lowest address ends up in the least significant bits.
+
+def pack_words( words ):
+  value = 0
+  for i, word in enumerate( words ):
+    value |= ( int(word) & 0xffffffff ) << ( 32*i )
+  return value
+
+def unpack_words( value, nwords ):
+  value = int( value )
+  return [ ( value >> ( 32*i ) ) & 0xffffffff for i in range(nwords) ]
+
+#=========================================================================
+# BurstAdapter
+#=========================================================================
+# Wraps a MemRequesterAdapterFL for burst messages of nwords words and
+# reads/writes arrays of words with one transaction per line. Like the
+# adapter it wraps, it must be used from a blocking update block.
+
+class BurstAdapter:
+
+  def __init__( self, adapter, nwords=4 ):
+    self.adapter     = adapter
+    self.nwords      = nwords
+    self.line_nbytes = 4*nwords
+    self.line_nbits  = 32*nwords
+    self.nreqs       = 0
+
+  # Order upblk (an update block of component) like a block which calls
+  # the adapter methods directly: after the adapter clears the request
+  # it sent last cycle, and before it sends the next request and takes
+  # the response.
+
+  def schedule_caller( self, component, upblk ):
+    get_upblk = self.adapter.get_update_block
+    component.add_constraints(
+      U( get_upblk( "up_clear_req" ) ) < U( upblk ),
+      U( upblk ) < U( get_upblk( "up_send_req" ) ),
+      U( upblk ) < U( get_upblk( "up_resp_rdy" ) ),
+    )
+
+  def read_words( self, addr, count ):
+    assert addr % 4 == 0, "bursts must be word aligned"
+    words = []
+    for burst_addr, nbytes in split_bursts( addr, 4*count, self.line_nbytes ):
+      data = self.adapter.read( burst_addr, nbytes )
+      words.extend( unpack_words( data, nbytes//4 ) )
+      self.nreqs += 1
+    return words
+
+  def write_words( self, addr, words ):
+    assert addr % 4 == 0, "bursts must be word aligned"
+    i = 0
+    for burst_addr, nbytes in split_bursts( addr, 4*len(words), self.line_nbytes ):
+      data = pack_words( words[i:i+nbytes//4] )
+      self.adapter.write( burst_addr, nbytes, Bits( self.line_nbits, data ) )
+      self.nreqs += 1
+      i += nbytes//4
+
+  # Generates count words starting at addr, reading one line at a time
+  # as the words are consumed
+
+  def stream_words( self, addr, count ):
+    for line_addr, nbytes in split_bursts( addr, 4*count, self.line_nbytes ):
+      yield from self.read_words( line_addr, nbytes//4 )
+
+#=========================================================================
+# BurstWriter
+#=========================================================================
+# Writes a stream of words to consecutive addresses through a
+# BurstAdapter, one line at a time. Call flush at the end to write the
+# last partial line.
+
+class BurstWriter:
+
+  def __init__( self, burst, addr ):
+    self.burst = burst
+    self.addr  = addr
+    self.words = []
+
+  def push( self, word ):
+    self.words.append( word )
+    if ( self.addr + 4*len(self.words) ) % self.burst.line_nbytes == 0:
+      self.flush()
+
+  def flush( self ):
+    if self.words:
+      self.burst.write_words( self.addr, self.words )
+      self.addr += 4*len(self.words)
+      self.words = []
@@ -0,0 +1,195 @@
+#=========================================================================
+# fixed_point
+#=========================================================================
+# Vectorized fixed-point arithmetic for generating and checking the
+# results of the MLP accelerators. Every model of a layer (the FL
+# models, the software FIXED_MULT macros, the datapath, and the test
+# references) has to agree on how products are rounded back to the
+# fixed-point format and what happens when a value does not fit, so
+# these choices are explicit parameters here instead of being hidden in
+# masks and shifts:
+#
+#  - rounding : how a product is scaled back by 2^frac_bits, either
+#               "truncate" (round towards minus infinity, an arithmetic
+#               shift) or "half-up" (add half an LSB first)
+#  - overflow : what happens when a value does not fit its width, either
+#               "wrap" (two's complement wraparound) or "saturate" (clamp
+#               to the most positive/negative value)
+#  - widths   : the width of the product register (prod_bits) and of
+#               the accumulator (acc_bits)
+#
+# A FixedPoint object bundles these choices and computes whole layers at
+# once with NumPy:
+#
+#  >>> arith   = FixedPoint( frac_bits=7, rounding="half-up", acc_bits=32 )
+#  >>> outputs = arith.matmul( inputs, weights, biases )
+#
+# All values are integers holding the fixed-point bit patterns as signed
+# numbers (e.g., 1.5 in Q4.7 is 192). Use to_fixed/to_float to convert
+# from/to real numbers and to_unsigned/sign_extend to convert from/to
+# the raw bits of a narrower field.
+
+import numpy as np
+
+rounding_modes = [ "truncate", "half-up" ]
+overflow_modes = [ "wrap", "saturate" ]
+
+def check_modes( rounding, overflow ):
+  if rounding not in rounding_modes:
+    raise ValueError( f"unknown rounding {rounding} "
+                      f"(expected one of {','.join(rounding_modes)})" )
+  if overflow not in overflow_modes:
+    raise ValueError( f"unknown overflow {overflow} "
+                      f"(expected one of {','.join(overflow_modes)})" )
+
+#-------------------------------------------------------------------------
+# Bit-level helpers
+#-------------------------------------------------------------------------
+# These work on ints and on NumPy integer arrays (at most 64 bits wide)
+# and always return int64 values.
+
+def wrap( x, nbits ):
+  x = np.asarray( x, dtype=np.int64 )
+  if nbits >= 64:
+    return x
+  half = np.int64( 1 ) << ( nbits-1 )
+  return ( ( x + half ) & ( ( half << 1 ) - 1 ) ) - half
+
+def saturate( x, nbits ):
+  x = np.asarray( x, dtype=np.int64 )
+  if nbits >= 64:
+    return x
+  return np.clip( x, -( 1 << (nbits-1) ), ( 1 << (nbits-1) ) - 1 )
+
+def fit( x, nbits, overflow="wrap" ):
+  return wrap( x, nbits ) if overflow == "wrap" else saturate( x, nbits )
+
+def to_unsigned( x, nbits ):
+  return np.asarray( x, dtype=np.int64 ) & ( ( 1 << nbits ) - 1 )
+
+def sign_extend( x, nbits ):
+  return wrap( to_unsigned( x, nbits ), nbits )
+
+#-------------------------------------------------------------------------
+# rescale
+#-------------------------------------------------------------------------
+# Divides by 2^shift with the given rounding. With nbits, the rounding
+# addend wraps around to nbits before the shift like it does in C int
+# arithmetic.
+
+def rescale( x, shift, rounding="half-up", nbits=None ):
+  x = np.asarray( x, dtype=np.int64 )
+  if shift == 0:
+    return x
+  if rounding == "half-up":
+    x = x + ( 1 << (shift-1) )
+    if nbits is not None:
+      x = wrap( x, nbits )
+  return x >> shift
+
+#-------------------------------------------------------------------------
+# to_fixed/to_float
+#-------------------------------------------------------------------------
+# Conversion between real numbers and fixed-point values with int_bits
+# integer bits, frac_bits fraction bits and a sign bit (Q4.7 by default).
+
+def to_fixed( x, int_bits=4, frac_bits=7, rounding="half-up",
+              overflow="saturate" ):
+  check_modes( rounding, overflow )
+  scaled = np.asarray( x, dtype=np.float64 ) * ( 1 << frac_bits )
+  if rounding == "half-up":
+    scaled = scaled + 0.5
+  return fit( np.floor( scaled ).astype( np.int64 ), 1+int_bits+frac_bits,
+              overflow )
+
+def to_float( x, frac_bits=7 ):
+  return np.asarray( x, dtype=np.float64 ) / ( 1 << frac_bits )
+
+#=========================================================================
+# FixedPoint
+#=========================================================================
+# Fixed-point multiply-accumulate. A product of two values with
+# frac_bits fraction bits each is formed in prod_bits (None for exact
+# products), scaled back to frac_bits fraction bits with the given
+# rounding, and then fit into the acc_bits accumulator. The bias and the
+# products are summed in the accumulator, where every addition wraps or
+# saturates according to overflow.
+
+class FixedPoint:
+
+  def __init__( self, frac_bits=7, rounding="half-up", overflow="wrap",
+                prod_bits=None, acc_bits=32 ):
+    check_modes( rounding, overflow )
+    self.frac_bits = frac_bits
+    self.rounding  = rounding
+    self.overflow  = overflow
+    self.prod_bits = prod_bits
+    self.acc_bits  = acc_bits
+
+  def __repr__( self ):
+    return ( f"FixedPoint(frac_bits={self.frac_bits}, "
+             f"rounding={self.rounding}, overflow={self.overflow}, "
+             f"prod_bits={self.prod_bits}, acc_bits={self.acc_bits})" )
+
+  #-----------------------------------------------------------------------
+  # mul
+  #-----------------------------------------------------------------------
+  # Element-wise products (with broadcasting)
+
+  def mul( self, a, b ):
+    product = np.asarray( a, dtype=np.int64 ) * np.asarray( b, dtype=np.int64 )
+    if self.prod_bits is not None:
+      product = wrap( product, self.prod_bits )
+    product = rescale( product, self.frac_bits, self.rounding, self.prod_bits )
+    return fit( product, self.acc_bits, self.overflow )
+
+  #-----------------------------------------------------------------------
+  # matmul
+  #-----------------------------------------------------------------------
+  # Computes biases + inputs @ weights for inputs of shape (..., K) and
+  # weights of shape (K, N). Products are formed block_size input
+  # channels at a time to bound the memory for large layers. With
+  # wraparound the order of the additions does not matter, so a whole
+  # block is summed at once and wrapped, while saturating sums are
+  # accumulated one input channel at a time in order.
+
+  def matmul( self, inputs, weights, biases=0, block_size=64 ):
+
+    inputs  = np.asarray( inputs,  dtype=np.int64 )
+    weights = np.asarray( weights, dtype=np.int64 )
+
+    shape = inputs.shape[:-1] + weights.shape[1:]
+    acc   = fit( np.broadcast_to( np.asarray( biases, dtype=np.int64 ), shape ),
+                 self.acc_bits, self.overflow )
+
+    for k in range( 0, weights.shape[0], block_size ):
+      products = self.mul( inputs[...,k:k+block_size,None],
+                           weights[k:k+block_size] )
+      if self.overflow == "wrap":
+        acc = wrap( acc + products.sum( axis=-2 ), self.acc_bits )
+      else:
+        for i in range( products.shape[-2] ):
+          acc = saturate( acc + products[...,i,:], self.acc_bits )
+
+    return acc
+
+#-------------------------------------------------------------------------
+# relu
+#-------------------------------------------------------------------------
+
+def relu( x ):
+  return np.maximum( x, 0 )
+
+#-------------------------------------------------------------------------
+# Arithmetic of the existing models
+#-------------------------------------------------------------------------
+#  - fc_datapath  : the FC layer datapath (FullyConnected_FL and the
+#                   PEs), which keeps only the low 12 bits of each
+#                   product (no rescaling) and sums them in a 12-bit
+#                   accumulator
+#  - c_fixed_mult : the FIXED_MULT macro of ubmark-fclayer/ubmark-mlp,
+#                   (a*b + 64) >> 7 in 32-bit C ints summed into an int
+
+fc_datapath  = FixedPoint( frac_bits=0, overflow="wrap", acc_bits=12 )
+c_fixed_mult = FixedPoint( frac_bits=7, rounding="half-up", overflow="wrap",
+                           prod_bits=32, acc_bits=32 )
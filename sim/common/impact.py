@@ -0,0 +1,366 @@
+#=========================================================================
+# impact
+#=========================================================================
+# Test impact analysis. We statically build a dependency map from each
+# test module to every file it can observe when it runs: the Python
+# modules it imports (transitively, including package __init__ files and
+# simulator scripts it launches like imul-sim), the Verilog files behind
+# any VerilogPlaceholder wrapper, and the `include chains from those
+# Verilog files into vc. The contents of these files are hashed into a
+# fingerprint, and a small results store remembers the fingerprint each
+# test last passed with. A test only needs to rerun when its fingerprint
+# changed or when it did not pass last time.
+#
+# The pytest side lives in conftest.py (see the --impact option). This
+# module can also be run directly to dump the dependency map:
+#
+#  % python common/impact.py lab1_imul/test/IntMulVar_test.py
+#
+
+import ast
+import hashlib
+import os
+import re
+
+# Files in the simulation root which every test implicitly depends on
+
+global_inputs = [ "conftest.py", "pytest.ini", "pymtl.ini" ]
+
+# Regex for Verilog include directives
+
+include_re = re.compile( r'^\s*`include\s+"([^"]+)"', re.MULTILINE )
+
+#-------------------------------------------------------------------------
+# find_sim_dir
+#-------------------------------------------------------------------------
+# Walk up from the given path until we find the directory with pymtl.ini,
+# which is also the root we use to resolve imports and includes.
+
+def find_sim_dir( path ):
+  sim_dir = os.path.dirname( os.path.abspath( path ) )
+  while sim_dir:
+    if os.path.exists( sim_dir + os.path.sep + "pymtl.ini" ):
+      return sim_dir
+    parent = os.path.dirname( sim_dir )
+    if parent == sim_dir:
+      break
+    sim_dir = parent
+  return None
+
+#-------------------------------------------------------------------------
+# is_python_script
+#-------------------------------------------------------------------------
+# Simulator scripts like imul-sim do not have a .py suffix, so we look at
+# the shebang line instead.
+
+def is_python_script( path ):
+  if path.endswith(".py"):
+    return True
+  try:
+    with open( path, 'rb' ) as f:
+      first_line = f.readline()
+  except OSError:
+    return False
+  return first_line.startswith(b"#!") and b"python" in first_line
+
+#=========================================================================
+# DepMap
+#=========================================================================
+
+class DepMap:
+
+  def __init__( self, sim_dir ):
+    self.sim_dir = os.path.abspath( sim_dir )
+    self.cache   = {}
+
+  #-----------------------------------------------------------------------
+  # deps
+  #-----------------------------------------------------------------------
+  # Returns the sorted list of absolute paths of every file the given
+  # test module depends on, including the test module itself.
+
+  def deps( self, path ):
+
+    path = os.path.abspath( path )
+    if path in self.cache:
+      return self.cache[path]
+
+    visited  = set()
+    worklist = [ path ]
+
+    for name in global_inputs:
+      global_path = os.path.join( self.sim_dir, name )
+      if os.path.exists( global_path ):
+        visited.add( global_path )
+
+    # Pytest imports the test module as part of its package (e.g.,
+    # lab1_imul.test.IntMulVar_test), so the enclosing __init__ files run
+
+    rel = os.path.relpath( os.path.dirname( path ), self.sim_dir )
+    if rel != "." and not rel.startswith(".."):
+      worklist.extend( self.resolve_module( rel.replace( os.path.sep, "." ) ) )
+
+    while worklist:
+      cur = worklist.pop()
+      if cur in visited:
+        continue
+      visited.add( cur )
+
+      if cur.endswith(".v"):
+        worklist.extend( self.verilog_deps( cur ) )
+      elif is_python_script( cur ):
+        worklist.extend( self.python_deps( cur ) )
+
+    result = sorted( visited )
+    self.cache[path] = result
+    return result
+
+  #-----------------------------------------------------------------------
+  # resolve_module
+  #-----------------------------------------------------------------------
+  # Map a dotted module name to the files that are executed when it is
+  # imported: the __init__.py of every enclosing package plus the module
+  # itself. Modules outside the simulation root (pymtl3, numpy, etc.)
+  # resolve to nothing.
+
+  def resolve_module( self, modname ):
+
+    files = []
+    parts = modname.split(".")
+    base  = self.sim_dir
+
+    for i, part in enumerate( parts ):
+      base = os.path.join( base, part )
+
+      if os.path.isdir( base ):
+        init = os.path.join( base, "__init__.py" )
+        if os.path.exists( init ):
+          files.append( init )
+      elif os.path.exists( base + ".py" ) and i == len(parts)-1:
+        files.append( base + ".py" )
+      else:
+        return files
+
+    return files
+
+  #-----------------------------------------------------------------------
+  # python_deps
+  #-----------------------------------------------------------------------
+
+  def python_deps( self, path ):
+
+    try:
+      with open( path ) as f:
+        tree = ast.parse( f.read(), filename=path )
+    except ( OSError, SyntaxError, ValueError ):
+      return []
+
+    deps    = []
+    cur_dir = os.path.dirname( path )
+
+    # Package name of this file relative to the simulation root, used to
+    # resolve relative imports
+
+    rel = os.path.relpath( cur_dir, self.sim_dir )
+    pkg = [] if rel == "." else rel.split( os.path.sep )
+
+    for node in ast.walk( tree ):
+
+      if isinstance( node, ast.Import ):
+        for alias in node.names:
+          deps.extend( self.resolve_module( alias.name ) )
+
+      elif isinstance( node, ast.ImportFrom ):
+        if node.level > 0:
+          base = pkg[:len(pkg)-(node.level-1)]
+          if node.module:
+            base = base + node.module.split(".")
+        else:
+          base = node.module.split(".")
+
+        modname = ".".join( base )
+        if modname:
+          deps.extend( self.resolve_module( modname ) )
+
+        # from pkg import module imports a submodule
+
+        for alias in node.names:
+          sub = self.resolve_module( ".".join( base + [ alias.name ] ) )
+          if sub and sub[-1].endswith( alias.name + ".py" ):
+            deps.append( sub[-1] )
+
+      # String constants naming a simulator script next to the test
+      # (e.g., 'imul-sim') mean the test runs that script
+
+      elif isinstance( node, ast.Constant ) and isinstance( node.value, str ):
+        name = node.value
+        if not name or os.path.sep in name or len(name) > 255:
+          continue
+        for search_dir in [ cur_dir, os.path.dirname( cur_dir ) ]:
+          candidate = os.path.join( search_dir, name )
+          if os.path.isfile( candidate ) and is_python_script( candidate ) \
+             and not candidate.endswith(".py"):
+            deps.append( candidate )
+
+    # A VerilogPlaceholder wrapper elaborates the Verilog file with the
+    # same name in the same directory
+
+    vfile = os.path.splitext( path )[0] + ".v"
+    if path.endswith(".py") and os.path.exists( vfile ):
+      deps.append( vfile )
+
+    return deps
+
+  #-----------------------------------------------------------------------
+  # verilog_deps
+  #-----------------------------------------------------------------------
+  # Includes are relative to the simulation root (that is how we pass -I
+  # to the Verilog tools), but we also accept paths relative to the
+  # including file.
+
+  def verilog_deps( self, path ):
+
+    try:
+      with open( path ) as f:
+        text = f.read()
+    except OSError:
+      return []
+
+    deps = []
+    for inc in include_re.findall( text ):
+      for base in [ self.sim_dir, os.path.dirname( path ) ]:
+        candidate = os.path.normpath( os.path.join( base, inc ) )
+        if os.path.exists( candidate ):
+          deps.append( candidate )
+          break
+
+    return deps
+
+  #-----------------------------------------------------------------------
+  # fingerprint
+  #-----------------------------------------------------------------------
+  # Hash of the relative path and contents of every dependency. The extra
+  # string lets the caller fold in anything else that changes what a
+  # test does (e.g., whether we are testing translated Verilog).
+
+  def fingerprint( self, path, extra="" ):
+
+    h = hashlib.sha1( extra.encode() )
+
+    for dep in self.deps( path ):
+      h.update( os.path.relpath( dep, self.sim_dir ).encode() )
+      try:
+        with open( dep, 'rb' ) as f:
+          h.update( hashlib.sha1( f.read() ).digest() )
+      except OSError:
+        h.update( b"<missing>" )
+
+    return h.hexdigest()
+
+#=========================================================================
+# ResultStore
+#=========================================================================
+# Maps a pytest node id to the fingerprint of its test module and the
+# outcome of the last recorded run. Passed and skipped tests are fresh as
+# long as the fingerprint does not change; failed tests are never fresh.
+
+class ResultStore:
+
+  def __init__( self, results=None ):
+    self.results = dict( results or {} )
+
+  def is_fresh( self, nodeid, fingerprint ):
+    entry = self.results.get( nodeid )
+    return entry is not None and entry[0] == fingerprint \
+           and entry[1] in [ "passed", "skipped" ]
+
+  def record( self, nodeid, fingerprint, outcome ):
+    self.results[nodeid] = [ fingerprint, outcome ]
+
+#=========================================================================
+# ImpactPlugin
+#=========================================================================
+# Pytest plugin registered from conftest.py. Every run records the
+# outcome of each test it runs along with the fingerprint of its test
+# module. When select is true we also deselect the tests which are fresh
+# according to the results store.
+
+class ImpactPlugin:
+
+  def __init__( self, cache, sim_dir, select=False, extra="" ):
+    self.cache        = cache
+    self.depmap       = DepMap( sim_dir )
+    self.select       = select
+    self.extra        = extra
+    self.store        = ResultStore( cache.get( "impact/results", {} ) )
+    self.fingerprints = {}
+    self.outcomes     = {}
+
+  def pytest_collection_modifyitems( self, session, config, items ):
+
+    module_fps = {}
+    for item in items:
+      path = str( item.path )
+      if path not in module_fps:
+        module_fps[path] = self.depmap.fingerprint( path, self.extra )
+      self.fingerprints[item.nodeid] = module_fps[path]
+
+    if not self.select:
+      return
+
+    selected   = []
+    deselected = []
+
+    for item in items:
+      if self.store.is_fresh( item.nodeid, self.fingerprints[item.nodeid] ):
+        deselected.append( item )
+      else:
+        selected.append( item )
+
+    if deselected:
+      config.hook.pytest_deselected( items=deselected )
+      items[:] = selected
+
+  def pytest_runtest_logreport( self, report ):
+
+    if report.nodeid not in self.fingerprints:
+      return
+
+    # A test is only as good as the worst of its setup, call, and
+    # teardown phases, so never let a later phase hide a failure
+
+    if self.outcomes.get( report.nodeid ) == "failed":
+      return
+
+    if report.failed:
+      self.outcomes[report.nodeid] = "failed"
+    elif report.skipped:
+      self.outcomes[report.nodeid] = "skipped"
+    elif report.when == "call":
+      self.outcomes[report.nodeid] = "passed"
+
+  def pytest_sessionfinish( self, session ):
+    for nodeid, outcome in self.outcomes.items():
+      self.store.record( nodeid, self.fingerprints[nodeid], outcome )
+    self.cache.set( "impact/results", self.store.results )
+
+#-------------------------------------------------------------------------
+# Main
+#-------------------------------------------------------------------------
+
+def main():
+  import sys
+
+  if len(sys.argv) < 2:
+    print( "usage: impact.py test-file [test-file ...]" )
+    sys.exit(1)
+
+  for test_file in sys.argv[1:]:
+    sim_dir = find_sim_dir( test_file )
+    depmap  = DepMap( sim_dir )
+    print( os.path.relpath( test_file, sim_dir ) + ":" )
+    for dep in depmap.deps( test_file ):
+      print( "  " + os.path.relpath( dep, sim_dir ) )
+
+if __name__ == "__main__":
+  main()
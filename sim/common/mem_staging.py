@@ -0,0 +1,93 @@
+#=========================================================================
+# mem_staging
+#=========================================================================
+# Helpers for staging accelerator inputs in a test memory and reading
+# results back out. Each array goes in or out of the memory with a single
+# write_mem/read_mem call instead of one call per element, and results are
+# compared with vectorized NumPy operations, so setting up and checking a
+# run over a large array costs next to nothing compared to simulating it.
+#
+#  >>> write_array( th.mem, 0x1000, data )
+#  >>> ... run the simulation ...
+#  >>> check_array( read_array( th.mem, 0x1000, len(data) ), np.sort(data) )
+#
+# The memory can be anything with write_mem( addr, data ) and
+# read_mem( addr, nbytes ) methods like MemoryFL. All multi-byte values
+# are stored little-endian like the rest of the memory system.
+
+import numpy as np
+
+#-------------------------------------------------------------------------
+# to_bytes
+#-------------------------------------------------------------------------
+# Converts data to the bytes we store in memory. Byte buffers are stored
+# as is, NumPy arrays keep their own element type unless dtype is given,
+# and anything else (e.g., a list of ints) defaults to 32-bit words.
+# Values are truncated to the element type, so negative ints are stored
+# in two's complement.
+
+def to_bytes( data, dtype=None ):
+
+  if isinstance( data, ( bytes, bytearray, memoryview ) ):
+    return bytes( data )
+
+  if dtype is None:
+    dtype = data.dtype if isinstance( data, np.ndarray ) else np.uint32
+
+  array = np.asarray( data )
+  if array.dtype == object:
+    array = np.array( [ int(x) for x in array.ravel() ], dtype=np.int64 )
+
+  return array.astype( np.dtype( dtype ).newbyteorder("<") ).tobytes()
+
+#-------------------------------------------------------------------------
+# write_array
+#-------------------------------------------------------------------------
+# Stores data at addr and returns the number of bytes written.
+
+def write_array( mem, addr, data, dtype=None ):
+  data_bytes = to_bytes( data, dtype )
+  mem.write_mem( addr, data_bytes )
+  return len( data_bytes )
+
+#-------------------------------------------------------------------------
+# read_array
+#-------------------------------------------------------------------------
+# Reads count elements of the given type starting at addr into a NumPy
+# array (in native byte order).
+
+def read_array( mem, addr, count, dtype=np.uint32 ):
+  dtype = np.dtype( dtype )
+  data  = mem.read_mem( addr, count*dtype.itemsize )
+  return np.frombuffer( bytes( data ), dtype=dtype.newbyteorder("<") ) \
+           .astype( dtype )
+
+#-------------------------------------------------------------------------
+# check_array
+#-------------------------------------------------------------------------
+# Compares the result with the reference and raises an AssertionError
+# listing the first few mismatches. The reference is converted to the
+# type of the result first, so it can be a list of ints. Mismatches are
+# reported by their index into the flattened arrays.
+
+def mismatches( result, ref ):
+  result = np.asarray( result )
+  ref    = np.asarray( ref ).astype( result.dtype )
+  if result.shape != ref.shape:
+    raise AssertionError( f"result has shape {result.shape} but the "
+                          f"reference has shape {ref.shape}" )
+  return np.flatnonzero( result != ref )
+
+def check_array( result, ref, max_report=8 ):
+
+  idxs   = mismatches( result, ref )
+  result = np.ravel( result )
+  ref    = np.ravel( ref ).astype( result.dtype )
+
+  if len( idxs ) > 0:
+    lines = [ f"  [{i}] expected {ref[i]:#x} got {result[i]:#x}"
+              for i in idxs[:max_report] ]
+    if len( idxs ) > max_report:
+      lines.append( f"  ... and {len(idxs)-max_report} more" )
+    raise AssertionError( f"{len(idxs)} of {result.size} elements do not "
+                          f"match the reference\n" + "\n".join( lines ) )
@@ -0,0 +1,220 @@
+#=========================================================================
+# stream
+#=========================================================================
+# Test source and sink for streams which pull their messages lazily
+# instead of copying them into a list of Bits up front like
+# StreamSourceFL/StreamSinkFL. The messages can be either:
+#
+#  - any sequence which supports len and indexing (lists of Bits, NumPy
+#    arrays, memory-mapped arrays, etc.), or
+#
+#  - any iterable without len (generators, itertools.islice, etc.),
+#    which is consumed one message at a time as the simulation runs.
+#
+# Messages which are not already of the stream type are converted only
+# when they are sent or checked. This keeps simulations over huge
+# datasets (see lab1_imul/imul_datasets.py) or long generated protocols
+# in constant memory no matter how many messages they send.
+#
+# The sink can optionally accept messages out of order within a bounded
+# reorder window: with reorder_window=w a received message may match any
+# of the next w+1 expected messages which have not been received yet.
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+class LazyStreamSinkError( Exception ): pass
+
+#=========================================================================
+# MsgReader
+#=========================================================================
+# Reads messages in order from a sequence or an iterable, converting them
+# to the given type. Only the sequence can be rewound, so resetting a
+# reader over an iterable is only allowed before it has been read.
+
+class MsgReader:
+
+  def __init__( self, Type, msgs ):
+    self.Type = Type
+    self.msgs = msgs
+    self.seq  = hasattr( msgs, "__len__" ) and hasattr( msgs, "__getitem__" )
+    self.iter = None
+    self.reset()
+
+  def reset( self ):
+    if not self.seq:
+      if self.iter is not None:
+        if self.nread > 0:
+          raise AssertionError( "cannot rewind a stream of messages which "
+                                "has already been read" )
+        return
+      self.iter = iter( self.msgs )
+    self.nread = 0
+    self.fetch()
+
+  def fetch( self ):
+    if self.seq:
+      if self.nread < len( self.msgs ):
+        self.head = self.convert( self.msgs[self.nread] )
+      else:
+        self.head = None
+    else:
+      self.head = self.convert( next( self.iter, None ) )
+
+  def convert( self, msg ):
+    if msg is None or isinstance( msg, self.Type ):
+      return msg
+    return self.Type( int( msg ) )
+
+  def empty( self ):
+    return self.head is None
+
+  def peek( self ):
+    return self.head
+
+  def pop( self ):
+    msg = self.head
+    self.nread += 1
+    self.fetch()
+    return msg
+
+#=========================================================================
+# LazyStreamSourceFL
+#=========================================================================
+
+class LazyStreamSourceFL( Component ):
+
+  def construct( s, Type, msgs, initial_delay=0, interval_delay=0 ):
+
+    # Interface
+
+    s.ostream = OStreamIfc( Type )
+
+    # Data
+
+    s.reader = MsgReader( Type, msgs )
+    s.count  = 0
+
+    @update_ff
+    def up_src():
+
+      if s.reset:
+        s.reader.reset()
+        s.count = initial_delay
+        s.ostream.val <<= 0
+
+      else:
+        if s.ostream.val & s.ostream.rdy:
+          s.reader.pop()
+          s.count = interval_delay
+
+        if s.count > 0:
+          s.count -= 1
+          s.ostream.val <<= 0
+
+        elif not s.reader.empty():
+          s.ostream.val <<= 1
+          s.ostream.msg <<= s.reader.peek()
+
+        else:
+          s.ostream.val <<= 0
+
+  def done( s ):
+    return s.reader.empty()
+
+  # Line tracing
+
+  def line_trace( s ):
+    return f"{s.ostream}"
+
+#=========================================================================
+# LazyStreamSinkFL
+#=========================================================================
+
+class LazyStreamSinkFL( Component ):
+
+  def construct( s, Type, msgs, initial_delay=0, interval_delay=0,
+                 reorder_window=0 ):
+
+    # Interface
+
+    s.istream = IStreamIfc( Type )
+
+    # Data
+
+    s.reader    = MsgReader( Type, msgs )
+    s.window    = []  # expected messages not received yet, oldest first
+    s.nrecv     = 0
+    s.count     = 0
+    s.error_msg = ''
+
+    def refill():
+      while len( s.window ) <= reorder_window and not s.reader.empty():
+        s.window.append( s.reader.pop() )
+
+    @update_ff
+    def up_sink():
+
+      # Raise the exception at the start of the next cycle so that the
+      # line trace for the cycle with the error gets printed
+
+      if s.error_msg:
+        raise LazyStreamSinkError( s.error_msg )
+
+      # The window only has to be rebuilt if we already received messages
+      # since the last reset
+
+      if s.reset:
+        if s.nrecv > 0:
+          s.reader.reset()
+          s.window = []
+          s.nrecv  = 0
+        refill()
+        s.count = initial_delay
+        s.istream.rdy <<= 0
+
+      else:
+        if s.istream.val & s.istream.rdy:
+          msg = s.istream.msg
+
+          if not s.window:
+            s.error_msg = ( f'Test sink {s} received more msgs than expected!\n'
+                            f'Received : {msg}' )
+          else:
+            for i, ref in enumerate( s.window ):
+              if msg == ref:
+                s.window.pop( i )
+                break
+            else:
+              if reorder_window == 0:
+                s.error_msg = ( f'Test sink {s} received WRONG message '
+                                f'(msg {s.nrecv})!\n'
+                                f'Expected : {s.window[0]}\n'
+                                f'Received : {msg}' )
+              else:
+                s.error_msg = ( f'Test sink {s} received message {s.nrecv} '
+                                f'which is not within the reorder window!\n'
+                                f'Expected one of : '
+                                f'{", ".join(str(m) for m in s.window)}\n'
+                                f'Received : {msg}' )
+            refill()
+
+          s.nrecv += 1
+          s.count  = interval_delay
+
+        # Stay ready once every expected message arrived, so that an
+        # extra message raises an error instead of hanging the sim
+
+        if s.count > 0:
+          s.count -= 1
+          s.istream.rdy <<= 0
+        else:
+          s.istream.rdy <<= 1
+
+  def done( s ):
+    return not s.window and s.reader.empty() and not s.error_msg
+
+  # Line tracing
+
+  def line_trace( s ):
+    return f"{s.istream}"
@@ -0,0 +1,94 @@
+#=========================================================================
+# sweep
+#=========================================================================
+# Helpers for simulator sweep modes: run one simulation per design point
+# in parallel worker processes and print the results as a table.
+#
+# Simulator scripts like imul-sim do not end in .py and so cannot be
+# re-imported by a spawned worker, which is why we always fork workers.
+
+import multiprocessing
+import traceback
+
+#-------------------------------------------------------------------------
+# run_parallel
+#-------------------------------------------------------------------------
+# Calls fn on every config using up to jobs worker processes and returns
+# the results in the same order as the configs. An exception in one
+# design point does not abort the sweep: its result is replaced with a
+# SweepError holding the traceback.
+
+class SweepError:
+
+  def __init__( self, config, msg ):
+    self.config = config
+    self.msg    = msg
+
+  def __str__( self ):
+    return "error"
+
+def call_fn( fn_and_config ):
+  fn, config = fn_and_config
+  try:
+    return fn( config )
+  except Exception:
+    return SweepError( config, traceback.format_exc() )
+
+def run_parallel( fn, configs, jobs=None ):
+
+  configs = list( configs )
+  work    = [ ( fn, config ) for config in configs ]
+
+  if jobs == 1 or len( configs ) <= 1:
+    return [ call_fn( w ) for w in work ]
+
+  ctx = multiprocessing.get_context( "fork" )
+  with ctx.Pool( jobs ) as pool:
+    return pool.map( call_fn, work, chunksize=1 )
+
+#-------------------------------------------------------------------------
+# fmt_cell
+#-------------------------------------------------------------------------
+
+def fmt_cell( value ):
+  if isinstance( value, float ):
+    return f"{value:.2f}"
+  return str( value )
+
+#-------------------------------------------------------------------------
+# print_table
+#-------------------------------------------------------------------------
+# Prints rows (lists of values) under the given column names. Numbers are
+# right aligned and everything else is left aligned.
+
+def print_table( columns, rows, file=None ):
+
+  cells  = [ [ fmt_cell( v ) for v in row ] for row in rows ]
+  widths = [ len( c ) for c in columns ]
+  for row in cells:
+    widths = [ max( w, len( c ) ) for w, c in zip( widths, row ) ]
+
+  def fmt_row( values, raw ):
+    out = []
+    for i, ( v, w ) in enumerate( zip( values, widths ) ):
+      numeric = raw is not None and isinstance( raw[i], ( int, float ) )
+      out.append( v.rjust( w ) if numeric else v.ljust( w ) )
+    return "  ".join( out ).rstrip()
+
+  print( fmt_row( columns, None ), file=file )
+  print( "  ".join( "-"*w for w in widths ), file=file )
+  for row, raw in zip( cells, rows ):
+    print( fmt_row( row, raw ), file=file )
+
+#-------------------------------------------------------------------------
+# report_errors
+#-------------------------------------------------------------------------
+# Prints the tracebacks of any failed design points; returns how many
+# there were.
+
+def report_errors( results, file=None ):
+  errors = [ r for r in results if isinstance( r, SweepError ) ]
+  for e in errors:
+    print( f"\n ERROR: design point {e.config} failed\n", file=file )
+    print( e.msg, file=file )
+  return len( errors )
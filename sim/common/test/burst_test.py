@@ -0,0 +1,104 @@
+#=========================================================================
+# burst_test
+#=========================================================================
+
+import pytest
+
+from common.burst import split_bursts, pack_words, unpack_words
+from common.burst import BurstAdapter, BurstWriter
+
+#-------------------------------------------------------------------------
+# LineAdapter
+#-------------------------------------------------------------------------
+# Stands in for a MemRequesterAdapterFL on a line-sized port: every read
+# or write is one transaction which must not cross a line.
+
+class LineAdapter:
+
+  def __init__( self, nbytes, line_nbytes ):
+    self.mem         = bytearray( nbytes )
+    self.line_nbytes = line_nbytes
+    self.reqs        = []
+
+  def check( self, addr, nbytes ):
+    assert 0 < nbytes <= self.line_nbytes
+    assert addr // self.line_nbytes == ( addr+nbytes-1 ) // self.line_nbytes
+    self.reqs.append( ( addr, nbytes ) )
+
+  def read( self, addr, nbytes ):
+    self.check( addr, nbytes )
+    return int.from_bytes( self.mem[addr:addr+nbytes], "little" )
+
+  def write( self, addr, nbytes, data ):
+    self.check( addr, nbytes )
+    self.mem[addr:addr+nbytes] = int(data).to_bytes( nbytes, "little" )
+
+#-------------------------------------------------------------------------
+# test_split_bursts
+#-------------------------------------------------------------------------
+
+def test_split_bursts():
+
+  assert list( split_bursts( 0x100, 32, 16 ) ) == [ (0x100,16), (0x110,16) ]
+  assert list( split_bursts( 0x104, 8,  16 ) ) == [ (0x104,8) ]
+  assert list( split_bursts( 0x10c, 24, 16 ) ) == \
+      [ (0x10c,4), (0x110,16), (0x120,4) ]
+  assert list( split_bursts( 0x100, 0,  16 ) ) == []
+
+#-------------------------------------------------------------------------
+# test_pack
+#-------------------------------------------------------------------------
+
+def test_pack():
+  assert pack_words([ 1, 2 ]) == 0x00000002_00000001
+  assert unpack_words( 0x00000002_00000001, 2 ) == [ 1, 2 ]
+  assert unpack_words( pack_words([ 0xffffffff, 0, 7 ]), 3 ) == [ 0xffffffff, 0, 7 ]
+
+#-------------------------------------------------------------------------
+# test_adapter
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "nwords", [ 1, 4, 8 ] )
+@pytest.mark.parametrize( "addr, count", [ (0x100,16), (0x104,13), (0x10c,1) ] )
+def test_adapter( nwords, addr, count ):
+
+  adapter = LineAdapter( 0x400, 4*nwords )
+  burst   = BurstAdapter( adapter, nwords )
+
+  words = [ 0xdead0000 + i for i in range(count) ]
+  burst.write_words( addr, words )
+  assert burst.read_words( addr, count ) == words
+
+  # Neighbouring words are untouched
+
+  assert burst.read_words( addr-4, 1 ) == [ 0 ]
+  assert burst.read_words( addr+4*count, 1 ) == [ 0 ]
+
+  # One transaction per line touched in each direction
+
+  nlines = len( list( split_bursts( addr, 4*count, 4*nwords ) ) )
+  assert burst.nreqs == 2*nlines + 2
+
+#-------------------------------------------------------------------------
+# test_stream
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "nwords", [ 1, 4 ] )
+def test_stream( nwords ):
+
+  adapter = LineAdapter( 0x400, 4*nwords )
+  burst   = BurstAdapter( adapter, nwords )
+
+  writer = BurstWriter( burst, 0x104 )
+  for i in range(10):
+    writer.push( i )
+  writer.flush()
+
+  assert list( burst.stream_words( 0x104, 10 ) ) == list( range(10) )
+
+  # Streaming only reads the lines which are consumed
+
+  nreqs = burst.nreqs
+  stream = burst.stream_words( 0x104, 10 )
+  assert next( stream ) == 0
+  assert burst.nreqs == nreqs + 1
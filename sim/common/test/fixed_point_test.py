@@ -0,0 +1,174 @@
+#=========================================================================
+# fixed_point_test
+#=========================================================================
+
+import random
+
+import numpy as np
+import pytest
+
+from common.fixed_point import wrap, saturate, to_unsigned, sign_extend
+from common.fixed_point import rescale, to_fixed, to_float, relu
+from common.fixed_point import FixedPoint, fc_datapath, c_fixed_mult
+
+#-------------------------------------------------------------------------
+# Loop references
+#-------------------------------------------------------------------------
+# One multiply-accumulate at a time with plain Python ints
+
+def ref_wrap( x, nbits ):
+  return ( x + ( 1 << (nbits-1) ) ) % ( 1 << nbits ) - ( 1 << (nbits-1) )
+
+def ref_saturate( x, nbits ):
+  return max( -( 1 << (nbits-1) ), min( x, ( 1 << (nbits-1) ) - 1 ) )
+
+def ref_matmul( inputs, weights, biases, frac_bits, rounding, overflow,
+                prod_bits, acc_bits ):
+  fit = ref_wrap if overflow == "wrap" else ref_saturate
+  outputs = []
+  for row in inputs:
+    outputs.append( [] )
+    for j in range( len(biases) ):
+      accum = fit( biases[j], acc_bits )
+      for i in range( len(row) ):
+        product = row[i]*weights[i][j]
+        if prod_bits is not None:
+          product = ref_wrap( product, prod_bits )
+        if rounding == "half-up" and frac_bits > 0:
+          product += 1 << (frac_bits-1)
+          if prod_bits is not None:
+            product = ref_wrap( product, prod_bits )
+        product = fit( product >> frac_bits, acc_bits )
+        accum   = fit( accum + product, acc_bits )
+      outputs[-1].append( accum )
+  return outputs
+
+def mk_random_layer( batch_size, input_channel, output_channel, lo, hi,
+                     seed=0 ):
+  rng     = random.Random( seed )
+  inputs  = [ [ rng.randint( lo, hi ) for _ in range(input_channel) ]
+              for _ in range(batch_size) ]
+  weights = [ [ rng.randint( lo, hi ) for _ in range(output_channel) ]
+              for _ in range(input_channel) ]
+  biases  = [ rng.randint( lo, hi ) for _ in range(output_channel) ]
+  return inputs, weights, biases
+
+#-------------------------------------------------------------------------
+# test_bits
+#-------------------------------------------------------------------------
+
+def test_bits():
+  values = np.arange( -5000, 5000, 7 )
+  assert wrap( values, 12 ).tolist() == [ ref_wrap( x, 12 ) for x in values ]
+  assert saturate( values, 12 ).tolist() == \
+         [ ref_saturate( x, 12 ) for x in values ]
+
+  assert wrap( 2**31, 32 ) == -2**31
+  assert wrap( -1, 64 ) == -1
+  assert to_unsigned( -1, 12 ) == 0xfff
+  assert sign_extend( 0x800, 12 ) == -2048
+  assert sign_extend( 0x7ff, 12 ) == 2047
+  assert sign_extend( to_unsigned( values, 12 ), 12 ).tolist() == \
+         wrap( values, 12 ).tolist()
+
+#-------------------------------------------------------------------------
+# test_rescale
+#-------------------------------------------------------------------------
+
+def test_rescale():
+  assert rescale( [ 63, 64, -64, -65, 191 ], 7, "half-up" ).tolist() == \
+         [ 0, 1, 0, -1, 1 ]
+  assert rescale( [ 127, 128, -1, -128 ], 7, "truncate" ).tolist() == \
+         [ 0, 1, -1, -1 ]
+
+  # The rounding addend wraps in a 32-bit C int
+
+  assert rescale( 2**31 - 1, 7, "half-up", nbits=32 ) == -2**31 >> 7
+
+#-------------------------------------------------------------------------
+# test_to_fixed
+#-------------------------------------------------------------------------
+
+def test_to_fixed():
+  assert to_fixed( [ 1.5, 0.1, -0.3, 0.0 ] ).tolist() == [ 192, 13, -38, 0 ]
+  assert to_fixed( 0.1, rounding="truncate" ) == 12
+
+  # Q4.7 covers [-16, 16)
+
+  assert to_fixed( [ 100.0, -100.0 ] ).tolist() == [ 2047, -2048 ]
+  assert to_fixed( 16.0, overflow="wrap" ) == -2048
+  assert to_float( to_fixed( 0.5 ) ) == 0.5
+
+  with pytest.raises( ValueError ):
+    to_fixed( 1.0, rounding="nearest-even" )
+  with pytest.raises( ValueError ):
+    FixedPoint( overflow="clamp" )
+
+#-------------------------------------------------------------------------
+# test_matmul
+#-------------------------------------------------------------------------
+# Every combination of rounding and overflow against the loop reference,
+# with narrow accumulators so that wraparound and saturation kick in and
+# a block size which does not divide the input channels.
+
+@pytest.mark.parametrize( "rounding", [ "truncate", "half-up" ] )
+@pytest.mark.parametrize( "overflow", [ "wrap", "saturate" ] )
+@pytest.mark.parametrize( "prod_bits, acc_bits", [ (None, 12), (20, 16), (32, 32) ] )
+def test_matmul( rounding, overflow, prod_bits, acc_bits ):
+  inputs, weights, biases = mk_random_layer( 3, 37, 5, -2048, 2047, seed=acc_bits )
+  arith = FixedPoint( frac_bits=7, rounding=rounding, overflow=overflow,
+                      prod_bits=prod_bits, acc_bits=acc_bits )
+  ref   = ref_matmul( inputs, weights, biases, 7, rounding, overflow,
+                      prod_bits, acc_bits )
+  assert arith.matmul( inputs, weights, biases, block_size=8 ).tolist() == ref
+  assert arith.matmul( inputs, weights, biases ).tolist() == ref
+
+  # A single input vector gives a single row
+
+  assert arith.matmul( inputs[0], weights, biases ).tolist() == ref[0]
+
+#-------------------------------------------------------------------------
+# test_presets
+#-------------------------------------------------------------------------
+
+def test_fc_datapath():
+
+  # Low 12 bits of each product summed with 12-bit wraparound, the way
+  # FullyConnected_FL has always computed it
+
+  inputs, weights, biases = mk_random_layer( 2, 50, 7, 0, 0xfff )
+  for row, outputs in zip( inputs, fc_datapath.matmul( inputs, weights, biases ) ):
+    for j in range( len(biases) ):
+      ref = biases[j]
+      for i in range( len(row) ):
+        ref = ( ref + ( row[i]*weights[i][j] & 0xfff ) ) & 0xfff
+      assert to_unsigned( outputs[j], 12 ) == ref
+
+def test_c_fixed_mult():
+
+  # FIXED_MULT(a,b) = (a*b + 64) >> 7 in 32-bit C ints
+
+  inputs, weights, biases = mk_random_layer( 4, 100, 10, -2048, 2047, seed=1 )
+  outputs = c_fixed_mult.matmul( inputs, weights, biases )
+  for row, out in zip( inputs, outputs.tolist() ):
+    ref = []
+    for j in range( len(biases) ):
+      accum = biases[j]
+      for i in range( len(row) ):
+        accum = ref_wrap( accum + ( ( row[i]*weights[i][j] + 64 ) >> 7 ), 32 )
+      ref.append( accum )
+    assert out == ref
+
+  assert relu( outputs ).min() >= 0
+
+def test_large():
+
+  # A full MNIST FC1 layer against the exact 64-bit product
+
+  rng     = np.random.default_rng( 0 )
+  inputs  = rng.integers( -2048, 2048, size=(4, 784) )
+  weights = rng.integers( -2048, 2048, size=(784, 128) )
+  biases  = rng.integers( -2048, 2048, size=128 )
+  exact   = FixedPoint( frac_bits=0, acc_bits=64 )
+  assert ( exact.matmul( inputs, weights, biases ) ==
+           biases + inputs @ weights ).all()
@@ -0,0 +1,182 @@
+#=========================================================================
+# impact_test
+#=========================================================================
+
+import os
+import pytest
+
+from common.impact import DepMap, ResultStore, find_sim_dir
+
+#-------------------------------------------------------------------------
+# mk_tree
+#-------------------------------------------------------------------------
+# Create a small simulation tree with two packages: pkg_a has a Verilog
+# placeholder whose Verilog includes a chain of files in vc, and pkg_b
+# has a pure Python FL model plus a simulator script.
+
+def mk_file( path, text ):
+  os.makedirs( os.path.dirname( path ), exist_ok=True )
+  with open( path, 'w' ) as f:
+    f.write( text )
+
+def mk_tree( root ):
+  root = str(root)
+
+  mk_file( f"{root}/pymtl.ini",           "" )
+  mk_file( f"{root}/conftest.py",         "" )
+  mk_file( f"{root}/vc/regs.v",           '`include "vc/trace.v"\n' )
+  mk_file( f"{root}/vc/trace.v",          "" )
+  mk_file( f"{root}/vc/muxes.v",          "" )
+
+  mk_file( f"{root}/pkg_a/__init__.py",   "" )
+  mk_file( f"{root}/pkg_a/Dut.py",        "from pymtl3 import *\n" )
+  mk_file( f"{root}/pkg_a/Dut.v",         '`include "vc/regs.v"\n' )
+  mk_file( f"{root}/pkg_a/test/__init__.py", "" )
+  mk_file( f"{root}/pkg_a/test/Dut_test.py",
+           "from pkg_a.Dut import Dut\n" )
+
+  mk_file( f"{root}/pkg_b/__init__.py",   "" )
+  mk_file( f"{root}/pkg_b/utils.py",      "" )
+  mk_file( f"{root}/pkg_b/ModelFL.py",    "from . import utils\n" )
+  mk_file( f"{root}/pkg_b/model-sim",
+           "#!/usr/bin/env python\nfrom pkg_b.ModelFL import ModelFL\n" )
+  mk_file( f"{root}/pkg_b/test/__init__.py", "" )
+  mk_file( f"{root}/pkg_b/test/ModelFL_test.py",
+           "from pkg_b.ModelFL import ModelFL\n" )
+  mk_file( f"{root}/pkg_b/test/model_sim_test.py",
+           "sim = 'model-sim'\n" )
+
+  return root
+
+def rel( root, paths ):
+  return sorted([ os.path.relpath( p, root ) for p in paths ])
+
+#-------------------------------------------------------------------------
+# test_verilog_include_chain
+#-------------------------------------------------------------------------
+
+def test_verilog_include_chain( tmp_path ):
+  root = mk_tree( tmp_path )
+  deps = rel( root, DepMap( root ).deps( f"{root}/pkg_a/test/Dut_test.py" ) )
+
+  assert deps == [
+    "conftest.py",
+    "pkg_a/Dut.py",
+    "pkg_a/Dut.v",
+    "pkg_a/__init__.py",
+    "pkg_a/test/Dut_test.py",
+    "pkg_a/test/__init__.py",
+    "pymtl.ini",
+    "vc/regs.v",
+    "vc/trace.v",
+  ]
+
+#-------------------------------------------------------------------------
+# test_python_imports
+#-------------------------------------------------------------------------
+
+def test_python_imports( tmp_path ):
+  root = mk_tree( tmp_path )
+  deps = rel( root, DepMap( root ).deps( f"{root}/pkg_b/test/ModelFL_test.py" ) )
+
+  assert "pkg_b/ModelFL.py" in deps
+  assert "pkg_b/utils.py"   in deps
+  assert "pkg_a/Dut.v"      not in deps
+  assert "vc/trace.v"       not in deps
+
+#-------------------------------------------------------------------------
+# test_sim_script
+#-------------------------------------------------------------------------
+
+def test_sim_script( tmp_path ):
+  root = mk_tree( tmp_path )
+  deps = rel( root, DepMap( root ).deps( f"{root}/pkg_b/test/model_sim_test.py" ) )
+
+  assert "pkg_b/model-sim"  in deps
+  assert "pkg_b/ModelFL.py" in deps
+  assert "pkg_b/utils.py"   in deps
+
+#-------------------------------------------------------------------------
+# test_fingerprint
+#-------------------------------------------------------------------------
+
+def test_fingerprint( tmp_path ):
+  root = mk_tree( tmp_path )
+
+  dut_test   = f"{root}/pkg_a/test/Dut_test.py"
+  model_test = f"{root}/pkg_b/test/ModelFL_test.py"
+
+  dut_fp   = DepMap( root ).fingerprint( dut_test )
+  model_fp = DepMap( root ).fingerprint( model_test )
+
+  # Changing a file at the end of an include chain only affects the
+  # tests which elaborate it
+
+  mk_file( f"{root}/vc/trace.v", "// changed\n" )
+
+  assert DepMap( root ).fingerprint( dut_test )   != dut_fp
+  assert DepMap( root ).fingerprint( model_test ) == model_fp
+
+  # Extra configuration is folded into the fingerprint
+
+  assert DepMap( root ).fingerprint( model_test, "test_verilog=zeros" ) != model_fp
+
+#-------------------------------------------------------------------------
+# test_result_store
+#-------------------------------------------------------------------------
+
+def test_result_store():
+  store = ResultStore()
+
+  store.record( "a_test.py::test", "fp0", "passed"  )
+  store.record( "b_test.py::test", "fp0", "failed"  )
+  store.record( "c_test.py::test", "fp0", "skipped" )
+
+  assert     store.is_fresh( "a_test.py::test", "fp0" )
+  assert not store.is_fresh( "a_test.py::test", "fp1" )
+  assert not store.is_fresh( "b_test.py::test", "fp0" )
+  assert     store.is_fresh( "c_test.py::test", "fp0" )
+  assert not store.is_fresh( "d_test.py::test", "fp0" )
+
+  # Results survive a round trip through the pytest cache (JSON)
+
+  assert ResultStore( dict( store.results ) ).is_fresh( "a_test.py::test", "fp0" )
+
+#-------------------------------------------------------------------------
+# test_sim_tree
+#-------------------------------------------------------------------------
+# Sanity check the dependency map of the real simulation tree.
+
+sim_dir = find_sim_dir( __file__ )
+
+def deps_of( *test_files ):
+  depmap = DepMap( sim_dir )
+  deps   = set()
+  for test_file in test_files:
+    deps.update( rel( sim_dir, depmap.deps( os.path.join( sim_dir, test_file ) ) ) )
+  return deps
+
+def test_sim_tree_proc_alu():
+
+  deps = deps_of( "proc/test/Proc_rr_test.py" )
+  assert "proc/ProcDpathAlu.v" in deps
+  assert "vc/arithmetic.v"     in deps
+
+  deps = deps_of( "lab1_imul/test/IntMulVar_test.py",
+                  "lab1_imul/test/imul_sim_test.py",
+                  "mlp_xcel/test/mnist_fc_layer_test.py" )
+  assert "lab1_imul/IntMulVar.v" in deps
+  assert "vc/trace.v"            in deps
+  assert "proc/ProcDpathAlu.v"   not in deps
+
+def test_sim_tree_inst_utils():
+
+  deps = deps_of( "proc/test/ProcFL_xcel_test.py" )
+  assert "proc/test/inst_utils.py" in deps
+
+  deps = deps_of( "lab2_xcel/test/SortXcelFL_test.py",
+                  "lab2_xcel/test/SortXcel_test.py",
+                  "lab2_xcel/test/sort_xcel_sim_test.py" )
+  assert "lab2_xcel/SortXcel.v"    in deps
+  assert "lab2_xcel/sort-xcel-sim" in deps
+  assert "proc/test/inst_utils.py" not in deps
@@ -0,0 +1,88 @@
+#=========================================================================
+# mem_staging_test
+#=========================================================================
+
+import struct
+
+import numpy as np
+import pytest
+
+from common.mem_staging import to_bytes, write_array, read_array
+from common.mem_staging import mismatches, check_array
+
+#-------------------------------------------------------------------------
+# ByteMemory
+#-------------------------------------------------------------------------
+# Minimal memory with the same write_mem/read_mem methods as MemoryFL
+# which counts how many times it is accessed.
+
+class ByteMemory:
+
+  def __init__( self, nbytes ):
+    self.mem     = bytearray( nbytes )
+    self.nwrites = 0
+    self.nreads  = 0
+
+  def write_mem( self, addr, data ):
+    self.mem[addr:addr+len(data)] = data
+    self.nwrites += 1
+
+  def read_mem( self, addr, size ):
+    self.nreads += 1
+    return self.mem[addr:addr+size]
+
+#-------------------------------------------------------------------------
+# test_to_bytes
+#-------------------------------------------------------------------------
+
+def test_to_bytes():
+
+  assert to_bytes( b"\x01\x02" ) == b"\x01\x02"
+  assert to_bytes( [ 1, -1 ] ) == struct.pack( "<II", 1, 0xffffffff )
+  assert to_bytes( np.array( [ 1, 2 ], dtype=np.uint16 ) ) == struct.pack( "<HH", 1, 2 )
+  assert to_bytes( np.array( [ 1, 2 ] ), dtype=np.uint8 ) == b"\x01\x02"
+  assert to_bytes( [ 2**32-1, 2**31 ] ) == struct.pack( "<II", 2**32-1, 2**31 )
+
+#-------------------------------------------------------------------------
+# test_roundtrip
+#-------------------------------------------------------------------------
+# A large array goes in and out with one access each.
+
+def test_roundtrip():
+
+  rng  = np.random.default_rng( 0xdeadbeef )
+  data = rng.integers( 0, 2**32, 100000, dtype=np.uint64 ).astype( np.uint32 )
+  mem  = ByteMemory( 0x1000 + 4*len(data) )
+
+  assert write_array( mem, 0x1000, data ) == 4*len(data)
+  assert mem.mem[0x1000:0x1004] == struct.pack( "<I", int(data[0]) )
+
+  result = read_array( mem, 0x1000, len(data) )
+
+  assert result.dtype == np.uint32
+  assert np.array_equal( result, data )
+  assert mem.nwrites == 1 and mem.nreads == 1
+
+  check_array( result, data )
+
+#-------------------------------------------------------------------------
+# test_check_array
+#-------------------------------------------------------------------------
+
+def test_check_array():
+
+  result = np.array( [ 1, 2, 3, 4 ], dtype=np.uint32 )
+
+  check_array( result, [ 1, 2, 3, 4 ] )
+  assert list( mismatches( result, [ 1, 0, 3, 0 ] ) ) == [ 1, 3 ]
+
+  with pytest.raises( AssertionError, match="2 of 4 elements" ):
+    check_array( result, [ 1, 0, 3, 0 ] )
+
+  with pytest.raises( AssertionError, match="but the reference has shape" ):
+    check_array( result, [ 1, 2, 3 ] )
+
+  # Mismatches in multi-dimensional arrays use flat indices
+
+  with pytest.raises( AssertionError, match=r"\[3\] expected 0x0 got 0x4" ):
+    check_array( result.reshape( 2, 2 ), [ [ 1, 2 ], [ 3, 0 ] ] )
@@ -0,0 +1,122 @@
+#=========================================================================
+# stream_test
+#=========================================================================
+
+import pytest
+
+from itertools import islice
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import run_sim
+
+from common.stream import LazyStreamSourceFL, LazyStreamSinkFL
+from common.stream import LazyStreamSinkError, MsgReader
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+
+class TestHarness( Component ):
+
+  def construct( s ):
+
+    s.src  = LazyStreamSourceFL( Bits32 )
+    s.sink = LazyStreamSinkFL( Bits32 )
+
+    s.src.ostream //= s.sink.istream
+
+  def done( s ):
+    return s.src.done() and s.sink.done()
+
+  def line_trace( s ):
+    return s.src.line_trace() + " > " + s.sink.line_trace()
+
+def run_test( src_msgs, sink_msgs, cmdline_opts, src_delay=0, sink_delay=0,
+              reorder_window=0 ):
+
+  th = TestHarness()
+
+  th.set_param( "top.src.construct", msgs=src_msgs,
+                initial_delay=src_delay, interval_delay=src_delay )
+  th.set_param( "top.sink.construct", msgs=sink_msgs,
+                initial_delay=sink_delay, interval_delay=sink_delay,
+                reorder_window=reorder_window )
+
+  run_sim( th, cmdline_opts )
+
+#-------------------------------------------------------------------------
+# test_reader
+#-------------------------------------------------------------------------
+
+def test_reader():
+
+  for msgs in [ [ 1, 2, 3 ], iter([ 1, 2, 3 ]) ]:
+    reader = MsgReader( Bits32, msgs )
+    reader.reset()
+    assert [ reader.pop() for _ in range(3) ] == [ b32(1), b32(2), b32(3) ]
+    assert reader.empty()
+
+  # Only a sequence can be rewound
+
+  reader = MsgReader( Bits32, [ 1, 2 ] )
+  reader.pop()
+  reader.reset()
+  assert reader.peek() == b32(1)
+
+  reader = MsgReader( Bits32, iter([ 1, 2 ]) )
+  reader.pop()
+  with pytest.raises( AssertionError ):
+    reader.reset()
+
+#-------------------------------------------------------------------------
+# test_iter
+#-------------------------------------------------------------------------
+# Messages pulled from generators.
+
+@pytest.mark.parametrize( "src_delay, sink_delay", [ (0,0), (3,0), (0,3) ] )
+def test_iter( src_delay, sink_delay, cmdline_opts ):
+  run_test( ( i*3 for i in range(100) ), islice( range(0,1000,3), 100 ),
+            cmdline_opts, src_delay, sink_delay )
+
+#-------------------------------------------------------------------------
+# test_reorder
+#-------------------------------------------------------------------------
+# Every pair of messages is swapped, which a window of one accepts.
+
+def test_reorder( cmdline_opts ):
+
+  msgs     = list( range(20) )
+  swapped  = [ msgs[i^1] for i in range(20) ]
+
+  run_test( swapped, iter( msgs ), cmdline_opts, reorder_window=1 )
+
+  with pytest.raises( LazyStreamSinkError ):
+    run_test( swapped, iter( msgs ), cmdline_opts )
+
+def test_reorder_window( cmdline_opts ):
+
+  # Message 3 arrives first, which is too far ahead for a window of two
+
+  msgs = [ 3, 0, 1, 2 ]
+
+  run_test( msgs, [ 0, 1, 2, 3 ], cmdline_opts, reorder_window=3 )
+
+  with pytest.raises( LazyStreamSinkError ):
+    run_test( msgs, [ 0, 1, 2, 3 ], cmdline_opts, reorder_window=2 )
+
+#-------------------------------------------------------------------------
+# test_extra_msgs
+#-------------------------------------------------------------------------
+# A source which sends more messages than expected is an error, even
+# after the sink received every expected message.
+
+@pytest.mark.parametrize( "sink_delay", [ 0, 3 ] )
+def test_extra_msgs( sink_delay, cmdline_opts ):
+
+  with pytest.raises( LazyStreamSinkError ):
+    run_test( [ 0, 1, 2, 3 ], iter([ 0, 1, 2 ]), cmdline_opts,
+              sink_delay=sink_delay )
+
+  with pytest.raises( LazyStreamSinkError ):
+    run_test( [ 0, 1, 2, 3 ], [ 0, 1, 2 ], cmdline_opts,
+              sink_delay=sink_delay, reorder_window=2 )
@@ -0,0 +1,62 @@
+#=========================================================================
+# sweep_test
+#=========================================================================
+
+import io
+import os
+
+from common.sweep import SweepError, run_parallel, print_table, report_errors
+
+#-------------------------------------------------------------------------
+# Worker functions
+#-------------------------------------------------------------------------
+
+def square( x ):
+  return x*x
+
+def fail_on_three( x ):
+  if x == 3:
+    raise ValueError( "three" )
+  return os.getpid()
+
+#-------------------------------------------------------------------------
+# test_run_parallel
+#-------------------------------------------------------------------------
+
+def test_run_parallel():
+  assert run_parallel( square, range(10), jobs=1 ) == [ x*x for x in range(10) ]
+  assert run_parallel( square, range(10), jobs=4 ) == [ x*x for x in range(10) ]
+
+def test_run_parallel_errors():
+
+  results = run_parallel( fail_on_three, range(6), jobs=2 )
+
+  assert isinstance( results[3], SweepError )
+  assert "ValueError: three" in results[3].msg
+  assert all( isinstance( r, int ) for i, r in enumerate( results ) if i != 3 )
+
+  # Results really came from worker processes
+
+  assert os.getpid() not in results
+
+  out = io.StringIO()
+  assert report_errors( results, file=out ) == 1
+  assert "design point 3 failed" in out.getvalue()
+
+#-------------------------------------------------------------------------
+# test_print_table
+#-------------------------------------------------------------------------
+
+def test_print_table():
+
+  out = io.StringIO()
+  print_table( [ "impl", "cycles", "cycles/mul" ],
+               [ [ "fl",  59,  1.18 ],
+                 [ "var", 1234, 24.5 ] ], file=out )
+
+  assert out.getvalue().splitlines() == [
+    "impl  cycles  cycles/mul",
+    "----  ------  ----------",
+    "fl        59        1.18",
+    "var     1234       24.50",
+  ]
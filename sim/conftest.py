@@ -2,11 +2,46 @@
 # conftest
 #=========================================================================
 
+import os
 import pytest
 import random
 
+from common.impact import ImpactPlugin
+
 @pytest.fixture(autouse=True)
 def fix_randseed():
   """Set the random seed prior to each test case."""
   random.seed(0xdeadbeef)
 
+#-------------------------------------------------------------------------
+# Test impact analysis
+#-------------------------------------------------------------------------
+# Every run records the outcome of each test along with a fingerprint of
+# the files its test module depends on (see common/impact.py). With
+# --impact we only run the tests whose inputs changed since the last
+# recorded run or which did not pass last time.
+
+def pytest_addoption( parser ):
+  parser.addoption( "--impact", action="store_true",
+    help="only run tests whose inputs changed since the last recorded run" )
+
+def pytest_configure( config ):
+
+  # Results are persisted in the pytest cache, so there is nothing to do
+  # if the cache provider is disabled
+
+  if getattr( config, "cache", None ) is None:
+    return
+
+  # Options which change what a test actually does are folded into the
+  # fingerprint, so a run with --test-verilog does not count for a later
+  # run without it
+
+  extra = ",".join([ f"{opt}={config.getoption( opt, default='' )}"
+                     for opt in [ "test_verilog", "dump_vtb" ] ])
+
+  sim_dir = os.path.dirname( os.path.abspath( __file__ ) )
+
+  config.pluginmanager.register(
+    ImpactPlugin( config.cache, sim_dir, config.getoption("impact"), extra ),
+    "impact" )
@@ -0,0 +1,504 @@
+//=========================================================================
+// Integer Multiplier Radix-4 Booth Implementation
+//=========================================================================
+// Iterative multiplier which retires one radix-4 Booth digit (i.e., two
+// bits of b) per cycle. We keep b in a 33-bit register together with the
+// bit which was last shifted out, so the low three bits of the register
+// are always the current Booth group {b[1],b[0],b[-1]}, and we shift b
+// arithmetically so the digits are those of b as a signed number (the
+// low 32 bits of the product are the same either way).
+//
+// Booth digits are only nonzero where neighboring bits of b differ, so
+// we reuse IntMulVarCalcShamt on the bit transitions of b to skip runs of
+// zero digits: each CALC step adds the current digit times a (if it is
+// nonzero) and then shifts past the current digit and any zero digits
+// after it. The multiply is done as soon as there are no transitions
+// left, which means long runs of ones finish as quickly as long runs of
+// zeros.
+
+`ifndef LAB1_IMUL_INT_MUL_BOOTH_V
+`define LAB1_IMUL_INT_MUL_BOOTH_V
+
+`include "vc/trace.v"
+
+`include "vc/muxes.v"
+`include "vc/regs.v"
+`include "vc/arithmetic.v"
+`include "lab1_imul/IntMulVarCalcShamt.v"
+
+//========================================================================
+// Integer Multiplier Radix-4 Booth Datapath
+//========================================================================
+
+module lab1_imul_IntMulBoothDpath
+(
+  input  logic        clk,
+  input  logic        reset,
+
+  // Data signals
+
+  input  logic [31:0] istream_msg_a,
+  input  logic [31:0] istream_msg_b,
+  output logic [31:0] ostream_msg,
+
+  // Control signals (ctrl -> dpath)
+
+  input  logic        a_mux_sel,
+  input  logic        b_mux_sel,
+  input  logic        result_mux_sel,
+  input  logic        result_reg_en,
+  input  logic        add_mux_sel,
+
+  // Status signals (dpath -> ctrl)
+
+  output logic        is_digit_nonzero,
+  output logic        is_calc_done
+);
+
+  // B mux (b is loaded with a zero below the least significant bit)
+
+  logic [32:0] rshifter_out;
+  logic [32:0] b_mux_out;
+
+  vc_Mux2#(33) b_mux
+  (
+   .sel (b_mux_sel),
+   .in0 (rshifter_out),
+   .in1 ({istream_msg_b,1'b0}),
+   .out (b_mux_out)
+  );
+
+  // B register
+
+  logic [32:0] b_reg_out;
+
+  vc_Reg#(33) b_reg
+  (
+   .clk (clk),
+   .d   (b_mux_out),
+   .q   (b_reg_out)
+  );
+
+  // Bit transitions (bit i is set if b[i] and b[i-1] differ)
+
+  logic [31:0] trans;
+
+  assign trans = b_reg_out[32:1] ^ b_reg_out[31:0];
+
+  // Transition zero comparator
+
+  vc_ZeroComparator#(32) trans_zero_cmp
+  (
+   .in  (trans),
+   .out (is_calc_done)
+  );
+
+  // Booth digit decoding. The digit -2*b[1] + b[0] + b[-1] is zero when
+  // all three bits are equal, two when only the upper pair differs, and
+  // one otherwise; it is negative when b[1] is set.
+
+  logic digit_neg;
+  logic digit_dbl;
+
+  assign is_digit_nonzero = trans[1] | trans[0];
+  assign digit_neg        = b_reg_out[2];
+  assign digit_dbl        = trans[1] & ~trans[0];
+
+  // Calculate shift amount. The shifter looks for the next nonzero digit
+  // in the transitions after the current digit if the current digit is
+  // nonzero, or in the transitions starting at the current digit
+  // otherwise. Digits are two bits apart, so we round the shift amount
+  // IntMulVarCalcShamt gives us down to an even number of bits.
+
+  logic [3:0] calc_shamt_cur_out;
+  logic [3:0] calc_shamt_next_out;
+
+  lab1_imul_IntMulVarCalcShamt calc_shamt_cur
+  (
+   .in_ (trans[7:0]),
+   .out (calc_shamt_cur_out)
+  );
+
+  lab1_imul_IntMulVarCalcShamt calc_shamt_next
+  (
+   .in_ (trans[9:2]),
+   .out (calc_shamt_next_out)
+  );
+
+  logic [3:0] skip_cur;
+  logic [3:0] skip_next;
+  logic [3:0] shamt;
+
+  assign skip_cur  = ( calc_shamt_cur_out  == 4'd1 ) ? 4'd0 : { calc_shamt_cur_out[3:1],  1'b0 };
+  assign skip_next = ( calc_shamt_next_out == 4'd1 ) ? 4'd0 : { calc_shamt_next_out[3:1], 1'b0 };
+
+  vc_Mux2#(4) shamt_mux
+  (
+   .sel (is_digit_nonzero),
+   .in0 (skip_cur),
+   .in1 (skip_next + 4'd2),
+   .out (shamt)
+  );
+
+  // Right arithmetic shifter
+
+  assign rshifter_out = $signed(b_reg_out) >>> shamt;
+
+  // A mux
+
+  logic [31:0] lshifter_out;
+  logic [31:0] a_mux_out;
+
+  vc_Mux2#(32) a_mux
+  (
+   .sel (a_mux_sel),
+   .in0 (lshifter_out),
+   .in1 (istream_msg_a),
+   .out (a_mux_out)
+  );
+
+  // A register
+
+  logic [31:0] a_reg_out;
+
+  vc_Reg#(32) a_reg
+  (
+   .clk (clk),
+   .d   (a_mux_out),
+   .q   (a_reg_out)
+  );
+
+  // Left shifter
+
+  vc_LeftLogicalShifter#(32,4) lshifter
+  (
+   .in    (a_reg_out),
+   .shamt (shamt),
+   .out   (lshifter_out)
+  );
+
+  // Multiple mux (a or 2a)
+
+  logic [31:0] multiple_mux_out;
+
+  vc_Mux2#(32) multiple_mux
+  (
+   .sel (digit_dbl),
+   .in0 (a_reg_out),
+   .in1 ({a_reg_out[30:0],1'b0}),
+   .out (multiple_mux_out)
+  );
+
+  // Result mux
+
+  logic [31:0] add_mux_out;
+  logic [31:0] result_mux_out;
+
+  vc_Mux2#(32) result_mux
+  (
+   .sel (result_mux_sel),
+   .in0 (add_mux_out),
+   .in1 (32'b0),
+   .out (result_mux_out)
+  );
+
+  // Result register
+
+  logic [31:0] result_reg_out;
+
+  vc_EnReg#(32) result_reg
+  (
+   .clk   (clk),
+   .reset (reset),
+   .en    (result_reg_en),
+   .d     (result_mux_out),
+   .q     (result_reg_out)
+  );
+
+  // Adder (negative digits subtract by inverting and carrying in one)
+
+  logic [31:0] add_out;
+
+  vc_Adder#(32) add
+  (
+   .in0  (multiple_mux_out ^ {32{digit_neg}}),
+   .in1  (result_reg_out),
+   .cin  (digit_neg),
+   .out  (add_out),
+   .cout ()
+  );
+
+  // Add mux
+
+  vc_Mux2#(32) add_mux
+  (
+   .sel (add_mux_sel),
+   .in0 (add_out),
+   .in1 (result_reg_out),
+   .out (add_mux_out)
+  );
+
+  // Connect to output port
+
+  assign ostream_msg = result_reg_out;
+
+endmodule
+
+//========================================================================
+// Integer Multiplier Radix-4 Booth Control Unit
+//========================================================================
+
+module lab1_imul_IntMulBoothCtrl
+(
+  input  logic clk,
+  input  logic reset,
+
+  // Dataflow signals
+
+  input  logic istream_val,
+  output logic istream_rdy,
+
+  output logic ostream_val,
+  input  logic ostream_rdy,
+
+  // Control signals (ctrl -> dpath)
+
+  output logic a_mux_sel,
+  output logic b_mux_sel,
+  output logic result_mux_sel,
+  output logic result_reg_en,
+  output logic add_mux_sel,
+
+  // Status signals (dpath -> ctrl)
+
+  input  logic is_digit_nonzero,
+  input  logic is_calc_done
+);
+
+  //----------------------------------------------------------------------
+  // State
+  //----------------------------------------------------------------------
+
+  localparam STATE_IDLE = 2'd0;
+  localparam STATE_CALC = 2'd1;
+  localparam STATE_DONE = 2'd2;
+
+  logic [1:0] state_reg;
+  logic [1:0] state_next;
+
+  always @( posedge clk ) begin
+    if ( reset )
+      state_reg <= STATE_IDLE;
+    else
+      state_reg <= state_next;
+  end
+
+  //----------------------------------------------------------------------
+  // State Transitions
+  //----------------------------------------------------------------------
+
+  logic istream_go;
+  logic ostream_go;
+
+  assign istream_go   = istream_val && istream_rdy;
+  assign ostream_go   = ostream_val && ostream_rdy;
+
+  always @(*) begin
+
+    state_next = state_reg;
+
+    case ( state_reg )
+
+      STATE_IDLE: if ( istream_go   ) state_next = STATE_CALC;
+      STATE_CALC: if ( is_calc_done ) state_next = STATE_DONE;
+      STATE_DONE: if ( ostream_go   ) state_next = STATE_IDLE;
+      default:                        state_next = STATE_IDLE;
+
+    endcase
+
+  end
+
+  //----------------------------------------------------------------------
+  // State Outputs
+  //----------------------------------------------------------------------
+
+  localparam a_x     = 1'd0;
+  localparam a_lsh   = 1'd0;
+  localparam a_ld    = 1'd1;
+
+  localparam b_x     = 1'd0;
+  localparam b_rsh   = 1'd0;
+  localparam b_ld    = 1'd1;
+
+  localparam res_x   = 1'd0;
+  localparam res_add = 1'd0;
+  localparam res_0   = 1'd1;
+
+  localparam add_x   = 1'd0;
+  localparam add_add = 1'd0;
+  localparam add_res = 1'd1;
+
+  task cs
+  (
+    input cs_istream_rdy,
+    input cs_ostream_val,
+    input cs_a_mux_sel,
+    input cs_b_mux_sel,
+    input cs_result_mux_sel,
+    input cs_result_reg_en,
+    input cs_add_mux_sel
+  );
+  begin
+    istream_rdy    = cs_istream_rdy;
+    ostream_val    = cs_ostream_val;
+    a_mux_sel      = cs_a_mux_sel;
+    b_mux_sel      = cs_b_mux_sel;
+    result_mux_sel = cs_result_mux_sel;
+    result_reg_en  = cs_result_reg_en;
+    add_mux_sel    = cs_add_mux_sel;
+  end
+  endtask
+
+  // Labels for Mealy transistions
+
+  logic do_sh_add;
+  logic do_sh;
+
+  assign do_sh_add = (is_digit_nonzero == 1); // do shift and add
+  assign do_sh     = (is_digit_nonzero == 0); // do shift but no add
+
+  // Set outputs using a control signal "table"
+
+  always @(*) begin
+
+    //                             in  out a mux  b mux  res mux  res add mux  cntr cntr
+    //                             rdy val sel    sel    sel      en  sel      rst  inc
+                                   cs( 0,  0,  a_x,   b_x,   res_x,   0,  add_x    );
+    case ( state_reg )
+      STATE_IDLE:                  cs( 1,  0,  a_ld,  b_ld,  res_0,   1,  add_x    );
+      STATE_CALC: if ( do_sh_add ) cs( 0,  0,  a_lsh, b_rsh, res_add, 1,  add_add  );
+             else if ( do_sh )     cs( 0,  0,  a_lsh, b_rsh, res_add, 1,  add_res  );
+      STATE_DONE:                  cs( 0,  1,  a_x,   b_x,   res_x,   0,  add_x    );
+      default:                     cs( 0,  0,  a_x,   b_x,   res_x,   0,  add_x    );
+
+    endcase
+
+  end
+
+endmodule
+
+//=========================================================================
+// Integer Multiplier Radix-4 Booth Implementation
+//=========================================================================
+
+module lab1_imul_IntMulBooth
+(
+  input  logic        clk,
+  input  logic        reset,
+
+  input  logic        istream_val,
+  output logic        istream_rdy,
+  input  logic [63:0] istream_msg,
+
+  output logic        ostream_val,
+  input  logic        ostream_rdy,
+  output logic [31:0] ostream_msg
+);
+
+  // Control signals
+
+  logic a_mux_sel;
+  logic b_mux_sel;
+  logic result_mux_sel;
+  logic result_reg_en;
+  logic add_mux_sel;
+
+  // Status signals
+
+  logic is_digit_nonzero;
+  logic is_calc_done;
+
+  logic [31:0] product;
+
+  // Instantiate and connect datapath
+
+  lab1_imul_IntMulBoothDpath dpath
+  (
+    .istream_msg_a (istream_msg[63:32]),
+    .istream_msg_b (istream_msg[31: 0]),
+    .ostream_msg   (product),
+    .*
+  );
+
+  // Instantiate and connect control unit
+
+  lab1_imul_IntMulBoothCtrl ctrl
+  (
+    .*
+  );
+
+  assign ostream_msg = product & {32{ostream_val}};
+
+  //----------------------------------------------------------------------
+  // Line Tracing
+  //----------------------------------------------------------------------
+
+  `ifndef SYNTHESIS
+
+  logic [`VC_TRACE_NBITS-1:0] str;
+  `VC_TRACE_BEGIN
+  begin
+
+    $sformat( str, "%x", istream_msg );
+    vc_trace.append_val_rdy_str( trace_str, istream_val, istream_rdy, str );
+
+    vc_trace.append_str( trace_str, "(" );
+
+    $sformat( str, "%x", dpath.a_reg_out );
+    vc_trace.append_str( trace_str, str );
+    vc_trace.append_str( trace_str, " " );
+
+    $sformat( str, "%x", dpath.b_reg_out[32:1] );
+    vc_trace.append_str( trace_str, str );
+    vc_trace.append_str( trace_str, " " );
+
+    $sformat( str, "%x", dpath.result_reg_out );
+    vc_trace.append_str( trace_str, str );
+    vc_trace.append_str( trace_str, " " );
+
+    case ( ctrl.state_reg )
+      ctrl.STATE_IDLE:
+        vc_trace.append_str( trace_str, "I " );
+
+      ctrl.STATE_CALC:
+      begin
+        if ( ctrl.do_sh_add )
+          vc_trace.append_str( trace_str, "C+" );
+        else if ( ctrl.do_sh )
+          vc_trace.append_str( trace_str, "C " );
+        else
+          vc_trace.append_str( trace_str, "C?" );
+      end
+
+      ctrl.STATE_DONE:
+        vc_trace.append_str( trace_str, "D " );
+
+      default:
+        vc_trace.append_str( trace_str, "? " );
+
+    endcase
+
+    vc_trace.append_str( trace_str, ")" );
+
+    $sformat( str, "%x", ostream_msg );
+    vc_trace.append_val_rdy_str( trace_str, ostream_val, ostream_rdy, str );
+
+  end
+  `VC_TRACE_END
+
+  `endif /* SYNTHESIS */
+
+endmodule
+
+`endif /* LAB1_IMUL_INT_MUL_BOOTH_V */
+
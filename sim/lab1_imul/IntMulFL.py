@@ -2,6 +2,8 @@
 # Integer Multiplier FL Model
 #=========================================================================
 
+import numpy as np
+
 from pymtl3 import *
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
 from pymtl3.stdlib.stream      import IStreamDeqAdapterFL, OStreamEnqAdapterFL
@@ -38,3 +40,73 @@ class IntMulFL( Component ):
   def line_trace( s ):
     return f"{s.istream}(){s.ostream}"
 
+
+#=========================================================================
+# Bulk golden model
+#=========================================================================
+# Vectorized version of the FL model for building and checking large
+# datasets. Operands can be anything NumPy can turn into an integer array
+# (lists of ints, NumPy arrays, etc.) and are truncated to 32 bits just
+# like mk_imsg does. Packed request messages are uint64 arrays with a in
+# the upper 32 bits and b in the lower 32 bits, and response messages are
+# uint32 arrays, so they can be handed to the stream source/sink directly.
+
+#-------------------------------------------------------------------------
+# to_uint32
+#-------------------------------------------------------------------------
+
+def to_uint32( x ):
+  x = np.asarray( x )
+  if x.dtype == np.uint32:
+    return x
+  if x.dtype.kind == 'u':
+    return ( x & 0xffffffff ).astype( np.uint32 )
+  if x.dtype.kind == 'i':
+    return ( x.astype( np.int64 ) & 0xffffffff ).astype( np.uint32 )
+
+  # Fall back to Python ints for Bits and ints wider than 64 bits
+
+  return np.array( [ int(v) & 0xffffffff for v in x.ravel() ],
+                   dtype=np.uint32 ).reshape( x.shape )
+
+#-------------------------------------------------------------------------
+# imul_bulk
+#-------------------------------------------------------------------------
+# Products truncated to 32 bits. Unsigned 32-bit multiplication wraps
+# around, which is exactly the truncation we want; since truncation does
+# not care about signedness this works for signed operands too.
+
+def imul_bulk( a, b ):
+  return to_uint32( a ) * to_uint32( b )
+
+#-------------------------------------------------------------------------
+# mk_imsgs_bulk/mk_omsgs_bulk
+#-------------------------------------------------------------------------
+
+def mk_imsgs_bulk( a, b ):
+  a = to_uint32( a ).astype( np.uint64 )
+  b = to_uint32( b ).astype( np.uint64 )
+  return ( a << np.uint64(32) ) | b
+
+def mk_omsgs_bulk( a, b ):
+  return imul_bulk( a, b )
+
+#-------------------------------------------------------------------------
+# unpack_imsgs_bulk
+#-------------------------------------------------------------------------
+
+def unpack_imsgs_bulk( imsgs ):
+  imsgs = np.asarray( imsgs, dtype=np.uint64 )
+  a = ( imsgs >> np.uint64(32) ).astype( np.uint32 )
+  b = ( imsgs & np.uint64(0xffffffff) ).astype( np.uint32 )
+  return a, b
+
+#-------------------------------------------------------------------------
+# check_bulk
+#-------------------------------------------------------------------------
+# Returns the indices of the response messages which do not match the
+# golden model for the corresponding request messages.
+
+def check_bulk( imsgs, omsgs ):
+  ref = imul_bulk( *unpack_imsgs_bulk( imsgs ) )
+  return np.flatnonzero( ref != to_uint32( omsgs ) )
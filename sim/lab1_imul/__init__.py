@@ -6,4 +6,5 @@ from lab1_imul.IntMulFL     import IntMulFL
 from lab1_imul.IntMulScycle import IntMulScycle
 from lab1_imul.IntMulFixed  import IntMulFixed
 from lab1_imul.IntMulVar    import IntMulVar
+from lab1_imul.IntMulBooth  import IntMulBooth
 
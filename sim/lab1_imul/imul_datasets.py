@@ -0,0 +1,272 @@
+#=========================================================================
+# imul_datasets
+#=========================================================================
+# Operand datasets for evaluating the multipliers. Each dataset is stored
+# as a pair of compact binary NumPy files holding the packed 64-bit
+# request messages and the 32-bit response messages, plus a small JSON
+# file recording how it was generated (kind, number of messages, seed).
+# A dataset is generated on first use and memory-mapped on every later
+# load, so we only ever touch the messages we actually simulate and large
+# throughput runs do not need to fit the dataset in a Python list.
+#
+#  >>> ds = load_dataset( "sparse", 1000000 )
+#  >>> ds.imsgs[0], ds.omsgs[0]
+#
+# By default datasets are stored in imul-datasets in the current working
+# directory (i.e., the build directory); set IMUL_DATASET_DIR to share
+# them between build directories.
+
+import json
+import os
+
+import numpy as np
+
+from lab1_imul.IntMulFL import mk_imsgs_bulk, mk_omsgs_bulk
+
+# Bump this whenever the generators change so stale files get rebuilt
+
+dataset_version = 1
+
+default_seed = 0xdeadbeef
+
+# Messages are generated in chunks so we never need the whole dataset in
+# memory; the chunk size is part of the recipe so do not change it
+# without bumping dataset_version
+
+chunk_size = 1 << 20
+
+#-------------------------------------------------------------------------
+# Operand generators
+#-------------------------------------------------------------------------
+# Each generator takes a number of operand pairs and a NumPy random
+# generator and returns the two operand arrays.
+
+def rand_u32( rng, n ):
+  return rng.integers( 0, 0x100000000, n, dtype=np.uint64 )
+
+def rand_shamt( rng, n, hi ):
+  return rng.integers( 0, hi+1, n, dtype=np.uint64 )
+
+def gen_small( n, rng ):
+  return rng.integers( 0, 101, n ), rng.integers( 0, 101, n )
+
+def gen_large( n, rng ):
+  return rand_u32( rng, n ), rand_u32( rng, n )
+
+def gen_lomask( n, rng ):
+  a = rand_u32( rng, n ) << rand_shamt( rng, n, 16 )
+  b = rand_u32( rng, n ) << rand_shamt( rng, n, 16 )
+  return a, b
+
+def gen_himask( n, rng ):
+  a = rand_u32( rng, n ) >> rand_shamt( rng, n, 16 )
+  b = rand_u32( rng, n ) >> rand_shamt( rng, n, 16 )
+  return a, b
+
+def gen_lohimask( n, rng ):
+  a = ( ( rand_u32( rng, n ) & 0xffffff ) >> rand_shamt( rng, n, 12 ) ) << rand_shamt( rng, n, 12 )
+  b = ( ( rand_u32( rng, n ) & 0xffffff ) >> rand_shamt( rng, n, 12 ) ) << rand_shamt( rng, n, 12 )
+  return a, b
+
+# Each bit is cleared with probability 1/2
+
+def gen_sparse( n, rng ):
+  a = rand_u32( rng, n ) & rand_u32( rng, n )
+  b = rand_u32( rng, n ) & rand_u32( rng, n )
+  return a, b
+
+generators = {
+  "small"    : gen_small,
+  "large"    : gen_large,
+  "lomask"   : gen_lomask,
+  "himask"   : gen_himask,
+  "lohimask" : gen_lohimask,
+  "sparse"   : gen_sparse,
+}
+
+dataset_kinds = list( generators.keys() )
+
+def gen_operands( kind, n, rng ):
+  return generators[kind]( n, rng )
+
+#=========================================================================
+# Dataset
+#=========================================================================
+# A loaded dataset. imsgs and omsgs are read-only memory-mapped arrays
+# which can be handed to the lazy stream source/sink directly.
+
+class Dataset:
+
+  def __init__( self, name, imsgs, omsgs, info ):
+    self.name  = name
+    self.imsgs = imsgs
+    self.omsgs = omsgs
+    self.info  = info
+
+  def __len__( self ):
+    return len( self.imsgs )
+
+  def operands( self ):
+    imsgs = np.asarray( self.imsgs )
+    return imsgs >> np.uint64(32), imsgs & np.uint64(0xffffffff)
+
+#-------------------------------------------------------------------------
+# dataset_dir
+#-------------------------------------------------------------------------
+
+def dataset_dir():
+  return os.environ.get( "IMUL_DATASET_DIR",
+                         os.path.join( os.getcwd(), "imul-datasets" ) )
+
+#-------------------------------------------------------------------------
+# gen_dataset
+#-------------------------------------------------------------------------
+# Generate a dataset straight into memory-mapped files. We write to
+# temporary files and rename them into place at the end so concurrent
+# simulator processes never see a half-written dataset.
+
+def gen_dataset( prefix, kind, n, seed ):
+
+  rng  = np.random.default_rng( seed )
+  info = { "kind": kind, "n": n, "seed": seed, "version": dataset_version }
+
+  tmp_suffix = f".tmp{os.getpid()}"
+
+  imsgs = np.lib.format.open_memmap( prefix + ".imsgs.npy" + tmp_suffix,
+                                     mode="w+", dtype=np.uint64, shape=(n,) )
+  omsgs = np.lib.format.open_memmap( prefix + ".omsgs.npy" + tmp_suffix,
+                                     mode="w+", dtype=np.uint32, shape=(n,) )
+
+  for i in range( 0, n, chunk_size ):
+    a, b = gen_operands( kind, min( chunk_size, n-i ), rng )
+    imsgs[i:i+len(a)] = mk_imsgs_bulk( a, b )
+    omsgs[i:i+len(a)] = mk_omsgs_bulk( a, b )
+
+  imsgs.flush()
+  omsgs.flush()
+  del imsgs, omsgs
+
+  with open( prefix + ".json" + tmp_suffix, "w" ) as f:
+    json.dump( info, f )
+
+  # The JSON file goes last since its presence marks a complete dataset
+
+  for ext in [ ".imsgs.npy", ".omsgs.npy", ".json" ]:
+    os.replace( prefix + ext + tmp_suffix, prefix + ext )
+
+#-------------------------------------------------------------------------
+# load_dataset
+#-------------------------------------------------------------------------
+# Load the dataset of the given kind with n messages, generating it first
+# if it does not exist yet (or was generated with a different recipe).
+
+def load_dataset( kind, n=50, seed=default_seed, data_dir=None ):
+
+  if kind not in generators:
+    raise ValueError( f"unknown dataset kind {kind} "
+                      f"(expected one of {','.join(dataset_kinds)})" )
+
+  data_dir = data_dir or dataset_dir()
+  os.makedirs( data_dir, exist_ok=True )
+
+  name   = f"{kind}-{n}-{seed:x}"
+  prefix = os.path.join( data_dir, name )
+  info   = { "kind": kind, "n": n, "seed": seed, "version": dataset_version }
+
+  try:
+    with open( prefix + ".json" ) as f:
+      stale = ( json.load( f ) != info )
+  except ( OSError, ValueError ):
+    stale = True
+
+  if stale:
+    gen_dataset( prefix, kind, n, seed )
+
+  imsgs = np.load( prefix + ".imsgs.npy", mmap_mode="r" )
+  omsgs = np.load( prefix + ".omsgs.npy", mmap_mode="r" )
+
+  return Dataset( name, imsgs, omsgs, info )
+
+#=========================================================================
+# Operand traces
+#=========================================================================
+# pmx-sim --mul-trace records the operands of every mul instruction the
+# FL processor executes while stats are enabled. A trace file is simply a
+# flat array of little-endian uint32 (a, b) pairs with no header, so it
+# can be appended to as the program runs and memory-mapped when we replay
+# it in imul-sim with --input trace:<file>.
+
+trace_dtype = np.dtype( "<u4" )
+
+#-------------------------------------------------------------------------
+# MulTraceWriter
+#-------------------------------------------------------------------------
+# Buffers operand pairs and appends them to the trace file in blocks so
+# recording a long program does not do one write per multiply.
+
+class MulTraceWriter:
+
+  def __init__( self, path, bufsize=1<<16 ):
+    self.path    = path
+    self.file    = open( path, "wb" )
+    self.buf     = []
+    self.bufsize = bufsize
+    self.nmuls   = 0
+
+  def append( self, a, b ):
+    self.buf.append( int(a) & 0xffffffff )
+    self.buf.append( int(b) & 0xffffffff )
+    self.nmuls += 1
+    if len( self.buf ) >= 2*self.bufsize:
+      self.flush()
+
+  def flush( self ):
+    np.array( self.buf, dtype=trace_dtype ).tofile( self.file )
+    self.file.flush()
+    self.buf = []
+
+  def close( self ):
+    self.flush()
+    self.file.close()
+
+#-------------------------------------------------------------------------
+# load_trace
+#-------------------------------------------------------------------------
+# Turn a trace file into a dataset with the first n multiplies (or all of
+# them if n is None). The request and response messages are built in
+# memory, which is fine since a trace is read once per simulation.
+
+def load_trace( path, n=None ):
+
+  nbytes = os.path.getsize( path )
+  if nbytes % ( 2*trace_dtype.itemsize ) != 0:
+    raise ValueError( f"{path} is not a mul trace (size {nbytes} is not "
+                      f"a multiple of {2*trace_dtype.itemsize} bytes)" )
+
+  if nbytes == 0:
+    pairs = np.zeros( (0,2), dtype=trace_dtype )
+  else:
+    pairs = np.memmap( path, dtype=trace_dtype, mode="r" ).reshape( -1, 2 )
+
+  if n is not None:
+    pairs = pairs[:n]
+
+  a, b = pairs[:,0], pairs[:,1]
+
+  name = "trace-" + os.path.splitext( os.path.basename( path ) )[0]
+  info = { "kind": "trace", "path": os.path.abspath( path ), "n": len(a) }
+
+  return Dataset( name, mk_imsgs_bulk( a, b ), mk_omsgs_bulk( a, b ), info )
+
+#-------------------------------------------------------------------------
+# load_input
+#-------------------------------------------------------------------------
+# Load the input for a simulator run: either trace:<file> or the name of
+# a dataset kind, in which case n defaults to 50 messages.
+
+def load_input( input_, n=None, seed=default_seed, data_dir=None ):
+
+  if input_.startswith( "trace:" ):
+    return load_trace( input_[len("trace:"):], n )
+
+  return load_dataset( input_, 50 if n is None else n, seed, data_dir )
@@ -0,0 +1,200 @@
+#=========================================================================
+# imul_perf_model
+#=========================================================================
+# Analytical cycle model of the multipliers. Instead of simulating the
+# RTL we compute when each message is accepted and when its result is
+# sent directly from the operands and the source/sink delays, which makes
+# it cheap to estimate performance on operand traces with millions of
+# entries. The model covers two kinds of microarchitecture:
+#
+#  - FSM (IntMulFixed, IntMulVar, IntMulBooth): IDLE accepts a message,
+#    CALC runs until the result is ready, and DONE waits for the sink. A
+#    message spends one cycle in IDLE, steps+1 cycles in CALC, and at
+#    least one cycle in DONE. IntMulFixed always takes 32 steps, while
+#    IntMulVar shifts b by the amount IntMulVarCalcShamt computes from the
+#    low eight bits of b each step until b is zero. IntMulBooth takes one
+#    step per nonzero radix-4 Booth digit of b (plus one if b starts with
+#    more than one zero digit).
+#
+#  - Pipeline (IntMulScycle, IntMulNstage): a rigid pipeline of depth
+#    nstages (one for IntMulScycle) where every register is enabled by
+#    ostream_rdy and istream_rdy is ostream_rdy. The whole pipeline
+#    freezes while the sink is not ready.
+#
+# The source and sink behave like the test source/sink: after a message
+# is sent (received) the source (sink) is idle for interval_delay cycles.
+#
+# Total cycles include a fixed overhead for reset and the end of the
+# simulation. With the overhead of 9 the model matches the convention in
+# the *_perf_test.py files where the latency of a single multiply is the
+# total cycle count minus 9. The lazy stream sink (which imul-sim uses)
+# reports done two cycles earlier than StreamSinkFL, so its overhead is 7.
+
+import numpy as np
+
+default_overhead = 9
+lazy_overhead    = 7
+
+#-------------------------------------------------------------------------
+# var_steps
+#-------------------------------------------------------------------------
+# Number of CALC steps IntMulVar needs for each b. The shift amount is 8
+# when the low eight bits of b are zero, 1 when either of the two least
+# significant bits is set, and otherwise the number of trailing zeros.
+
+calc_shamt_table = np.array(
+  [ 8 ] + [ 1 if ( x & 0b11 ) else ( ( x & -x ).bit_length() - 1 )
+            for x in range( 1, 256 ) ], dtype=np.uint32 )
+
+def var_steps( b ):
+  b     = np.array( b, dtype=np.uint64 ) & np.uint64(0xffffffff)
+  steps = np.zeros( b.shape, dtype=np.int64 )
+  while True:
+    nonzero = b != 0
+    if not nonzero.any():
+      return steps
+    steps += nonzero
+    shamt  = calc_shamt_table[ b & np.uint64(0xff) ].astype( np.uint64 )
+    b      = np.where( nonzero, b >> shamt, b )
+
+#-------------------------------------------------------------------------
+# booth_steps
+#-------------------------------------------------------------------------
+# Number of CALC steps IntMulBooth needs for each b. We track the same
+# 33-bit register as the RTL ({b,b[-1]} shifted arithmetically) as a
+# signed integer along with its bit transitions. A step with a nonzero
+# digit shifts past the digit and the zero digits after it, and a step
+# with a zero digit only skips zero digits; either way the amount comes
+# from calc_shamt_table rounded down to an even number of bits.
+
+skip_table = np.where( calc_shamt_table == 1, 0,
+                       calc_shamt_table - calc_shamt_table % 2 ).astype( np.int64 )
+
+def booth_steps( b ):
+  b     = np.array( b, dtype=np.uint64 ) & np.uint64(0xffffffff)
+  ext   = b.astype( np.uint32 ).view( np.int32 ).astype( np.int64 ) << 1
+  steps = np.zeros( b.shape, dtype=np.int64 )
+  while True:
+    trans   = ( ( ext >> 1 ) ^ ext ) & 0xffffffff
+    nonzero = trans != 0
+    if not nonzero.any():
+      return steps
+    steps += nonzero
+    digit  = ( trans & 0b11 ) != 0
+    shamt  = np.where( digit, 2 + skip_table[ ( trans >> 2 ) & 0xff ],
+                              skip_table[ trans & 0xff ] )
+    ext    = np.where( nonzero, ext >> shamt, ext )
+
+#-------------------------------------------------------------------------
+# fsm_span
+#-------------------------------------------------------------------------
+# Cycles from the first cycle the source could send until the cycle
+# after the last result is received for an FSM-based multiplier, given
+# the number of CALC steps for each message.
+
+def fsm_span( steps, src_delay=0, sink_delay=0 ):
+
+  steps = np.asarray( steps, dtype=np.int64 )
+  if len( steps ) == 0:
+    return 0
+
+  # If the source and sink are never slower than the IDLE and DONE
+  # states, each message simply takes steps+3 cycles back to back
+
+  if src_delay <= 2 and sink_delay <= 2:
+    return int( np.sum( steps + 3 ) )
+
+  # Otherwise walk the messages: a message is accepted when both the FSM
+  # is idle and the source is valid, and its result is sent when both the
+  # FSM is done and the sink is ready
+
+  idle = src_valid = sink_rdy = 0
+  for s in steps.tolist():
+    accept    = max( idle, src_valid )
+    send      = max( accept + s + 2, sink_rdy )
+    idle      = send + 1
+    src_valid = accept + 1 + src_delay
+    sink_rdy  = send + 1 + sink_delay
+
+  return idle
+
+#-------------------------------------------------------------------------
+# pipe_span
+#-------------------------------------------------------------------------
+# Same as fsm_span but for a pipeline of the given depth.
+
+def pipe_span( nmsgs, depth, src_delay=0, sink_delay=0 ):
+
+  if nmsgs == 0:
+    return 0
+
+  # Without sink delay the pipeline never stalls, so messages enter at
+  # the rate of the source and leave depth cycles later
+
+  if sink_delay == 0:
+    return ( nmsgs - 1 ) * ( 1 + src_delay ) + depth + 1
+
+  # Otherwise the pipeline only advances on cycles where the sink is
+  # ready, and after each result the sink is not ready for sink_delay
+  # cycles. Since results leave in order, the stalls which can affect a
+  # message are those caused by earlier messages, so we can compute the
+  # messages one at a time while keeping track of the stall windows.
+
+  stalls    = []  # start cycle of each stall window still in the future
+  src_valid = 0
+  send      = 0
+
+  def next_ready( t ):
+    # first cycle >= t which is not inside a stall window
+    for start in stalls:
+      if start <= t < start + sink_delay:
+        t = start + sink_delay
+    return t
+
+  for _ in range( nmsgs ):
+
+    accept = next_ready( src_valid )
+
+    # The result is at the output after the pipeline has advanced depth
+    # times, i.e., on the depth-th ready cycle after it was accepted
+
+    t = accept
+    for _ in range( depth ):
+      t = next_ready( t + 1 )
+
+    send      = t
+    src_valid = accept + 1 + src_delay
+
+    # Drop windows we are past and add the one after this result
+
+    stalls = [ start for start in stalls if start + sink_delay > accept ]
+    stalls.append( send + 1 )
+
+  return send + 1
+
+#-------------------------------------------------------------------------
+# model_cycles
+#-------------------------------------------------------------------------
+# Predicted total cycle count for the given implementation and operands.
+
+def model_cycles( impl, a, b, nstages=2, src_delay=0, sink_delay=0,
+                  overhead=default_overhead ):
+
+  nmsgs = len( b )
+
+  if impl == "fixed":
+    span = fsm_span( np.full( nmsgs, 32 ), src_delay, sink_delay )
+  elif impl == "var":
+    span = fsm_span( var_steps( b ), src_delay, sink_delay )
+  elif impl == "booth":
+    span = fsm_span( booth_steps( b ), src_delay, sink_delay )
+  elif impl == "scycle":
+    span = pipe_span( nmsgs, 1, src_delay, sink_delay )
+  elif impl == "nstage":
+    span = pipe_span( nmsgs, int(nstages), src_delay, sink_delay )
+  else:
+    raise ValueError( f"no analytical model for {impl}" )
+
+  return span + overhead
+
+model_impls = [ "scycle", "fixed", "var", "booth", "nstage" ]
@@ -0,0 +1,103 @@
+#=========================================================================
+# IntMulBooth_perf_test
+#=========================================================================
+# These are performance regressions to make sure the performance of this
+# design is reasonable.
+
+from pymtl3.stdlib.test_utils import run_sim
+
+from lab1_imul.test.IntMulFL_test import TestHarness, mk_imsg, mk_omsg
+
+from lab1_imul.IntMulBooth import IntMulBooth
+
+#-------------------------------------------------------------------------
+# run_perf_check
+#-------------------------------------------------------------------------
+# Takes two input values and the min and max latency. Determines the
+# correct result, runs a simulation, and confirms the final cycle count
+# is within the min and max latency.
+#
+# Note that in all of our tests, the very first message is sent to the
+# multiplier on cycle 4 so there are three extra cycles at the beginning
+# of the test. There are always an extra 5 cycles after the last message
+# is received before the test is done. Plus the cycle count seems to add
+# one more cycle probably based on a final increment of the cycle
+# counter. So the total cycle count will be the latency of the multiplier
+# plus 9.
+
+def run_perf_check( cmdline_opts, a, b, min_latency, max_latency ):
+
+  result = mk_omsg( a * b )
+
+  th = TestHarness( IntMulBooth() )
+
+  th.set_param( "top.src.construct",  msgs=[ mk_imsg(a,b) ] )
+  th.set_param( "top.sink.construct", msgs=[ result ] )
+
+  run_sim( th, cmdline_opts, duts=['imul'] )
+
+  latency = th.sim_cycle_count() - 9
+
+  print("min target latency = ",min_latency)
+  print("max target latency = ",max_latency)
+  print("    actual latency = ",latency)
+
+  assert min_latency <= latency and latency <= max_latency
+
+#-------------------------------------------------------------------------
+# test_perf0
+#-------------------------------------------------------------------------
+# We test 0xffffffff * 0xffffffff. As a signed number b is -1, which is a
+# single nonzero Booth digit followed by digits which are all zero, so
+# unlike the variable-latency multiplier we should be done after one or
+# two CALC cycles. We probably need two more cycles for IDLE and DONE and
+# often there is an extra bubble to transistion from the last CALC state
+# to DONE. So 2+3=5 for the max.
+
+def test_perf0( cmdline_opts ):
+  run_perf_check( cmdline_opts, 0xffffffff, 0xffffffff, 1, 5 )
+
+#-------------------------------------------------------------------------
+# test_perf1
+#-------------------------------------------------------------------------
+# We test 0x33333333 * 0x33333333 which corresponds to a 0b0011..0011
+# pattern. Every group of two bits ends a run of ones or zeros, so all 16
+# Booth digits are nonzero and there is nothing to skip. Retiring two
+# bits per cycle gives 16 cycles plus 3 for IDLE, DONE, and the bubble,
+# so 16+3=19 for the max compared to 27 on the variable-latency
+# multiplier.
+
+def test_perf1( cmdline_opts ):
+  run_perf_check( cmdline_opts, 0x33333333, 0x33333333, 16, 19 )
+
+#-------------------------------------------------------------------------
+# test_perf2
+#-------------------------------------------------------------------------
+# We test 0x11111111 * 0x11111111 which corresponds to a 0b0001..0001
+# pattern. There is one nonzero Booth digit every four bits, and the zero
+# digit in between should be skipped in the same cycle we add the nonzero
+# digit. So 8+3=11 for the max compared to 19 on the variable-latency
+# multiplier.
+
+def test_perf2( cmdline_opts ):
+  run_perf_check( cmdline_opts, 0x11111111, 0x11111111, 8, 11 )
+
+#-------------------------------------------------------------------------
+# test_perf3
+#-------------------------------------------------------------------------
+# We test 0 * 0. There are no nonzero digits at all so just like the
+# variable-latency multiplier we should be able to finish in a few
+# cycles.
+
+def test_perf3( cmdline_opts ):
+  run_perf_check( cmdline_opts, 0, 0, 1, 5 )
+
+#-------------------------------------------------------------------------
+# test_perf4
+#-------------------------------------------------------------------------
+# We test 0x55555555 * 0x55555555 which is the worst case for radix-4
+# Booth since every bit is a transition. This still only takes 16 CALC
+# cycles, half of what the fixed-latency multiplier needs.
+
+def test_perf4( cmdline_opts ):
+  run_perf_check( cmdline_opts, 0x55555555, 0x55555555, 16, 19 )
@@ -4,26 +4,38 @@
 
 import pytest
 
-from random import randint
+import numpy as np
 
 from pymtl3 import *
 from pymtl3.stdlib.test_utils import mk_test_case_table, run_sim
 from pymtl3.stdlib.stream import StreamSourceFL, StreamSinkFL
 
+from common.stream import LazyStreamSourceFL, LazyStreamSinkFL
+
 from lab1_imul.IntMulFL import IntMulFL
+from lab1_imul.IntMulFL import mk_imsgs_bulk, mk_omsgs_bulk, check_bulk
+from lab1_imul.imul_datasets import gen_operands, load_dataset
 
 #-------------------------------------------------------------------------
 # TestHarness
 #-------------------------------------------------------------------------
+# With lazy=True the source/sink pull messages lazily from the given
+# sequences (e.g., memory-mapped datasets) or iterators instead of copying
+# them into lists.
 
 class TestHarness( Component ):
 
-  def construct( s, imul ):
+  def construct( s, imul, lazy=False ):
 
     # Instantiate models
 
-    s.src  = StreamSourceFL( Bits64 )
-    s.sink = StreamSinkFL( Bits32 )
+    if lazy:
+      s.src  = LazyStreamSourceFL( Bits64 )
+      s.sink = LazyStreamSinkFL( Bits32 )
+    else:
+      s.src  = StreamSourceFL( Bits64 )
+      s.sink = StreamSinkFL( Bits32 )
+
     s.imul = imul
 
     # Connect
@@ -51,6 +63,17 @@ def mk_imsg( a, b ):
 def mk_omsg( a ):
   return Bits32( a, trunc_int=True )
 
+# Make a list of interleaved input/output messages for whole arrays of
+# operands at once using the bulk golden model.
+
+def mk_msgs( a, b ):
+  imsgs = mk_imsgs_bulk( a, b ).tolist()
+  omsgs = mk_omsgs_bulk( a, b ).tolist()
+  msgs  = [ None ] * ( 2*len(imsgs) )
+  msgs[0::2] = [ Bits64( x ) for x in imsgs ]
+  msgs[1::2] = [ Bits32( x ) for x in omsgs ]
+  return msgs
+
 #----------------------------------------------------------------------
 # Test Case: small positive * positive
 #----------------------------------------------------------------------
@@ -137,94 +160,21 @@ zeros_msgs = [
   mk_imsg( -1,  0 ), mk_omsg( 0 ),
 ]
 #----------------------------------------------------------------------
-# Test Case: random small
-#----------------------------------------------------------------------
-
-random_small_msgs = []
-for i in range(50):
-  a = randint(0,100)
-  b = randint(0,100)
-  random_small_msgs.extend([ mk_imsg( a, b ), mk_omsg( a * b ) ])
-
-#----------------------------------------------------------------------
-# Test Case: random large
-#----------------------------------------------------------------------
-
-random_large_msgs = []
-for i in range(50):
-  a = b32(randint(0,0xffffffff))
-  b = b32(randint(0,0xffffffff))
-  random_large_msgs.extend([ mk_imsg( a, b ), mk_omsg( a * b ) ])
-
-#----------------------------------------------------------------------
-# Test Case: lomask
-#----------------------------------------------------------------------
-
-random_lomask_msgs = []
-for i in range(50):
-
-  shift_amount = randint(0,16)
-  a = randint(0,0xffffffff) << shift_amount
-
-  shift_amount = randint(0,16)
-  b = randint(0,0xffffffff) << shift_amount
-
-  random_lomask_msgs.extend([ mk_imsg( a, b ), mk_omsg( a * b ) ])
-
-#----------------------------------------------------------------------
-# Test Case: himask
-#----------------------------------------------------------------------
-
-random_himask_msgs = []
-for i in range(50):
-
-  shift_amount = randint(0,16)
-  a = randint(0,0xffffffff) >> shift_amount
-
-  shift_amount = randint(0,16)
-  b = randint(0,0xffffffff) >> shift_amount
-
-  random_himask_msgs.extend([ mk_imsg( a, b ), mk_omsg( a * b ) ])
-
-#----------------------------------------------------------------------
-# Test Case: lohimask
-#----------------------------------------------------------------------
-
-random_lohimask_msgs = []
-for i in range(50):
-
-  rshift_amount = randint(0,12)
-  lshift_amount = randint(0,12)
-  a = (randint(0,0xffffff) >> rshift_amount) << lshift_amount
-
-  rshift_amount = randint(0,12)
-  lshift_amount = randint(0,12)
-  b = (randint(0,0xffffff) >> rshift_amount) << lshift_amount
-
-  random_lohimask_msgs.extend([ mk_imsg( a, b ), mk_omsg( a * b ) ])
-
-#----------------------------------------------------------------------
-# Test Case: sparse
+# Random test cases
 #----------------------------------------------------------------------
+# Operands are generated in bulk with the same generators we use for the
+# evaluation datasets (see imul_datasets.py) and the expected results
+# come from the bulk golden model. We use a dedicated generator so the
+# data does not depend on who else has been using the random module.
 
-random_sparse_msgs = []
-for i in range(50):
-
-  a = randint(0,0xffffffff)
+rng = np.random.default_rng( 0xdeadbeef )
 
-  for i in range(32):
-    is_masked = randint(0,1)
-    if is_masked:
-      a = a & ( (~(1 << i)) & 0xffffffff )
-
-  b = randint(0,0xffffffff)
-
-  for i in range(32):
-    is_masked = randint(0,1)
-    if is_masked:
-      b = b & ( (~(1 << i)) & 0xffffffff )
-
-  random_sparse_msgs.extend([ mk_imsg( a, b ), mk_omsg( a * b ) ])
+random_small_msgs    = mk_msgs( *gen_operands( "small",    50, rng ) )
+random_large_msgs    = mk_msgs( *gen_operands( "large",    50, rng ) )
+random_lomask_msgs   = mk_msgs( *gen_operands( "lomask",   50, rng ) )
+random_himask_msgs   = mk_msgs( *gen_operands( "himask",   50, rng ) )
+random_lohimask_msgs = mk_msgs( *gen_operands( "lohimask", 50, rng ) )
+random_sparse_msgs   = mk_msgs( *gen_operands( "sparse",   50, rng ) )
 
 # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''/\
 
@@ -284,3 +234,55 @@ def test( test_params ):
 
   run_sim( th )
 
+
+#-------------------------------------------------------------------------
+# test_bulk
+#-------------------------------------------------------------------------
+# Check the bulk golden model against the scalar mk_imsg/mk_omsg helpers.
+
+def test_bulk():
+
+  a = [ 2, -4, 0x0fff0000, 0x80000001, 0x80340580, 0, -1, 0x123456789 ]
+  b = [ 3,  5, 0x0000ffff, 0x80000001, 0x8aadefc0, -1, 0, 7           ]
+
+  imsgs = mk_imsgs_bulk( a, b )
+  omsgs = mk_omsgs_bulk( a, b )
+
+  assert imsgs.dtype == np.uint64
+  assert omsgs.dtype == np.uint32
+
+  for i in range(len(a)):
+    assert int( imsgs[i] ) == mk_imsg( a[i], b[i] )
+    assert int( omsgs[i] ) == mk_omsg( a[i] * b[i] )
+
+  # Large random arrays, including a deliberately corrupted response
+
+  a = rng.integers( 0, 0x100000000, 100000, dtype=np.uint64 )
+  b = rng.integers( 0, 0x100000000, 100000, dtype=np.uint64 )
+
+  imsgs = mk_imsgs_bulk( a, b )
+  omsgs = mk_omsgs_bulk( a, b )
+
+  assert np.array_equal( omsgs, ( a * b ) & 0xffffffff )
+  assert len( check_bulk( imsgs, omsgs ) ) == 0
+
+  omsgs[42] ^= 1
+  assert list( check_bulk( imsgs, omsgs ) ) == [ 42 ]
+
+#-------------------------------------------------------------------------
+# test_dataset
+#-------------------------------------------------------------------------
+# Stream a memory-mapped dataset through the lazy source/sink.
+
+def test_dataset( tmp_path ):
+
+  ds = load_dataset( "sparse", 1000, data_dir=str(tmp_path) )
+
+  assert len( check_bulk( ds.imsgs, ds.omsgs ) ) == 0
+
+  th = TestHarness( IntMulFL(), lazy=True )
+
+  th.set_param("top.src.construct",  msgs=ds.imsgs, initial_delay=3 )
+  th.set_param("top.sink.construct", msgs=ds.omsgs, initial_delay=3 )
+
+  run_sim( th )
@@ -0,0 +1,124 @@
+#=========================================================================
+# imul_datasets_test
+#=========================================================================
+
+import os
+import pytest
+
+import numpy as np
+
+from lab1_imul.IntMulFL      import check_bulk
+from lab1_imul.imul_datasets import dataset_kinds, load_dataset, load_input
+from lab1_imul.imul_datasets import MulTraceWriter, load_trace
+
+#-------------------------------------------------------------------------
+# test_kinds
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "kind", dataset_kinds )
+def test_kinds( kind, tmp_path ):
+
+  ds = load_dataset( kind, 1000, data_dir=str(tmp_path) )
+
+  assert len(ds) == 1000
+  assert ds.imsgs.dtype == np.uint64
+  assert ds.omsgs.dtype == np.uint32
+  assert len( check_bulk( ds.imsgs, ds.omsgs ) ) == 0
+
+  a, b = ds.operands()
+  if kind == "small":
+    assert a.max() <= 100 and b.max() <= 100
+
+#-------------------------------------------------------------------------
+# test_reload
+#-------------------------------------------------------------------------
+# The second load memory-maps the files written by the first one, and a
+# different seed gives a different dataset.
+
+def test_reload( tmp_path ):
+
+  ds0 = load_dataset( "large", 1000, seed=1, data_dir=str(tmp_path) )
+  assert isinstance( ds0.imsgs, np.memmap )
+
+  mtime = os.path.getmtime( os.path.join( str(tmp_path), ds0.name + ".imsgs.npy" ) )
+
+  ds1 = load_dataset( "large", 1000, seed=1, data_dir=str(tmp_path) )
+  assert np.array_equal( ds0.imsgs, ds1.imsgs )
+  assert mtime == os.path.getmtime( os.path.join( str(tmp_path), ds1.name + ".imsgs.npy" ) )
+
+  ds2 = load_dataset( "large", 1000, seed=2, data_dir=str(tmp_path) )
+  assert not np.array_equal( ds0.imsgs, ds2.imsgs )
+  assert ds2.info["seed"] == 2
+
+#-------------------------------------------------------------------------
+# test_stale
+#-------------------------------------------------------------------------
+# A dataset with a missing or mismatching record is regenerated.
+
+def test_stale( tmp_path ):
+
+  ds0  = load_dataset( "sparse", 100, data_dir=str(tmp_path) )
+  ref  = np.array( ds0.imsgs )
+  json = os.path.join( str(tmp_path), ds0.name + ".json" )
+
+  with open( json, "w" ) as f:
+    f.write( "{}" )
+
+  ds1 = load_dataset( "sparse", 100, data_dir=str(tmp_path) )
+  assert np.array_equal( ref, ds1.imsgs )
+
+  with open( json ) as f:
+    assert "seed" in f.read()
+
+#-------------------------------------------------------------------------
+# test_unknown
+#-------------------------------------------------------------------------
+
+def test_unknown( tmp_path ):
+  with pytest.raises( ValueError ):
+    load_dataset( "dense", 10, data_dir=str(tmp_path) )
+
+#-------------------------------------------------------------------------
+# test_trace
+#-------------------------------------------------------------------------
+# A trace written in several blocks reads back as the same operands, and
+# trace:<file> inputs replay the whole trace unless n is given.
+
+def test_trace( tmp_path ):
+
+  path = str( tmp_path / "muls.trace" )
+
+  a = [ i*0x10001 for i in range(100) ] + [ 0xffffffff ]
+  b = [ 0xffffffff - i for i in range(100) ] + [ -1 ]
+
+  trace = MulTraceWriter( path, bufsize=16 )
+  for x, y in zip( a, b ):
+    trace.append( x, y )
+  trace.close()
+
+  assert trace.nmuls == 101
+  assert os.path.getsize( path ) == 101*8
+
+  ds = load_trace( path )
+  assert len(ds) == 101
+  assert ds.name == "trace-muls"
+  assert len( check_bulk( ds.imsgs, ds.omsgs ) ) == 0
+
+  a0, b0 = ds.operands()
+  assert list(a0) == a
+  assert list(b0) == [ y & 0xffffffff for y in b ]
+
+  assert len( load_input( "trace:" + path ) ) == 101
+  assert len( load_input( "trace:" + path, 10 ) ) == 10
+
+def test_trace_bad( tmp_path ):
+
+  path = str( tmp_path / "bad.trace" )
+  with open( path, "wb" ) as f:
+    f.write( b"abcdef" )
+
+  with pytest.raises( ValueError ):
+    load_trace( path )
+
+  open( path, "wb" ).close()
+  assert len( load_trace( path ) ) == 0
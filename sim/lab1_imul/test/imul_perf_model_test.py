@@ -0,0 +1,151 @@
+#=========================================================================
+# imul_perf_model_test
+#=========================================================================
+# Check the analytical cycle model against the latencies in the perf
+# tests and against RTL simulations.
+
+import pytest
+
+import numpy as np
+
+from pymtl3.stdlib.test_utils import run_sim
+
+from lab1_imul.IntMulScycle  import IntMulScycle
+from lab1_imul.IntMulFixed   import IntMulFixed
+from lab1_imul.IntMulVar     import IntMulVar
+from lab1_imul.IntMulBooth   import IntMulBooth
+from lab1_imul.IntMulNstage  import IntMulNstage
+
+from lab1_imul.imul_datasets   import load_dataset
+from lab1_imul.imul_perf_model import var_steps, booth_steps, model_cycles, lazy_overhead
+from lab1_imul.imul_perf_model import default_overhead
+
+from lab1_imul.test.IntMulFL_test import TestHarness
+
+#-------------------------------------------------------------------------
+# test_var_steps
+#-------------------------------------------------------------------------
+
+def test_var_steps():
+  assert list( var_steps([ 0, 1, 2, 3, 0x100, 0x80000000, 0xffffffff ]) ) \
+      == [ 0, 1, 2, 2, 2, 5, 32 ]
+
+  # 0x11111111 shifts by 1 (bit 0) and then by 3 (bit 4 is at position 3
+  # after the first shift) for each of the ones, except that b is zero
+  # right after the last one is shifted out
+
+  assert var_steps([ 0x11111111 ])[0] == 15
+
+#-------------------------------------------------------------------------
+# test_booth_steps
+#-------------------------------------------------------------------------
+
+def test_booth_steps():
+
+  # A run of ones is a single nonzero digit, and every bit of 0x55555555
+  # is a transition so it needs all 16 digits
+
+  assert list( booth_steps([ 0, 1, 3, 0xffffffff, 0x55555555, 0x11111111 ]) ) \
+      == [ 0, 1, 2, 1, 16, 8 ]
+
+  # The same number of bits set is much cheaper as one run
+
+  assert booth_steps([ 0x0000ffff ])[0] == 3
+  assert var_steps  ([ 0x0000ffff ])[0] == 16
+
+#-------------------------------------------------------------------------
+# test_single
+#-------------------------------------------------------------------------
+# Latency of a single multiply (total cycles minus 9) should match what
+# the perf tests expect.
+
+def latency( impl, a, b, nstages=2 ):
+  return model_cycles( impl, [a], [b], nstages=nstages ) - default_overhead
+
+def test_single():
+
+  assert latency( "scycle", 0xf, 0xf ) == 2
+  assert latency( "fixed",  0xffffffff, 0xffffffff ) == 35
+  assert latency( "var",    0xffffffff, 0xffffffff ) == 35
+  assert latency( "var",    0x11111111, 0x11111111 ) == 18
+  assert latency( "var",    0, 0 ) == 3
+  assert latency( "booth",  0xffffffff, 0xffffffff ) == 4
+  assert latency( "booth",  0x33333333, 0x33333333 ) == 19
+  assert latency( "booth",  0x11111111, 0x11111111 ) == 11
+
+  for nstages in [ 1, 2, 4, 8 ]:
+    assert latency( "nstage", 0xf, 0xf, nstages ) == nstages + 1
+
+#-------------------------------------------------------------------------
+# test_throughput
+#-------------------------------------------------------------------------
+# Without sink delay a pipeline accepts one message per source interval;
+# with sink delay it is limited by the sink.
+
+def test_throughput():
+
+  n = 1000
+  a = np.ones( n )
+  b = np.ones( n )
+
+  for nstages in [ 1, 4, 32 ]:
+    span = model_cycles( "nstage", a, b, nstages, overhead=0 )
+    assert span == ( n - 1 ) + nstages + 1
+
+    span = model_cycles( "nstage", a, b, nstages, src_delay=3, overhead=0 )
+    assert span == ( n - 1 )*4 + nstages + 1
+
+    span = model_cycles( "nstage", a, b, nstages, sink_delay=3, overhead=0 )
+    assert ( n - 1 )*4 < span <= ( n - 1 )*4 + 4*nstages + 1
+
+  # An FSM multiplier hides source/sink delays up to two cycles
+
+  for delays in [ (0,0), (2,0), (0,2), (2,2) ]:
+    assert model_cycles( "var", a, b, 2, *delays, overhead=0 ) == 4*n
+
+  assert model_cycles( "var", a, b, 2, 0, 10, overhead=0 ) == 11*(n-1) + 4
+
+#-------------------------------------------------------------------------
+# test_rtl
+#-------------------------------------------------------------------------
+# Simulate the RTL with the same harness imul-sim uses and compare the
+# total cycle count with the model.
+
+rtl_table = [
+  ( "scycle",  IntMulScycle,          2, "large",  0, 0 ),
+  ( "scycle",  IntMulScycle,          2, "large",  0, 3 ),
+  ( "fixed",   IntMulFixed,           2, "small",  4, 0 ),
+  ( "var",     IntMulVar,             2, "small",  0, 0 ),
+  ( "var",     IntMulVar,             2, "sparse", 0, 0 ),
+  ( "var",     IntMulVar,             2, "lomask", 5, 0 ),
+  ( "var",     IntMulVar,             2, "himask", 0, 5 ),
+  ( "var",     IntMulVar,             2, "large",  2, 2 ),
+  ( "booth",   IntMulBooth,           2, "large",  0, 0 ),
+  ( "booth",   IntMulBooth,           2, "himask", 3, 0 ),
+  ( "booth",   IntMulBooth,           2, "sparse", 0, 4 ),
+  ( "nstage",  IntMulNstage,          2, "large",  0, 0 ),
+  ( "nstage",  IntMulNstage,          4, "large",  0, 3 ),
+  ( "nstage",  IntMulNstage,          8, "sparse", 2, 1 ),
+  ( "nstage",  IntMulNstage,         32, "small",  1, 5 ),
+]
+
+@pytest.mark.parametrize( "impl, Impl, nstages, input_, src_delay, sink_delay",
+                          rtl_table )
+def test_rtl( impl, Impl, nstages, input_, src_delay, sink_delay,
+              cmdline_opts, tmp_path ):
+
+  ds = load_dataset( input_, 50, data_dir=str(tmp_path) )
+
+  if impl == "nstage":
+    th = TestHarness( Impl( nstages=nstages ), lazy=True )
+  else:
+    th = TestHarness( Impl(), lazy=True )
+
+  th.set_param( "top.src.construct",  msgs=ds.imsgs, interval_delay=src_delay  )
+  th.set_param( "top.sink.construct", msgs=ds.omsgs, interval_delay=sink_delay )
+
+  run_sim( th, cmdline_opts, duts=['imul'] )
+
+  a, b = ds.operands()
+  assert th.sim_cycle_count() == \
+    model_cycles( impl, a, b, nstages, src_delay, sink_delay, lazy_overhead )
@@ -9,7 +9,7 @@ import os
 from subprocess import check_call, CalledProcessError
 from itertools  import product
 
-impls  = [ "fl", "fixed", "var" ]
+impls  = [ "fl", "fixed", "var", "booth" ]
 inputs = [ "small" ]
 
 test_cases = []
@@ -53,3 +53,59 @@ def test( impl, input_, cmdline_opts ):
   except CalledProcessError as e:
     raise Exception( "Error running simulator!" )
 
+
+#-------------------------------------------------------------------------
+# test_sweep
+#-------------------------------------------------------------------------
+# Small sweep to make sure the parallel sweep mode works.
+
+def test_sweep( cmdline_opts ):
+
+  if cmdline_opts['test_verilog']:
+    pytest.skip("ignoring non-Verilog tests")
+
+  test_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  sim_dir  = os.path.dirname( test_dir )
+  sim      = sim_dir + os.path.sep + 'imul-sim'
+
+  cmd = [ sim, "--sweep", "--sweep-impls", "fl,var", "--sweep-inputs", "small",
+          "--sweep-delays", "none,both2", "--ninputs", "10", "--jobs", "2" ]
+
+  print("")
+  print("Simulator command line:", ' '.join(cmd))
+
+  try:
+    check_call(cmd)
+  except CalledProcessError as e:
+    raise Exception( "Error running simulator!" )
+
+#-------------------------------------------------------------------------
+# test_trace
+#-------------------------------------------------------------------------
+# Replay a small operand trace like the ones pmx-sim --mul-trace records.
+
+def test_trace( cmdline_opts, tmp_path ):
+
+  if cmdline_opts['test_verilog']:
+    pytest.skip("ignoring non-Verilog tests")
+
+  from lab1_imul.imul_datasets import MulTraceWriter
+
+  trace = MulTraceWriter( str( tmp_path / "muls.trace" ) )
+  for i in range(20):
+    trace.append( i*0x01010101, 0xffffffff - i )
+  trace.close()
+
+  test_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  sim_dir  = os.path.dirname( test_dir )
+  sim      = sim_dir + os.path.sep + 'imul-sim'
+
+  cmd = [ sim, "--impl", "var", "--input", f"trace:{trace.path}", "--stats" ]
+
+  print("")
+  print("Simulator command line:", ' '.join(cmd))
+
+  try:
+    check_call(cmd)
+  except CalledProcessError as e:
+    raise Exception( "Error running simulator!" )
@@ -7,12 +7,62 @@
 #  xr0 : go/done
 #  xr1 : base address of array
 #  xr2 : number of elements in array
+#  xr3 : run length (0 means the whole array is sorted as one run)
+#  xr4 : base address of scratch buffer (same size as the array, or
+#        twice the size with a payload)
+#  xr5 : mode flags (see SortMode, 0 means unsigned ascending)
+#  xr6 : base address of payload array
+#  xr7 : k for top-k (0 means sort all elements)
+#  xr8 : status, number of outstanding jobs (read only)
+#  xr9 : protocol version, always 2 (read only)
 #
 # Accelerator protocol involves the following steps:
 #  1. Write the base address of array via xr1
 #  2. Write the number of elements in array via xr2
-#  3. Tell accelerator to go by writing xr0
-#  4. Wait for accelerator to finish by reading xr0, result will be 1
+#  3. Optionally write the run length via xr3 and scratch base via xr4
+#  4. Optionally write the mode via xr5-7
+#  5. Tell accelerator to go by writing xr0
+#  6. Wait for accelerator to finish by reading xr0, result will be 1
+#
+# Writing xr0 does not wait for the sort: the registers are copied into
+# a new job and the write returns right away. Reading xr0 blocks until
+# all outstanding jobs are done, while reading xr8 returns the number of
+# outstanding jobs without waiting, so software can instead poll xr8
+# until it is zero and do other work in the meantime. Since the job has
+# its own copy of the registers, software can configure and start a
+# second job while the first one runs. At most two jobs can be
+# outstanding (one running and one queued), so software has to wait for
+# xr8 to drop below two before starting a third.
+#
+# Software reads xr9 to find out whether it can use any of this: the
+# basic accelerator (SortXcel.v) only implements xr0-xr2 and answers
+# every read with 1 while it is idle, so it reports version 1.
+#
+# The modes are:
+#
+#  - signed/descending: change the order, equal keys keep their order
+#  - payload: the 32-bit keys come with a payload array of the same size
+#    at xr6, which is permuted along with the keys
+#  - argsort: the payload array is not read, instead it is written with
+#    the original index of each key (i.e., the sorting permutation)
+#  - top-k: only the first k elements of the sorted order are written to
+#    the array (and payload), the rest of the array is left as is
+#
+# Arrays larger than the on-chip buffer are sorted in chunks: if the
+# array is longer than the run length, the accelerator sorts each run of
+# run length elements into the scratch buffer and then does a single
+# multi-way merge pass which streams the sorted runs from the scratch
+# buffer back into the array. With top-k only the first k elements of
+# each run are kept. All registers keep their values across jobs.
+#
+# Optionally the model can be given a SortTimingModel (see
+# sort_timing.py), in which case it also estimates the cycles and memory
+# traffic a hardware sort would need for every array it sorts and keeps
+# the estimates in s.estimates.
+#
+# The array is loaded and stored with burst memory transactions of
+# nwords words each (see common/burst.py), so the memory port carries
+# 32*nwords-bit data. With nwords=1 the port is the usual 32-bit port.
 #
 
 from pymtl3 import *
@@ -24,11 +74,29 @@ from pymtl3.stdlib.xcel      import XcelMsgType, mk_xcel_msg
 from pymtl3.stdlib.stream    import OStreamBlockingAdapterFL
 from pymtl3.stdlib.stream    import IStreamBlockingAdapterFL
 
+import heapq
+
+from collections import deque
+from itertools   import islice
+
+from common.burst import mk_burst_mem_msg, BurstAdapter, BurstWriter
+
+#-------------------------------------------------------------------------
+# SortMode
+#-------------------------------------------------------------------------
+# Flags for xr5
+
+class SortMode:
+  SIGNED     = 0x1  # compare keys as signed integers
+  DESCENDING = 0x2  # sort largest key first
+  PAYLOAD    = 0x4  # permute the payload array along with the keys
+  ARGSORT    = 0x8  # write the original index of each key to the payload array
+
 class SortXcelFL( Component ):
 
-  def construct( s ):
+  def construct( s, timing=None, nwords=4 ):
 
-    MemReqMsg,  MemRespMsg  = mk_mem_msg( 8, 32, 32 )
+    MemReqMsg,  MemRespMsg  = mk_burst_mem_msg( nwords )
     XcelReqMsg, XcelRespMsg = mk_xcel_msg( 5, 32 )
 
     # Interface
@@ -50,62 +118,186 @@ class SortXcelFL( Component ):
 
     connect( s.mem, s.mem_adapter.requester )
 
+    s.burst = BurstAdapter( s.mem_adapter, nwords )
+
     # Storage
 
     s.base_addr  = 0
     s.array_size = 0
+    s.run_len    = 0
+    s.scratch    = 0
+    s.flags      = 0
+    s.payload    = 0
+    s.k          = 0
+
+    # Jobs which have been started but are not done yet (the first one is
+    # running), the mode of the running job, and whether a read of xr0 is
+    # waiting for the jobs to finish
+
+    s.jobs     = deque()
+    s.mode     = 0
+    s.wait_rd0 = False
+
+    # Timing model and the estimate for each sort
+
+    s.timing    = timing
+    s.estimates = []
+
+    # Order in which the running job sorts keys
+
+    def sort_key( record ):
+      key = record[0]
+      if s.mode & SortMode.SIGNED and key & 0x80000000:
+        key -= 1 << 32
+      return -key if s.mode & SortMode.DESCENDING else key
+
+    # Load the records (key/payload pairs) for elements i to i+n of the
+    # array. Without a payload the payload is None, and for argsort it is
+    # the index of the element.
+
+    def load_run( key_addr, val_addr, i, n ):
+      keys = s.burst.read_words( key_addr + 4*i, n )
+      if s.mode & SortMode.ARGSORT:
+        vals = list( range( i, i+n ) )
+      elif s.mode & SortMode.PAYLOAD:
+        vals = s.burst.read_words( val_addr + 4*i, n )
+      else:
+        vals = [ None ]*n
+      return list( zip( keys, vals ) )
+
+    # Store the first k records from a stream of records
+
+    def store_records( records, key_addr, val_addr, k ):
+      keys = BurstWriter( s.burst, key_addr )
+      vals = BurstWriter( s.burst, val_addr )
+      for key, val in islice( records, k ):
+        keys.push( key )
+        if val is not None:
+          vals.push( val )
+      keys.flush()
+      vals.flush()
+
+    # Stream n records of a sorted run from memory
+
+    def stream_run( key_addr, val_addr, i, n ):
+      keys = s.burst.stream_words( key_addr + 4*i, n )
+      if s.mode & ( SortMode.PAYLOAD | SortMode.ARGSORT ):
+        return zip( keys, s.burst.stream_words( val_addr + 4*i, n ) )
+      return ( ( key, None ) for key in keys )
+
+    # Sort the array (and payload) for one job
+
+    def sort_job( base_addr, size, run_len, scratch, vals_addr, k ):
+
+      if k == 0 or k > size:
+        k = size
+
+      # Sort the whole array as one run
+
+      if run_len == 0 or size <= run_len:
+        array = load_run( base_addr, vals_addr, 0, size )
+        store_records( iter( sorted( array, key=sort_key ) ),
+                       base_addr, vals_addr, k )
+
+      # Sort each run into the scratch buffer (keeping only the first k
+      # records of each), then merge the runs back into the array
+
+      else:
+        scratch_vals = scratch + 4*size
+
+        array = []
+        runs  = []
+        for i in range( 0, size, run_len ):
+          run = load_run( base_addr, vals_addr, i, min( run_len, size-i ) )
+          store_records( iter( sorted( run, key=sort_key ) ),
+                         scratch + 4*i, scratch_vals + 4*i, k )
+          runs.append( ( i, min( k, len(run) ) ) )
+          array += run
+
+        merged = heapq.merge( *[ stream_run( scratch, scratch_vals, i, n )
+                                 for i, n in runs ], key=sort_key )
+        store_records( merged, base_addr, vals_addr, k )
+
+      if s.timing is not None:
+        s.estimates.append(
+          s.timing.estimate( [ sort_key( record ) for record in array ] ) )
+
+    # Handle one accelerator request per call. Writes to xr0-7 and reads
+    # of xr0, xr8 and xr9 are allowed, so any other requests are an
+    # error. A read of xr0 with outstanding jobs is answered by
+    # up_sort_xcel_engine once they are done, so we do not take any more
+    # requests until then.
 
     @update_once
-    def up_sort_xcel():
+    def up_sort_xcel_regs():
 
-      # We loop handling accelerator requests. We are only expecting
-      # writes to xr0-2, so any other requests are an error. We exit the
-      # loop when we see the write to xr0.
+      if s.wait_rd0:
+        return
 
-      go = False
-      while not go:
+      xcelreq_msg = s.xcelreq_q.deq()
+
+      if xcelreq_msg.type_ == XcelMsgType.WRITE:
+        assert xcelreq_msg.addr in [0,1,2,3,4,5,6,7], \
+          "Only reg writes to 0-7 allowed!"
 
-        xcelreq_msg = s.xcelreq_q.deq()
+        # Use xcel register address to configure accelerator, or start a
+        # job with a copy of the registers for a write to xr0
 
-        if xcelreq_msg.type_ == XcelMsgType.WRITE:
-          assert xcelreq_msg.addr in [0,1,2], \
-            "Only reg writes to 0,1,2 allowed during setup!"
+        if xcelreq_msg.addr == 0:
+          assert len( s.jobs ) < 2, \
+            "Cannot start a job while two jobs are outstanding!"
+          s.jobs.append( ( int(s.base_addr), int(s.array_size),
+                           int(s.run_len),   int(s.scratch),
+                           s.flags,          int(s.payload), int(s.k) ) )
 
-          # Use xcel register address to configure accelerator
+        elif xcelreq_msg.addr == 1: s.base_addr  = xcelreq_msg.data
+        elif xcelreq_msg.addr == 2: s.array_size = xcelreq_msg.data
+        elif xcelreq_msg.addr == 3: s.run_len    = xcelreq_msg.data
+        elif xcelreq_msg.addr == 4: s.scratch    = xcelreq_msg.data
+        elif xcelreq_msg.addr == 5: s.flags      = int(xcelreq_msg.data)
+        elif xcelreq_msg.addr == 6: s.payload    = xcelreq_msg.data
+        elif xcelreq_msg.addr == 7: s.k          = xcelreq_msg.data
 
-          if   xcelreq_msg.addr == 0: go = True
-          if   xcelreq_msg.addr == 1: s.base_addr  = xcelreq_msg.data
-          elif xcelreq_msg.addr == 2: s.array_size = xcelreq_msg.data
+        # Send xcel response message
 
-          # Send xcel response message
+        s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.WRITE, 0 ) )
 
-          s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.WRITE, 0 ) )
+      else:
+        assert xcelreq_msg.addr in [0,8,9], \
+          "Only reg reads to 0, 8 and 9 allowed!"
 
-      array = []
-      for i in range(s.array_size):
-        array.append( s.mem_adapter.read( s.base_addr + i*4, 4 ) )
+        if xcelreq_msg.addr == 8:
+          s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, len( s.jobs ) ) )
+        elif xcelreq_msg.addr == 9:
+          s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, 2 ) )
+        elif not s.jobs:
+          s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, 1 ) )
+        else:
+          s.wait_rd0 = True
 
-      array = sorted(array)
+    # Run the oldest outstanding job, and answer a pending read of xr0
+    # once all jobs are done
 
-      for i in range(s.array_size):
-        s.mem_adapter.write( s.base_addr + i*4, 4, array[i] )
+    @update_once
+    def up_sort_xcel_engine():
 
-      # Now wait for read of xr0
+      if not s.jobs:
+        return
 
-      xcelreq_msg = s.xcelreq_q.deq()
+      base_addr, size, run_len, scratch, s.mode, vals_addr, k = s.jobs[0]
 
-      # Only expecting read from xr0, so any other request is an xcel
-      # protocol error.
+      sort_job( base_addr, size, run_len, scratch, vals_addr, k )
 
-      assert xcelreq_msg.type_ == XcelMsgType.READ, \
-        "Only reg reads allowed during done phase!"
+      s.jobs.popleft()
 
-      assert xcelreq_msg.addr == 0, \
-        "Only reg read to 0 allowed during done phase!"
+      # Only release up_sort_xcel_regs once the response is enqueued, so
+      # that a later write ack cannot overtake it if the queue is full
 
-      # Send xcel response message indicating xcel is done
+      if s.wait_rd0 and not s.jobs:
+        s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, 1 ) )
+        s.wait_rd0 = False
 
-      s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, 1 ) )
+    s.burst.schedule_caller( s, up_sort_xcel_engine )
 
   # Line tracing
 
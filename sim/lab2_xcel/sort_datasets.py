@@ -0,0 +1,131 @@
+#=========================================================================
+# sort_datasets
+#=========================================================================
+# Parameterized input distributions for evaluating the sort accelerators.
+# A random array of a fixed size hides most of what makes one sort
+# implementation faster than another, so these generators produce arrays
+# of any size with the properties sort performance usually depends on
+# (presortedness, duplicates, skew). An input is named by its kind and an
+# optional parameter after a colon:
+#
+#  >>> data = gen_input( "nearly-sorted:4", 128 )
+#  >>> data = gen_input( "zipfian", 64, seed=1 )
+#
+# The kinds are:
+#
+#  - random        : uniformly random 32-bit keys
+#  - sorted-fwd    : random keys in ascending order
+#  - sorted-rev    : random keys in descending order
+#  - nearly-sorted : distinct keys in ascending order with exactly p
+#                    inversions (default n/16)
+#  - heavy-dups    : each key is one hot key with probability p percent
+#                    (default 50), otherwise random
+#  - few-unique    : keys drawn uniformly from p distinct values
+#                    (default 4)
+#  - zipfian       : keys drawn from n distinct values with Zipf
+#                    distributed ranks of exponent p (default 1.5)
+#  - all-equal     : n copies of the same key
+#
+# All arrays are NumPy uint32 arrays and the same input, size and seed
+# always give the same array.
+
+import numpy as np
+
+default_seed = 0xdeadbeef
+
+#-------------------------------------------------------------------------
+# Key generators
+#-------------------------------------------------------------------------
+# Each generator takes the array size, a NumPy random generator, and the
+# parameter (None for the default) and returns the keys.
+
+def rand_u32( rng, n ):
+  return rng.integers( 0, 0x100000000, n, dtype=np.uint64 )
+
+def distinct_u32( rng, n ):
+  return rng.choice( 0x100000000, n, replace=False ).astype( np.uint64 )
+
+def gen_random( n, rng, param ):
+  return rand_u32( rng, n )
+
+def gen_sorted_fwd( n, rng, param ):
+  return np.sort( rand_u32( rng, n ) )
+
+def gen_sorted_rev( n, rng, param ):
+  return np.sort( rand_u32( rng, n ) )[::-1]
+
+# Swapping two adjacent keys which are in order adds exactly one
+# inversion when all keys are distinct, so we do that ninversions times
+
+def gen_nearly_sorted( n, rng, param ):
+  if param is None:
+    ninversions = min( max( 1, n//16 ), n*(n-1)//2 )
+  else:
+    ninversions = int( param )
+  if not 0 <= ninversions <= n*(n-1)//2:
+    raise ValueError( f"an array of {n} keys cannot have {ninversions} "
+                      f"inversions" )
+  keys = np.sort( distinct_u32( rng, n ) )
+  for _ in range( ninversions ):
+    i = rng.choice( np.flatnonzero( keys[:-1] < keys[1:] ) )
+    keys[i], keys[i+1] = keys[i+1], keys[i]
+  return keys
+
+def gen_heavy_dups( n, rng, param ):
+  percent = 50 if param is None else float( param )
+  if not 0 <= percent <= 100:
+    raise ValueError( f"heavy-dups needs a percentage (not {percent})" )
+  keys = rand_u32( rng, n )
+  keys[ rng.random( n ) < percent/100 ] = rand_u32( rng, 1 )[0]
+  return keys
+
+def gen_few_unique( n, rng, param ):
+  nunique = 4 if param is None else int( param )
+  if nunique < 1:
+    raise ValueError( f"few-unique needs at least one key (not {nunique})" )
+  return rng.choice( distinct_u32( rng, nunique ), n )
+
+def gen_zipfian( n, rng, param ):
+  exponent = 1.5 if param is None else float( param )
+  if exponent <= 1:
+    raise ValueError( f"zipfian needs an exponent above 1 (not {exponent})" )
+  ranks = np.minimum( rng.zipf( exponent, n ), n ) - 1
+  return distinct_u32( rng, max( n, 1 ) )[ ranks ]
+
+def gen_all_equal( n, rng, param ):
+  return np.full( n, rand_u32( rng, 1 )[0], dtype=np.uint64 )
+
+generators = {
+  "random"        : gen_random,
+  "sorted-fwd"    : gen_sorted_fwd,
+  "sorted-rev"    : gen_sorted_rev,
+  "nearly-sorted" : gen_nearly_sorted,
+  "heavy-dups"    : gen_heavy_dups,
+  "few-unique"    : gen_few_unique,
+  "zipfian"       : gen_zipfian,
+  "all-equal"     : gen_all_equal,
+}
+
+input_kinds = list( generators.keys() )
+
+#-------------------------------------------------------------------------
+# parse_input
+#-------------------------------------------------------------------------
+# Splits an input name like nearly-sorted:4 into its kind and parameter
+# (None if there is no parameter).
+
+def parse_input( input_ ):
+  kind, _, param = input_.partition( ":" )
+  if kind not in generators:
+    raise ValueError( f"unknown input {kind} (expected one of "
+                      f"{','.join(input_kinds)})" )
+  return kind, ( param or None )
+
+#-------------------------------------------------------------------------
+# gen_input
+#-------------------------------------------------------------------------
+
+def gen_input( input_, n, seed=default_seed ):
+  kind, param = parse_input( input_ )
+  rng = np.random.default_rng( seed )
+  return generators[kind]( n, rng, param ).astype( np.uint32 )
@@ -0,0 +1,217 @@
+#=========================================================================
+# sort_timing
+#=========================================================================
+# Cycle-approximate timing model of a sort accelerator. SortXcelFL sorts
+# with Python's sorted() and only takes the cycles its memory adapter
+# imposes, which says nothing about what a hardware sort would cost. This
+# model estimates the cycles and memory traffic for sorting an array with
+# a given algorithm on an accelerator with an on-chip buffer of
+# buffer_size words and a memory with the given latency and bandwidth.
+#
+#  >>> model = SortTimingModel( "merge", mem_latency=10, buffer_size=128 )
+#  >>> est   = model.estimate( data )
+#  >>> est.cycles, est.mem_reads, est.mem_writes
+#
+# An array which fits in the buffer is loaded, sorted in the buffer, and
+# stored back. Larger arrays are sorted as buffer-sized runs which are
+# then merged with two-way merge passes over memory, except for radix
+# sort which does one counting pass and one scatter pass over memory for
+# each digit instead. The algorithms are:
+#
+#  - bubble  : one compare-and-swap per cycle, stopping after the first
+#              pass without swaps (data dependent)
+#  - merge   : bottom-up merge sort producing one element per cycle
+#  - radix   : LSD radix sort with radix_bits-bit digits, counting and
+#              scattering one element per cycle
+#  - bitonic : bitonic sorting network with ncmps comparators, padded to
+#              a power of two
+#
+# Memory transfers are pipelined, so moving n words takes mem_latency
+# cycles plus n/mem_bw cycles. In-buffer phases do not overlap with
+# loads and stores, while merge and scatter passes stream through memory
+# and so take whichever is longer of the compute and the transfers.
+
+import math
+
+import numpy as np
+
+sort_algos = [ "bubble", "merge", "radix", "bitonic" ]
+
+#=========================================================================
+# SortEstimate
+#=========================================================================
+# Result of the model for one sort. Memory traffic is counted in 32-bit
+# words.
+
+class SortEstimate:
+
+  def __init__( self, algo, n, compute_cycles, mem_cycles, mem_reads,
+                mem_writes, npasses ):
+    self.algo           = algo
+    self.n              = n
+    self.compute_cycles = compute_cycles
+    self.mem_cycles     = mem_cycles
+    self.mem_reads      = mem_reads
+    self.mem_writes     = mem_writes
+    self.npasses        = npasses
+
+  @property
+  def cycles( self ):
+    return self.compute_cycles + self.mem_cycles
+
+  @property
+  def mem_bytes( self ):
+    return 4*( self.mem_reads + self.mem_writes )
+
+  def __add__( self, other ):
+    return SortEstimate( self.algo, self.n + other.n,
+                         self.compute_cycles + other.compute_cycles,
+                         self.mem_cycles     + other.mem_cycles,
+                         self.mem_reads      + other.mem_reads,
+                         self.mem_writes     + other.mem_writes,
+                         self.npasses        + other.npasses )
+
+  def __repr__( self ):
+    return ( f"SortEstimate({self.algo}, n={self.n}, cycles={self.cycles}, "
+             f"reads={self.mem_reads}, writes={self.mem_writes})" )
+
+#-------------------------------------------------------------------------
+# bubble_passes
+#-------------------------------------------------------------------------
+# Number of passes bubble sort with an early exit makes over the array.
+# Each pass moves every element which is not in its final position yet
+# exactly one position to the left, so we need as many passes as the
+# largest distance an element has to move left, plus one final pass to
+# see there were no swaps (unless we already did all n-1 passes).
+
+def bubble_passes( data ):
+  data = np.asarray( data )
+  n    = len( data )
+  if n < 2:
+    return 0
+  final_pos = np.empty( n, dtype=np.int64 )
+  final_pos[ np.argsort( data, kind="stable" ) ] = np.arange( n )
+  max_left  = int( np.max( np.arange( n ) - final_pos ) )
+  return min( n-1, max_left+1 )
+
+#=========================================================================
+# SortTimingModel
+#=========================================================================
+
+class SortTimingModel:
+
+  def __init__( self, algo="merge", mem_latency=10, mem_bw=1,
+                buffer_size=128, ncmps=8, radix_bits=8 ):
+
+    if algo not in sort_algos:
+      raise ValueError( f"unknown sort algorithm {algo} "
+                        f"(expected one of {','.join(sort_algos)})" )
+
+    self.algo        = algo
+    self.mem_latency = mem_latency
+    self.mem_bw      = mem_bw
+    self.buffer_size = buffer_size
+    self.ncmps       = ncmps
+    self.radix_bits  = radix_bits
+
+  #-----------------------------------------------------------------------
+  # Building blocks
+  #-----------------------------------------------------------------------
+
+  # Cycles to move nwords to or from memory
+
+  def transfer( self, nwords ):
+    if nwords == 0:
+      return 0
+    return self.mem_latency + math.ceil( nwords / self.mem_bw )
+
+  # Longest run we can sort in the buffer. Merge and radix sort are out
+  # of place, so they need half the buffer for the output.
+
+  def run_len( self ):
+    if self.algo in [ "merge", "radix" ]:
+      return max( 1, self.buffer_size // 2 )
+    return self.buffer_size
+
+  # Cycles to sort a run which is already in the buffer
+
+  def compute( self, run ):
+
+    m = len( run )
+    if m < 2:
+      return 0
+
+    if self.algo == "bubble":
+      p = bubble_passes( run )
+      return p*m - p*(p+1)//2
+
+    if self.algo == "merge":
+      return m * math.ceil( math.log2( m ) )
+
+    if self.algo == "radix":
+      ndigits = math.ceil( 32 / self.radix_bits )
+      return ndigits * ( 2*m + 2**self.radix_bits )
+
+    if self.algo == "bitonic":
+      k = math.ceil( math.log2( m ) )
+      nstages = k*(k+1)//2
+      return nstages * math.ceil( 2**k // 2 / self.ncmps )
+
+  #-----------------------------------------------------------------------
+  # estimate
+  #-----------------------------------------------------------------------
+
+  def estimate( self, data ):
+
+    data = np.asarray( data )
+    n    = len( data )
+
+    if n == 0:
+      return SortEstimate( self.algo, 0, 0, 0, 0, 0, 0 )
+
+    # Radix sort of an array which does not fit streams every digit
+    # through memory: count the digits in one pass, then scatter
+
+    if self.algo == "radix" and n > self.run_len():
+      ndigits = math.ceil( 32 / self.radix_bits )
+      scan    = 2**self.radix_bits
+      mem     = ndigits * ( self.transfer( n ) + self.mem_latency )
+      compute = ndigits * scan
+      stream  = ndigits * max( n, math.ceil( 2*n / self.mem_bw ) )
+      return SortEstimate( self.algo, n, compute + stream, mem,
+                           2*n*ndigits, n*ndigits, 2*ndigits )
+
+    # Sort each run in the buffer
+
+    run_len = self.run_len()
+    compute = 0
+    mem     = 0
+    for i in range( 0, n, run_len ):
+      run      = data[i:i+run_len]
+      compute += self.compute( run )
+      mem     += self.transfer( len(run) ) * 2
+
+    reads  = n
+    writes = n
+
+    # Then merge the runs two at a time, streaming through memory
+
+    nruns   = math.ceil( n / run_len )
+    nmerges = math.ceil( math.log2( nruns ) ) if nruns > 1 else 0
+
+    for _ in range( nmerges ):
+      compute += max( n, math.ceil( 2*n / self.mem_bw ) )
+      mem     += self.mem_latency
+      reads   += n
+      writes  += n
+
+    return SortEstimate( self.algo, n, compute, mem, reads, writes,
+                         1 + nmerges )
+
+#-------------------------------------------------------------------------
+# total_estimate
+#-------------------------------------------------------------------------
+# Sum of the estimates for several sorts (e.g., all the jobs in a run).
+
+def total_estimate( estimates, algo ):
+  return sum( estimates, SortEstimate( algo, 0, 0, 0, 0, 0, 0 ) )
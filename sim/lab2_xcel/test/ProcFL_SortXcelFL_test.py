@@ -0,0 +1,166 @@
+#=========================================================================
+# ProcFL_SortXcelFL_test
+#=========================================================================
+# Drive the sort accelerator from the FL processor with the blocking and
+# the non-blocking protocol, and check the protocol version software
+# reads from xr9 for both accelerators.
+
+import pytest
+
+from pymtl3            import *
+from proc.test.harness import asm_test, run_test
+from proc.ProcFL       import ProcFL
+
+from lab2_xcel.SortXcelFL import SortXcelFL
+from lab2_xcel.SortXcel   import SortXcel
+
+#-------------------------------------------------------------------------
+# gen_blocking_test
+#-------------------------------------------------------------------------
+# Reading xr0 waits for the sort to finish.
+
+def gen_blocking_test():
+  return """
+    csrr x1, mngr2proc < 0x00002000
+    addi x2, x0, 4
+
+    csrw 0x7e1, x1
+    csrw 0x7e2, x2
+    csrw 0x7e0, x0
+    csrr x3, 0x7e0
+    csrw proc2mngr, x3 > 1
+
+    lw   x4, 0(x1)
+    csrw proc2mngr, x4 > 1
+    lw   x4, 4(x1)
+    csrw proc2mngr, x4 > 2
+    lw   x4, 8(x1)
+    csrw proc2mngr, x4 > 3
+    lw   x4, 12(x1)
+    csrw proc2mngr, x4 > 4
+
+    .data
+    .word 4
+    .word 3
+    .word 2
+    .word 1
+  """
+
+#-------------------------------------------------------------------------
+# gen_polling_test
+#-------------------------------------------------------------------------
+# Writing xr0 returns right away, so we count in x5 how often polling the
+# status register finds the job still outstanding. Sorting 32 elements
+# takes several memory requests, so at least the first poll has to find
+# the job outstanding.
+
+def gen_polling_test():
+  data = "\n".join( f"    .word {32-i}" for i in range(32) )
+  return """
+    csrr x1, mngr2proc < 0x00002000
+    addi x2, x0, 32
+    addi x5, x0, 0
+
+    csrw 0x7e1, x1
+    csrw 0x7e2, x2
+    csrw 0x7e0, x0
+
+  label_poll:
+    csrr x3, 0x7e8
+    beq  x3, x0, label_done
+    addi x5, x5, 1
+    jal  x0, label_poll
+
+  label_done:
+    sltu x5, x0, x5
+    csrw proc2mngr, x5 > 1
+
+    lw   x4, 0(x1)
+    csrw proc2mngr, x4 > 1
+    lw   x4, 124(x1)
+    csrw proc2mngr, x4 > 32
+
+    .data
+""" + data + "\n"
+
+#-------------------------------------------------------------------------
+# gen_queued_test
+#-------------------------------------------------------------------------
+# Start a second job while the first one is still outstanding, then wait
+# for both by reading xr0.
+
+def gen_queued_test():
+  return """
+    csrr x1, mngr2proc < 0x00002000
+    csrr x6, mngr2proc < 0x00002010
+    addi x2, x0, 4
+
+    csrw 0x7e1, x1
+    csrw 0x7e2, x2
+    csrw 0x7e0, x0
+
+    csrw 0x7e1, x6
+    csrw 0x7e2, x2
+    csrw 0x7e0, x0
+
+    csrr x3, 0x7e0
+    csrw proc2mngr, x3 > 1
+    csrr x3, 0x7e8
+    csrw proc2mngr, x3 > 0
+
+    lw   x4, 0(x1)
+    csrw proc2mngr, x4 > 1
+    lw   x4, 12(x1)
+    csrw proc2mngr, x4 > 4
+    lw   x4, 0(x6)
+    csrw proc2mngr, x4 > 5
+    lw   x4, 12(x6)
+    csrw proc2mngr, x4 > 8
+
+    .data
+    .word 4
+    .word 3
+    .word 2
+    .word 1
+    .word 8
+    .word 6
+    .word 7
+    .word 5
+  """
+
+#-------------------------------------------------------------------------
+# gen_version_test
+#-------------------------------------------------------------------------
+# Reading xr9 does not wait for anything, and since SortXcel.v answers
+# every read with 1 while it is idle, only SortXcelFL reports the
+# extended protocol (version 2).
+
+def gen_version_test( version ):
+  return f"""
+    csrr x3, 0x7e9
+    csrw proc2mngr, x3 > {version}
+    csrr x3, 0x7e9
+    csrw proc2mngr, x3 > {version}
+  """
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( gen_blocking_test ),
+  asm_test( gen_polling_test  ),
+  asm_test( gen_queued_test   ),
+])
+@pytest.mark.parametrize( "delays", [ False, True ] )
+def test( name, test, delays, cmdline_opts ):
+  run_test( ProcFL, test, delays=delays, cmdline_opts=cmdline_opts,
+            XcelType=SortXcelFL, xmem_nbits=128 )
+
+@pytest.mark.parametrize( "XcelType, xmem_nbits, version", [
+  ( SortXcelFL, 128, 2 ),
+  ( SortXcel,   32,  1 ),
+])
+def test_version( XcelType, xmem_nbits, version, cmdline_opts ):
+  run_test( ProcFL, gen_version_test( version ), cmdline_opts=cmdline_opts,
+            XcelType=XcelType, xmem_nbits=xmem_nbits )
@@ -4,7 +4,10 @@
 
 import pytest
 import random
-import struct
+
+import numpy as np
+
+from itertools import islice
 
 random.seed(0xdeadbeef)
 
@@ -14,22 +17,35 @@ from pymtl3.stdlib.stream     import StreamSourceFL, StreamSinkFL
 from pymtl3.stdlib.mem        import MemoryFL, mk_mem_msg
 from pymtl3.stdlib.xcel       import XcelMsgType, mk_xcel_msg
 
-from lab2_xcel.SortXcelFL import SortXcelFL
+from common.stream      import LazyStreamSourceFL, LazyStreamSinkFL
+from common.mem_staging import write_array, read_array, check_array
+
+from lab2_xcel.SortXcelFL  import SortXcelFL, SortMode
+from lab2_xcel.sort_timing import SortTimingModel
 
 XcelReqMsg, XcelRespMsg = mk_xcel_msg( 5, 32 )
 
 #-------------------------------------------------------------------------
 # TestHarness
 #-------------------------------------------------------------------------
+# With lazy=True the source/sink pull messages lazily from the given
+# sequences or iterators (see iter_xcel_protocol_msgs) instead of copying
+# them into lists. The test memory port has to match the data width of
+# the accelerator memory port, which is wider for burst transactions.
 
 class TestHarness( Component ):
 
-  def construct( s, xcel ):
+  def construct( s, xcel, lazy=False, mem_nbits=32 ):
+
+    if lazy:
+      s.src  = LazyStreamSourceFL( XcelReqMsg )
+      s.sink = LazyStreamSinkFL( XcelRespMsg )
+    else:
+      s.src  = StreamSourceFL( XcelReqMsg )
+      s.sink = StreamSinkFL( XcelRespMsg )
 
-    s.src  = StreamSourceFL( XcelReqMsg )
-    s.sink = StreamSinkFL( XcelRespMsg )
     s.xcel = xcel
-    s.mem  = MemoryFL(1, mem_ifc_dtypes=[mk_mem_msg(8,32,32)] )
+    s.mem  = MemoryFL(1, mem_ifc_dtypes=[mk_mem_msg(8,32,mem_nbits)] )
 
     s.src.ostream  //= s.xcel.xcel.reqstream
     s.sink.istream //= s.xcel.xcel.respstream
@@ -66,16 +82,63 @@ def xresp( type_, data ):
 # These are the source sink messages we need to configure the accelerator
 # and wait for it to finish. We use the same messages in all of our
 # tests. The difference between the tests is the data to be sorted in the
-# test memory.
+# test memory. Chunked sorts also write the run length and the scratch
+# buffer base, and the other sort modes write the mode registers.
 
-def gen_xcel_protocol_msgs( base_addr, size ):
-  return [
+def gen_xcel_protocol_msgs( base_addr, size, run_len=0, scratch=0,
+                            flags=0, payload=0, k=0 ):
+  msgs = [
     xreq( 'wr', 1, base_addr ), xresp( 'wr', 0 ),
     xreq( 'wr', 2, size      ), xresp( 'wr', 0 ),
+  ]
+  if run_len > 0:
+    msgs += [
+      xreq( 'wr', 3, run_len ), xresp( 'wr', 0 ),
+      xreq( 'wr', 4, scratch ), xresp( 'wr', 0 ),
+    ]
+  if flags or payload or k:
+    msgs += [
+      xreq( 'wr', 5, flags   ), xresp( 'wr', 0 ),
+      xreq( 'wr', 6, payload ), xresp( 'wr', 0 ),
+      xreq( 'wr', 7, k       ), xresp( 'wr', 0 ),
+    ]
+  return msgs + [
     xreq( 'wr', 0, 0         ), xresp( 'wr', 0 ),
     xreq( 'rd', 0, 0         ), xresp( 'rd', 1 ),
   ]
 
+#-------------------------------------------------------------------------
+# iter_xcel_protocol_msgs
+#-------------------------------------------------------------------------
+# Generates the requests (or responses) for a sequence of jobs given as
+# tuples of arguments for gen_xcel_protocol_msgs (e.g., (base_addr,
+# size)) one job at a time, so we can drive any number of jobs through
+# the lazy source/sink without building the message lists. jobs must be iterable more than once (e.g., a list or range)
+# since the source and sink each walk it separately.
+
+def iter_xcel_protocol_msgs( jobs, resps=False ):
+  for job in jobs:
+    yield from islice( gen_xcel_protocol_msgs( *job ),
+                       int(resps), None, 2 )
+
+#-------------------------------------------------------------------------
+# gen_xcel_queued_protocol_msgs
+#-------------------------------------------------------------------------
+# Non-blocking version of the protocol for a list of jobs: we start two
+# jobs back to back without waiting, then wait for both by reading xr0,
+# and check that the status register says there is no job left.
+
+def gen_xcel_queued_protocol_msgs( jobs ):
+  msgs = []
+  for i, job in enumerate( jobs ):
+    msgs += gen_xcel_protocol_msgs( *job )[:-2]
+    if i % 2 == 1 or i == len(jobs)-1:
+      msgs += [
+        xreq( 'rd', 0, 0 ), xresp( 'rd', 1 ),
+        xreq( 'rd', 8, 0 ), xresp( 'rd', 0 ),
+      ]
+  return msgs
+
 #-------------------------------------------------------------------------
 # Test Cases
 #-------------------------------------------------------------------------
@@ -86,6 +149,7 @@ large_data    = [ random.randint(0,0x7fffffff) for i in range(32) ]
 sort_fwd_data = sorted(small_data)
 sort_rev_data = list(reversed(sorted(small_data)))
 nonpow2_size  = [ random.randint(0,0xffff)     for i in range(35) ]
+huge_data     = [ random.randint(0,0xffffffff) for i in range(1000) ]
 
 #-------------------------------------------------------------------------
 # Test Case Table
@@ -114,12 +178,9 @@ test_case_table = mk_test_case_table([
 # run_test
 #-------------------------------------------------------------------------
 
-def run_test( xcel, cmdline_opts, test_params ):
-
-  # Convert test data into byte array
+def run_test( xcel, cmdline_opts, test_params, mem_nbits=32 ):
 
   data = test_params.data
-  data_bytes = struct.pack("<{}I".format(len(data)),*data)
 
   # Protocol messages
 
@@ -129,7 +190,7 @@ def run_test( xcel, cmdline_opts, test_params ):
 
   # Create test harness with protocol messagse
 
-  th = TestHarness( xcel )
+  th = TestHarness( xcel, mem_nbits=mem_nbits )
 
   th.set_param( "top.src.construct", msgs=xcel_protocol_msgs[::2],
     initial_delay=test_params.src+3, interval_delay=test_params.src )
@@ -144,7 +205,7 @@ def run_test( xcel, cmdline_opts, test_params ):
 
   # Load the data into the test memory
 
-  th.mem.write_mem( 0x1000, data_bytes )
+  write_array( th.mem, 0x1000, data )
 
   # Enlarge max_cycles
 
@@ -155,50 +216,56 @@ def run_test( xcel, cmdline_opts, test_params ):
 
   run_sim( th, cmdline_opts, duts=['xcel'] )
 
-  # Retrieve data from test memory
-
-  result_bytes = th.mem.read_mem( 0x1000, len(data_bytes) )
-
-  # Convert result bytes into list of ints
-
-  result = list(struct.unpack("<{}I".format(len(data)),result_bytes))
+  # Retrieve data from test memory and compare to sorted reference
 
-  # Compare result to sorted reference
+  result = read_array( th.mem, 0x1000, len(data) )
 
-  assert result == sorted(data)
+  check_array( result, sorted(data) )
 
 #-------------------------------------------------------------------------
 # run_test_multiple
 #-------------------------------------------------------------------------
 # We want to make sure we can use our accelerator multiple times, so we
 # create an array of 32 elements and then we use the accelerator to sort
-# the first four elements, the second four elements, etc.
+# the first four elements, the second four elements, etc. With lazy=True
+# the protocol messages for the jobs are generated as the test runs, and
+# with queued=True we use the non-blocking protocol to start the jobs two
+# at a time.
 
-def run_test_multiple( xcel, cmdline_opts ):
+def run_test_multiple( xcel, cmdline_opts, lazy=False, mem_nbits=32,
+                       queued=False ):
 
   # Convert test data into byte array
 
   random.seed(0xdeadbeef)
 
   data = [ random.randint(0,0xffff) for i in range(32) ]
-  data_bytes = struct.pack("<{}I".format(len(data)),*data)
 
   # Protocol messages
 
   base_addr = 0x1000
-  msgs = []
-
-  for i in range(8):
-    msgs.extend( gen_xcel_protocol_msgs( base_addr+i*16, 4 ) )
+  jobs = [ ( base_addr+i*16, 4 ) for i in range(8) ]
+
+  if lazy:
+    xreqs  = iter_xcel_protocol_msgs( jobs )
+    xresps = iter_xcel_protocol_msgs( jobs, resps=True )
+  elif queued:
+    msgs = gen_xcel_queued_protocol_msgs( jobs )
+    xreqs, xresps = msgs[::2], msgs[1::2]
+  else:
+    msgs = []
+    for job in jobs:
+      msgs.extend( gen_xcel_protocol_msgs( *job ) )
+    xreqs, xresps = msgs[::2], msgs[1::2]
 
   # Create test harness with protocol messagse
 
-  th = TestHarness( xcel )
+  th = TestHarness( xcel, lazy=lazy, mem_nbits=mem_nbits )
 
-  th.set_param( "top.src.construct", msgs=msgs[::2],
+  th.set_param( "top.src.construct", msgs=xreqs,
     initial_delay=6, interval_delay=3 )
 
-  th.set_param( "top.sink.construct", msgs=msgs[1::2],
+  th.set_param( "top.sink.construct", msgs=xresps,
     initial_delay=10, interval_delay=7 )
 
   th.set_param( "top.mem.construct", stall_prob=0.5, extra_latency=3 )
@@ -207,7 +274,7 @@ def run_test_multiple( xcel, cmdline_opts ):
 
   # Load the data into the test memory
 
-  th.mem.write_mem( 0x1000, data_bytes )
+  write_array( th.mem, 0x1000, data )
 
   # Enlarge max_cycles
 
@@ -218,27 +285,178 @@ def run_test_multiple( xcel, cmdline_opts ):
 
   run_sim( th, cmdline_opts, duts=['xcel'] )
 
-  # Retrieve data from test memory
+  # Retrieve data from test memory and compare each job to its sorted
+  # reference
+
+  result = read_array( th.mem, 0x1000, len(data) )
+
+  check_array( result.reshape( 8, 4 ), np.sort( np.reshape( data, (8,4) ) ) )
+
+#-------------------------------------------------------------------------
+# run_test_chunked
+#-------------------------------------------------------------------------
+# Sort an array in runs of run_len elements with a scratch buffer. The
+# array starts at 0x1004 so that neither the runs nor the merged output
+# are aligned to lines.
+
+def run_test_chunked( xcel, cmdline_opts, data, run_len, mem_nbits=32 ):
 
-  result_bytes = th.mem.read_mem( 0x1000, len(data_bytes) )
+  base_addr = 0x1004
+  scratch   = 0x8000
 
-  # Convert result bytes into list of ints
+  msgs = gen_xcel_protocol_msgs( base_addr, len(data), run_len, scratch )
 
-  result = list(struct.unpack("<{}I".format(len(data)),result_bytes))
+  th = TestHarness( xcel, mem_nbits=mem_nbits )
+
+  th.set_param( "top.src.construct",  msgs=msgs[::2]  )
+  th.set_param( "top.sink.construct", msgs=msgs[1::2] )
+  th.set_param( "top.mem.construct", stall_prob=0.5, extra_latency=3 )
+
+  th.elaborate()
+
+  write_array( th.mem, base_addr, data )
+
+  if cmdline_opts['max_cycles'] is None:
+    cmdline_opts['max_cycles'] = 100000
+
+  run_sim( th, cmdline_opts, duts=['xcel'] )
 
-  # Compare result to sorted reference
+  check_array( read_array( th.mem, base_addr, len(data) ), sorted(data) )
 
-  for i in range(8):
-    assert result[i*4:i*4+4] == sorted(data[i*4:i*4+4])
+  # Nothing is written past the end of the array
+
+  assert read_array( th.mem, base_addr + 4*len(data), 1 )[0] == 0
+
+#-------------------------------------------------------------------------
+# run_test_mode
+#-------------------------------------------------------------------------
+# Sort keys with a payload array in the given mode and compare both the
+# keys and the payload to a reference computed in software. With top-k
+# everything past the first k elements must be left as is.
+
+def ref_sort_mode( keys, vals, flags, k ):
+
+  def key( i ):
+    x = keys[i]
+    if flags & SortMode.SIGNED and x & 0x80000000:
+      x -= 1 << 32
+    return -x if flags & SortMode.DESCENDING else x
+
+  k     = k if 0 < k < len(keys) else len(keys)
+  order = sorted( range(len(keys)), key=key )[:k]
+
+  if flags & SortMode.ARGSORT:
+    ref_vals = order
+  elif flags & SortMode.PAYLOAD:
+    ref_vals = [ vals[i] for i in order ]
+  else:
+    ref_vals = []
+
+  ref_keys = [ keys[i] for i in order ]
+  return ref_keys + keys[k:], ref_vals + vals[len(ref_vals):]
+
+def run_test_mode( xcel, cmdline_opts, keys, flags, k=0, run_len=0,
+                   mem_nbits=32 ):
+
+  base_addr = 0x1000
+  vals_addr = 0x3000
+  scratch   = 0x8000
+
+  vals = [ 0x100000 + i for i in range(len(keys)) ]
+
+  msgs = gen_xcel_protocol_msgs( base_addr, len(keys), run_len, scratch,
+                                 flags, vals_addr, k )
+
+  th = TestHarness( xcel, mem_nbits=mem_nbits )
+
+  th.set_param( "top.src.construct",  msgs=msgs[::2]  )
+  th.set_param( "top.sink.construct", msgs=msgs[1::2] )
+
+  th.elaborate()
+
+  write_array( th.mem, base_addr, keys )
+  write_array( th.mem, vals_addr, vals )
+
+  if cmdline_opts['max_cycles'] is None:
+    cmdline_opts['max_cycles'] = 100000
+
+  run_sim( th, cmdline_opts, duts=['xcel'] )
+
+  ref_keys, ref_vals = ref_sort_mode( keys, vals, flags, k )
+
+  check_array( read_array( th.mem, base_addr, len(keys) ), ref_keys )
+  check_array( read_array( th.mem, vals_addr, len(vals) ), ref_vals )
 
 #-------------------------------------------------------------------------
 # Test cases
 #-------------------------------------------------------------------------
 
+# The FL model uses bursts of four words by default
+
 @pytest.mark.parametrize( **test_case_table )
 def test( cmdline_opts, test_params ):
-  run_test( SortXcelFL(), cmdline_opts, test_params )
+  run_test( SortXcelFL(), cmdline_opts, test_params, mem_nbits=128 )
 
 def test_multiple( cmdline_opts ):
-  run_test_multiple( SortXcelFL(), cmdline_opts )
+  run_test_multiple( SortXcelFL(), cmdline_opts, mem_nbits=128 )
 
+def test_multiple_lazy( cmdline_opts ):
+  run_test_multiple( SortXcelFL(), cmdline_opts, lazy=True, mem_nbits=128 )
+
+def test_multiple_queued( cmdline_opts ):
+  run_test_multiple( SortXcelFL(), cmdline_opts, mem_nbits=128, queued=True )
+
+# Single-word transfers, and eight-word bursts where every other job
+# starts in the middle of a line
+
+@pytest.mark.parametrize( "nwords", [ 1, 8 ] )
+def test_burst( cmdline_opts, nwords ):
+  run_test_multiple( SortXcelFL( nwords=nwords ), cmdline_opts,
+                     mem_nbits=32*nwords )
+
+
+# With a timing model the FL model records one estimate per job
+
+def test_timing( cmdline_opts ):
+  xcel = SortXcelFL( timing=SortTimingModel( "bubble" ) )
+  run_test_multiple( xcel, cmdline_opts, mem_nbits=128 )
+  assert len( xcel.estimates ) == 8
+  assert all( est.n == 4 and est.cycles > 0 for est in xcel.estimates )
+
+# Chunked sorts with more runs than one, a partial last run, and an array
+# which is much larger than the on-chip buffer of the RTL
+
+@pytest.mark.parametrize( "data, run_len", [
+  ( small_data,    4   ),
+  ( nonpow2_size,  8   ),
+  ( nonpow2_size,  7   ),
+  ( mini,          128 ),
+  ( huge_data,     128 ),
+])
+def test_chunked( cmdline_opts, data, run_len ):
+  run_test_chunked( SortXcelFL(), cmdline_opts, data, run_len, mem_nbits=128 )
+
+# Sort modes, both as a single run and in chunks
+
+signed_data = [ random.randint(0,0xffffffff) for i in range(35) ]
+dup_data    = [ random.randint(0,7)          for i in range(35) ]
+
+mode_table = [
+  ( signed_data, SortMode.SIGNED,                      0  ),
+  ( signed_data, SortMode.DESCENDING,                  0  ),
+  ( signed_data, SortMode.SIGNED|SortMode.DESCENDING,  0  ),
+  ( dup_data,    SortMode.PAYLOAD,                     0  ),
+  ( dup_data,    SortMode.DESCENDING|SortMode.PAYLOAD, 0  ),
+  ( signed_data, SortMode.SIGNED|SortMode.ARGSORT,     0  ),
+  ( signed_data, 0,                                    5  ),
+  ( dup_data,    SortMode.PAYLOAD,                     10 ),
+  ( signed_data, SortMode.DESCENDING|SortMode.ARGSORT, 1  ),
+  ( huge_data,   SortMode.SIGNED|SortMode.ARGSORT,     0  ),
+  ( huge_data,   SortMode.SIGNED,                      16 ),
+]
+
+@pytest.mark.parametrize( "run_len", [ 0, 8 ] )
+@pytest.mark.parametrize( "data, flags, k", mode_table )
+def test_mode( cmdline_opts, data, flags, k, run_len ):
+  run_test_mode( SortXcelFL(), cmdline_opts, data, flags, k, run_len,
+                 mem_nbits=128 )
@@ -0,0 +1,88 @@
+#=========================================================================
+# sort_datasets_test
+#=========================================================================
+
+import pytest
+
+import numpy as np
+
+from lab2_xcel.sort_datasets import input_kinds, parse_input, gen_input
+
+#-------------------------------------------------------------------------
+# count_inversions
+#-------------------------------------------------------------------------
+
+def count_inversions( data ):
+  data = np.asarray( data )
+  return int( np.sum( np.triu( data[:,None] > data[None,:], 1 ) ) )
+
+#-------------------------------------------------------------------------
+# test_kinds
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "n", [ 0, 1, 16, 128 ] )
+@pytest.mark.parametrize( "kind", input_kinds )
+def test_kinds( kind, n ):
+
+  data = gen_input( kind, n )
+
+  assert data.dtype == np.uint32
+  assert len( data ) == n
+
+  # The same seed gives the same array
+
+  assert np.array_equal( data, gen_input( kind, n ) )
+
+#-------------------------------------------------------------------------
+# test_properties
+#-------------------------------------------------------------------------
+
+def test_properties():
+
+  n = 128
+
+  assert np.all( np.diff( gen_input( "sorted-fwd", n ).astype(np.int64) ) >= 0 )
+  assert np.all( np.diff( gen_input( "sorted-rev", n ).astype(np.int64) ) <= 0 )
+  assert len( np.unique( gen_input( "all-equal", n ) ) ) == 1
+
+  assert len( np.unique( gen_input( "few-unique",   n ) ) ) <= 4
+  assert len( np.unique( gen_input( "few-unique:2", n ) ) ) <= 2
+
+  # Half of the keys are the hot key
+
+  _, counts = np.unique( gen_input( "heavy-dups", n ), return_counts=True )
+  assert 32 <= counts.max() <= 96
+  _, counts = np.unique( gen_input( "heavy-dups:100", n ), return_counts=True )
+  assert counts.max() == n
+
+  # Zipf ranks make the most frequent key far more common than the rest
+
+  _, counts = np.unique( gen_input( "zipfian", n ), return_counts=True )
+  assert counts.max() > n//4
+
+#-------------------------------------------------------------------------
+# test_nearly_sorted
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "n, ninversions", [ (2,1), (16,0), (16,5), (64,40) ] )
+def test_nearly_sorted( n, ninversions ):
+  data = gen_input( f"nearly-sorted:{ninversions}", n, seed=n )
+  assert count_inversions( data ) == ninversions
+  assert len( np.unique( data ) ) == n
+
+def test_nearly_sorted_default():
+  assert count_inversions( gen_input( "nearly-sorted", 128 ) ) == 8
+
+#-------------------------------------------------------------------------
+# test_errors
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "input_", [ "bogus", "nearly-sorted:7",
+  "few-unique:0", "zipfian:1", "heavy-dups:150", "few-unique:abc" ] )
+def test_errors( input_ ):
+  with pytest.raises( ValueError ):
+    gen_input( input_, 4 )
+
+def test_parse_input():
+  assert parse_input( "random" ) == ( "random", None )
+  assert parse_input( "zipfian:1.2" ) == ( "zipfian", "1.2" )
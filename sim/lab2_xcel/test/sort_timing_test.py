@@ -0,0 +1,122 @@
+#=========================================================================
+# sort_timing_test
+#=========================================================================
+
+import pytest
+
+import numpy as np
+
+from lab2_xcel.sort_timing import SortTimingModel, bubble_passes, total_estimate
+
+#-------------------------------------------------------------------------
+# test_bubble_passes
+#-------------------------------------------------------------------------
+
+def test_bubble_passes():
+
+  assert bubble_passes( [] ) == 0
+  assert bubble_passes( [ 5 ] ) == 0
+
+  # Sorted data needs one pass to see that there are no swaps, reversed
+  # data needs all n-1 passes
+
+  assert bubble_passes( np.arange( 16 ) ) == 1
+  assert bubble_passes( np.arange( 16 )[::-1] ) == 15
+
+  # The smallest element at the end has to move all the way left, while
+  # the largest element at the front moves right in a single pass
+
+  assert bubble_passes( [ 1, 2, 3, 4, 0 ] ) == 4
+  assert bubble_passes( [ 4, 0, 1, 2, 3 ] ) == 2
+
+  # Equal elements are never swapped
+
+  assert bubble_passes( [ 7, 7, 7, 7 ] ) == 1
+
+#-------------------------------------------------------------------------
+# test_in_buffer
+#-------------------------------------------------------------------------
+# An array which fits in the buffer is loaded once and stored once.
+
+def test_in_buffer():
+
+  data = np.arange( 64 )[::-1]
+
+  bubble = SortTimingModel( "bubble", mem_latency=10, buffer_size=128 )
+  est    = bubble.estimate( data )
+  assert est.compute_cycles == 63*64 - 63*64//2
+  assert est.mem_cycles     == 2*( 10 + 64 )
+  assert ( est.mem_reads, est.mem_writes ) == ( 64, 64 )
+  assert est.mem_bytes == 4*128
+
+  # Bubble sort is data dependent while the others are not
+
+  assert bubble.estimate( np.sort( data ) ).cycles < est.cycles
+
+  for algo in [ "merge", "radix", "bitonic" ]:
+    model = SortTimingModel( algo, buffer_size=128 )
+    assert model.estimate( data ).cycles == \
+           model.estimate( np.sort( data ) ).cycles
+
+  merge = SortTimingModel( "merge", buffer_size=128 )
+  assert merge.estimate( data ).compute_cycles == 64*6
+
+  # Bitonic sort pads to a power of two: 21 stages of 32 compare and
+  # swaps over 8 comparators
+
+  bitonic = SortTimingModel( "bitonic", ncmps=8 )
+  assert bitonic.estimate( np.arange( 60 ) ).compute_cycles == 21*4
+
+#-------------------------------------------------------------------------
+# test_external
+#-------------------------------------------------------------------------
+# Arrays larger than the buffer take extra passes over memory.
+
+def test_external():
+
+  n    = 1024
+  data = np.arange( n )[::-1]
+
+  # Merge sort sorts runs of half the buffer and then merges 16 runs in
+  # 4 passes
+
+  merge = SortTimingModel( "merge", buffer_size=128 )
+  est   = merge.estimate( data )
+  assert est.npasses == 5
+  assert ( est.mem_reads, est.mem_writes ) == ( 5*n, 5*n )
+
+  # Radix sort does two reads and one write per element and digit
+
+  radix = SortTimingModel( "radix", buffer_size=128, radix_bits=8 )
+  est   = radix.estimate( data )
+  assert est.npasses == 8
+  assert ( est.mem_reads, est.mem_writes ) == ( 8*n, 4*n )
+
+  # More bandwidth makes everything faster
+
+  for algo in [ "merge", "radix", "bitonic" ]:
+    slow = SortTimingModel( algo, mem_bw=1, buffer_size=128 )
+    fast = SortTimingModel( algo, mem_bw=4, buffer_size=128 )
+    assert fast.estimate( data ).cycles < slow.estimate( data ).cycles
+
+#-------------------------------------------------------------------------
+# test_total
+#-------------------------------------------------------------------------
+
+def test_total():
+
+  model = SortTimingModel( "merge" )
+  ests  = [ model.estimate( np.arange( n ) ) for n in [ 4, 16, 300 ] ]
+  total = total_estimate( ests, "merge" )
+
+  assert total.n      == 320
+  assert total.cycles == sum( est.cycles for est in ests )
+  assert total_estimate( [], "merge" ).cycles == 0
+
+#-------------------------------------------------------------------------
+# test_unknown_algo
+#-------------------------------------------------------------------------
+
+def test_unknown_algo():
+  with pytest.raises( ValueError ):
+    SortTimingModel( "quick" )
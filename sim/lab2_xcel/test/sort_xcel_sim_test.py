@@ -11,7 +11,8 @@ from itertools  import product
 
 impls  = [ "fl","rtl" ]
 
-inputs = [ "random", "sorted-fwd", "sorted-rev" ]
+inputs = [ "random", "sorted-fwd", "sorted-rev", "nearly-sorted:4",
+           "heavy-dups", "few-unique", "zipfian", "all-equal" ]
 
 test_cases = []
 
@@ -44,3 +45,95 @@ def test( impl, input_, cmdline_opts ):
   except CalledProcessError as e:
     raise Exception( "Error running simulator!" )
 
+
+#-------------------------------------------------------------------------
+# test_njobs
+#-------------------------------------------------------------------------
+# Several jobs back to back with the lazily generated protocol messages.
+
+@pytest.mark.parametrize( "impl", impls )
+def test_njobs( impl, cmdline_opts ):
+
+  test_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  sim_dir  = os.path.dirname( test_dir )
+  sim      = sim_dir + os.path.sep + 'sort-xcel-sim'
+
+  cmd = [ sim, "--impl", impl, "--input", "random", "--njobs", "3", "--stats" ]
+
+  print("")
+  print("Simulator command line:", ' '.join(cmd))
+
+  try:
+    check_call(cmd)
+  except CalledProcessError as e:
+    raise Exception( "Error running simulator!" )
+
+#-------------------------------------------------------------------------
+# test_timing
+#-------------------------------------------------------------------------
+# Timing model estimates for all the algorithms next to the simulation,
+# including an empty dataset which has no cycles per element.
+
+@pytest.mark.parametrize( "size", [ 32, 0 ] )
+def test_timing( size, cmdline_opts ):
+
+  test_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  sim_dir  = os.path.dirname( test_dir )
+  sim      = sim_dir + os.path.sep + 'sort-xcel-sim'
+
+  cmd = [ sim, "--impl", "fl", "--input", "random", "--size", str(size),
+          "--timing", "all", "--buffer-size", "64" ]
+
+  print("")
+  print("Simulator command line:", ' '.join(cmd))
+
+  try:
+    check_call(cmd)
+  except CalledProcessError as e:
+    raise Exception( "Error running simulator!" )
+
+#-------------------------------------------------------------------------
+# test_size
+#-------------------------------------------------------------------------
+# Datasets of other sizes, including ones which do not fill a line.
+
+@pytest.mark.parametrize( "impl, size", [ ("fl",1), ("fl",37), ("fl",300),
+                                          ("rtl",1), ("rtl",128) ] )
+def test_size( impl, size, cmdline_opts ):
+
+  test_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  sim_dir  = os.path.dirname( test_dir )
+  sim      = sim_dir + os.path.sep + 'sort-xcel-sim'
+
+  cmd = [ sim, "--impl", impl, "--input", "random", "--size", str(size),
+          "--stats" ]
+
+  print("")
+  print("Simulator command line:", ' '.join(cmd))
+
+  try:
+    check_call(cmd)
+  except CalledProcessError as e:
+    raise Exception( "Error running simulator!" )
+
+#-------------------------------------------------------------------------
+# test_sweep
+#-------------------------------------------------------------------------
+# Small sweep to make sure the parallel sweep mode works.
+
+def test_sweep( cmdline_opts ):
+
+  test_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  sim_dir  = os.path.dirname( test_dir )
+  sim      = sim_dir + os.path.sep + 'sort-xcel-sim'
+
+  cmd = [ sim, "--sweep", "--sweep-inputs", "random,nearly-sorted:2,all-equal",
+          "--sweep-sizes", "8,16", "--jobs", "2" ]
+
+  print("")
+  print("Simulator command line:", ' '.join(cmd))
+
+  try:
+    check_call(cmd)
+  except CalledProcessError as e:
+    raise Exception( "Error running simulator!" )
@@ -0,0 +1,111 @@
+#=========================================================================
+# fc_tiling
+#=========================================================================
+# Tile schedules for running a fully connected layer on a fixed-size
+# array. The array holds a tile_in x tile_out block of weights and
+# tile_out partial sums for each of up to tile_batch input vectors, so a
+# layer of any size is computed one weight tile at a time:
+#
+#  >>> schedule = fc_tile_schedule( 784, 128, 4, tile_in=64, tile_out=16 )
+#  >>> weight_reloads( schedule )
+#  104
+#  >>> print( format_schedule( schedule ) )
+#
+# Input vectors are processed in groups of tile_batch. For each group we
+# go through the output tiles, and for each output tile through the input
+# tiles. The partial sums of an output tile start from the biases on its
+# first input tile, accumulate the products of every input tile, and are
+# written out as results after its last input tile. Since the datapath
+# sums with 12-bit wraparound, accumulating tile by tile gives exactly the
+# same results as the untiled layer (see fc_dot).
+#
+# Every tile needs its weights in the array, so a weight tile is reloaded
+# each time it is used unless it is already there (i.e., it is the only
+# tile and we move on to the next group). The weights of the whole layer
+# are therefore loaded once per group of input vectors.
+
+#=========================================================================
+# FCTile
+#=========================================================================
+# One step of a schedule: the input channels [in_start, in_end) and
+# output channels [out_start, out_end) of the weight tile applied to the
+# input vectors [batch_start, batch_end). The partial sums start from
+# the biases on the first input tile of an output tile (first) and are
+# written out as results after its last input tile (last).
+
+class FCTile:
+
+  def __init__( self, in_start, in_end, out_start, out_end, batch_start,
+                batch_end, load_weights, first, last ):
+    self.in_start     = in_start
+    self.in_end       = in_end
+    self.out_start    = out_start
+    self.out_end      = out_end
+    self.batch_start  = batch_start
+    self.batch_end    = batch_end
+    self.load_weights = load_weights
+    self.first        = first
+    self.last         = last
+
+  def __repr__( self ):
+    return ( f"FCTile(in={self.in_start}:{self.in_end}, "
+             f"out={self.out_start}:{self.out_end}, "
+             f"batch={self.batch_start}:{self.batch_end})" )
+
+#-------------------------------------------------------------------------
+# fc_tile_schedule
+#-------------------------------------------------------------------------
+# Tile sizes of None (or larger than the layer) mean the array covers the
+# whole dimension. An empty layer or batch gives an empty schedule.
+
+def fc_tile_schedule( input_channel, output_channel, batch_size,
+                      tile_in=None, tile_out=None, tile_batch=None ):
+
+  tile_in    = max( 1, min( tile_in    or input_channel,  input_channel  ) )
+  tile_out   = max( 1, min( tile_out   or output_channel, output_channel ) )
+  tile_batch = max( 1, min( tile_batch or batch_size,     batch_size     ) )
+
+  schedule = []
+  loaded   = None
+
+  for b in range( 0, batch_size, tile_batch ):
+    for j in range( 0, output_channel, tile_out ):
+      for i in range( 0, input_channel, tile_in ):
+        in_end  = min( i+tile_in, input_channel )
+        weights = ( i, j )
+        schedule.append( FCTile( i, in_end,
+                                 j, min( j+tile_out,   output_channel ),
+                                 b, min( b+tile_batch, batch_size     ),
+                                 weights != loaded, i == 0,
+                                 in_end == input_channel ) )
+        loaded = weights
+
+  return schedule
+
+#-------------------------------------------------------------------------
+# weight_reloads
+#-------------------------------------------------------------------------
+
+def weight_reloads( schedule ):
+  return sum( tile.load_weights for tile in schedule )
+
+#-------------------------------------------------------------------------
+# format_schedule
+#-------------------------------------------------------------------------
+# One line per tile, marking the tiles which load weights (w), start
+# from the biases (b), and write results (o).
+
+def format_schedule( schedule ):
+  width = len( str( len(schedule) ) )
+  lines = []
+  for n, tile in enumerate( schedule ):
+    flags = ( ( "w" if tile.load_weights else "-" )
+            + ( "b" if tile.first        else "-" )
+            + ( "o" if tile.last         else "-" ) )
+    lines.append( f"{n:{width}} {flags} "
+                  f"in {tile.in_start:4}:{tile.in_end:<4} "
+                  f"out {tile.out_start:4}:{tile.out_end:<4} "
+                  f"batch {tile.batch_start:3}:{tile.batch_end}" )
+  lines.append( f"{len(schedule)} tiles, "
+                f"{weight_reloads(schedule)} weight reloads" )
+  return "\n".join( lines )
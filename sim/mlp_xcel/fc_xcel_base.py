@@ -0,0 +1,198 @@
+#=========================================================================
+# FC_Layer Xcel Base
+#=========================================================================
+# Accelerator register protocol and tile loop shared by the fully
+# connected layer accelerators (FullyConnectedXcel_FL and the stream
+# wrapper FullyConnectedXcel). Accelerator register interface:
+#
+#  xr0 : go/done
+#  xr1 : base address of weights
+#  xr2 : base address of biases
+#  xr3 : base address of inputs
+#  xr4 : base address of outputs
+#  xr5 : number of input channels
+#  xr6 : number of output channels
+#  xr7 : number of input vectors (batch size)
+#
+# Accelerator protocol involves the following steps:
+#  1. Write the base addresses via xr1-4
+#  2. Write the dimensions via xr5-7
+#  3. Tell accelerator to go by writing xr0
+#  4. Wait for accelerator to finish by reading xr0, result will be 1
+#
+# The layer is run one weight tile at a time following fc_tile_schedule
+# (see fc_tiling.py). A subclass calls construct_xcel from its construct
+# and only implements how a tile is computed:
+#
+#  - load_weight_tile( weights ) is called with the in_len x out_len
+#    weights of each tile which has to be loaded
+#  - apply_tile( inputs, psums ) returns the out_len partial sums of one
+#    input vector after adding the products of the in_len inputs and the
+#    weights of the current tile, starting from the biases on the first
+#    input tile of an output tile
+#
+# The partial sums are written out as results, sign-extended to 32 bits,
+# after the last input tile. The schedule of the last layer is kept in
+# s.schedule and the total number of weight tiles loaded in
+# s.weight_reloads.
+
+import numpy as np
+
+from pymtl3 import *
+from pymtl3.stdlib.mem.ifcs  import MemRequesterIfc
+from pymtl3.stdlib.mem       import MemRequesterAdapterFL
+from pymtl3.stdlib.xcel.ifcs import XcelResponderIfc
+from pymtl3.stdlib.xcel      import XcelMsgType, mk_xcel_msg
+from pymtl3.stdlib.stream    import OStreamBlockingAdapterFL
+from pymtl3.stdlib.stream    import IStreamBlockingAdapterFL
+
+from common.burst       import mk_burst_mem_msg, BurstAdapter
+from common.fixed_point import sign_extend, to_unsigned
+
+from mlp_xcel.fc_tiling import fc_tile_schedule
+
+class FullyConnectedXcelBase( Component ):
+
+  # Sets up the interfaces and the update block which runs the protocol,
+  # and returns the update block so that subclasses can order it around
+  # their own adapters.
+
+  def construct_xcel( s, nwords=4, tile_in=None, tile_out=None,
+                      tile_batch=None ):
+
+    MemReqMsg,  MemRespMsg  = mk_burst_mem_msg( nwords )
+    XcelReqMsg, XcelRespMsg = mk_xcel_msg( 5, 32 )
+
+    # Interface
+
+    s.xcel = XcelResponderIfc( XcelReqMsg, XcelRespMsg )
+    s.mem  = MemRequesterIfc( MemReqMsg, MemRespMsg )
+
+    # Proc <-> Xcel Adapters
+
+    s.xcelreq_q  = IStreamBlockingAdapterFL( XcelReqMsg  )
+    s.xcelresp_q = OStreamBlockingAdapterFL( XcelRespMsg )
+
+    connect( s.xcelreq_q.istream,  s.xcel.reqstream  )
+    connect( s.xcelresp_q.ostream, s.xcel.respstream )
+
+    # Xcel <-> Memory Adapters
+
+    s.mem_adapter = MemRequesterAdapterFL( MemReqMsg, MemRespMsg )
+
+    connect( s.mem, s.mem_adapter.requester )
+
+    s.burst = BurstAdapter( s.mem_adapter, nwords )
+
+    # Storage (xr1-7)
+
+    s.regs = [ 0 ] * 8
+
+    # Tile schedule of the last layer and weight tiles loaded so far
+
+    s.schedule       = []
+    s.weight_reloads = 0
+
+    @update_once
+    def up_fc_xcel():
+
+      # We loop handling accelerator requests. We are only expecting
+      # writes to xr0-7, so any other requests are an error. We exit the
+      # loop when we see the write to xr0.
+
+      go = False
+      while not go:
+
+        xcelreq_msg = s.xcelreq_q.deq()
+
+        if xcelreq_msg.type_ == XcelMsgType.WRITE:
+          assert xcelreq_msg.addr < 8, \
+            "Only reg writes to 0-7 allowed during setup!"
+
+          # Use xcel register address to configure accelerator
+
+          if xcelreq_msg.addr == 0:
+            go = True
+          else:
+            s.regs[ int(xcelreq_msg.addr) ] = int( xcelreq_msg.data )
+
+          # Send xcel response message
+
+          s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.WRITE, 0 ) )
+
+      _, weight_base, bias_base, input_base, output_base, \
+        input_channel, output_channel, batch_size = s.regs
+
+      s.schedule = fc_tile_schedule( input_channel, output_channel,
+                                     batch_size, tile_in, tile_out,
+                                     tile_batch )
+
+      for tile in s.schedule:
+
+        in_len  = tile.in_end  - tile.in_start
+        out_len = tile.out_end - tile.out_start
+
+        # Load the weight tile. Its rows are contiguous in memory when it
+        # covers every output channel, otherwise we read one row (input
+        # channel) at a time.
+
+        if tile.load_weights:
+          addr = weight_base + 4*( tile.in_start*output_channel + tile.out_start )
+          if out_len == output_channel:
+            weights = s.read_values( addr, in_len*out_len )
+          else:
+            weights = np.concatenate( [
+              s.read_values( addr + 4*i*output_channel, out_len )
+              for i in range( in_len ) ] )
+          s.load_weight_tile( weights.reshape( in_len, out_len ) )
+          s.weight_reloads += 1
+
+        # Partial sums start from the biases
+
+        if tile.first:
+          biases = s.read_values( bias_base + 4*tile.out_start, out_len )
+          psums  = { b : biases for b in range( tile.batch_start, tile.batch_end ) }
+
+        for b in range( tile.batch_start, tile.batch_end ):
+          addr     = input_base + 4*( b*input_channel + tile.in_start )
+          psums[b] = s.apply_tile( s.read_values( addr, in_len ), psums[b] )
+
+          # Write the outputs sign-extended to 32 bits after the last tile
+
+          if tile.last:
+            outputs = to_unsigned( sign_extend( psums[b], 12 ), 32 )
+            addr    = output_base + 4*( b*output_channel + tile.out_start )
+            s.burst.write_words( addr, outputs.tolist() )
+
+      # Now wait for read of xr0
+
+      xcelreq_msg = s.xcelreq_q.deq()
+
+      # Only expecting read from xr0, so any other request is an xcel
+      # protocol error.
+
+      assert xcelreq_msg.type_ == XcelMsgType.READ, \
+        "Only reg reads allowed during done phase!"
+
+      assert xcelreq_msg.addr == 0, \
+        "Only reg read to 0 allowed during done phase!"
+
+      # Send xcel response message indicating xcel is done
+
+      s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, 1 ) )
+
+    s.burst.schedule_caller( s, up_fc_xcel )
+
+    return up_fc_xcel
+
+  # Reads count words starting at addr as 12-bit values
+
+  def read_values( s, addr, count ):
+    words = s.burst.read_words( addr, count )
+    return np.array( words, dtype=np.int64 ) & 0xfff
+
+  def load_weight_tile( s, weights ):
+    raise NotImplementedError
+
+  def apply_tile( s, inputs, psums ):
+    raise NotImplementedError
@@ -0,0 +1,105 @@
+#=========================================================================
+# mlp_datasets
+#=========================================================================
+# Data sets for the FC layer and MLP microbenchmarks. A data set is a
+# random Q4.7 network together with its reference outputs, computed with
+# exactly the arithmetic of the FIXED_MULT kernels (c_fixed_mult in
+# common/fixed_point.py), and can be written as a .dat file in the format
+# of app/ubmark/ubmark-fclayer.dat and app/ubmark/ubmark-mlp.dat:
+#
+#  >>> arrays = gen_fc_dataset( 8, 32, 32, seed=1 )
+#  >>> print( format_dat( "fclayer", arrays ) )
+#
+# The FC layer accelerators compute with the arithmetic of the datapath
+# instead (fc_datapath), so their data sets use arith="fc-datapath".
+#
+# A data set is a list of (name, values) pairs in the order the arrays
+# appear in the .dat file. Scalars are written as int variables and
+# arrays as int arrays (row-major).
+
+import re
+
+import numpy as np
+
+from common.fixed_point import c_fixed_mult, fc_datapath, relu
+
+default_seed = 0xdeadbeef
+
+arith_presets = {
+  "fixed-mult"  : c_fixed_mult,
+  "fc-datapath" : fc_datapath,
+}
+
+#-------------------------------------------------------------------------
+# gen_network
+#-------------------------------------------------------------------------
+# Random inputs in [0,1) and weights and biases in [-1,1) (as Q4.7),
+# which keeps the activations of a few hidden layers well inside Q4.7.
+
+def gen_network( batch_size, sizes, seed=default_seed ):
+  rng    = np.random.default_rng( seed )
+  inputs = rng.integers( 0, 128, size=( batch_size, sizes[0] ) )
+  layers = []
+  for ic, oc in zip( sizes, sizes[1:] ):
+    layers.append( ( rng.integers( -128, 128, size=( ic, oc ) ),
+                     rng.integers( -128, 128, size=oc ) ) )
+  return inputs, layers
+
+#-------------------------------------------------------------------------
+# gen_fc_dataset/gen_mlp_dataset
+#-------------------------------------------------------------------------
+# The arrays of ubmark-fclayer (one layer, no ReLU) and ubmark-mlp (three
+# layers with ReLU after the hidden layers).
+
+def gen_fc_dataset( batch_size, input_channel, output_channel,
+                    seed=default_seed, arith="fixed-mult" ):
+  inputs, [ ( weights, biases ) ] = \
+    gen_network( batch_size, [ input_channel, output_channel ], seed )
+  ref = arith_presets[arith].matmul( inputs, weights, biases )
+  return [ ( "eval_size",   ref.size ),
+           ( "eval_input",  inputs   ),
+           ( "eval_weight", weights  ),
+           ( "eval_bias",   biases   ),
+           ( "eval_ref",    ref      ) ]
+
+def gen_mlp_dataset( batch_size, sizes, seed=default_seed ):
+  assert len( sizes ) == 4, "ubmark-mlp has exactly three layers"
+  inputs, layers = gen_network( batch_size, sizes, seed )
+  arrays = [ ( "eval_input", inputs ) ]
+  acts   = inputs
+  for n, ( weights, biases ) in enumerate( layers ):
+    arrays += [ ( f"eval_weight_{n}", weights ), ( f"eval_bias_{n}", biases ) ]
+    acts = c_fixed_mult.matmul( acts, weights, biases )
+    if n < len( layers )-1:
+      acts = relu( acts )
+  return [ ( "eval_size", acts.size ) ] + arrays + [ ( "eval_ref", acts ) ]
+
+#-------------------------------------------------------------------------
+# format_dat/parse_dat
+#-------------------------------------------------------------------------
+
+def format_dat( name, arrays ):
+  lines = [ "//" + "="*72,
+            f"// Data set for ubmark-{name}",
+            "//" + "="*72, "" ]
+  for var, values in arrays:
+    values = np.asarray( values )
+    if values.ndim == 0:
+      lines += [ f"int {var} = {int(values)};", "" ]
+    else:
+      lines += [ f"int {var}[] =", "{" ]
+      lines += [ ",\n".join( f"    {int(x)}" for x in values.ravel() ) ]
+      lines += [ "};", "" ]
+  return "\n".join( lines )
+
+# Returns a dict from variable names to ints (scalars) or int64 arrays
+
+def parse_dat( text ):
+  text   = re.sub( r"//.*", "", text )
+  arrays = {}
+  for var, values in re.findall( r"int\s+(\w+)\s*\[\]\s*=\s*\{([^}]*)\}", text ):
+    arrays[var] = np.array( [ int(x) for x in values.replace( ",", " " ).split() ],
+                            dtype=np.int64 )
+  for var, value in re.findall( r"int\s+(\w+)\s*=\s*(-?\d+)\s*;", text ):
+    arrays[var] = int( value )
+  return arrays
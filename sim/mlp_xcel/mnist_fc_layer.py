@@ -4,13 +4,21 @@
 
 from pymtl3 import *
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from os import path
 from pymtl3.passes.backends.verilog import *
 
 class FullyConnected(VerilogPlaceholder ,Component):
-  def construct(s):
+  def construct(s, batch_size=2, input_channel=3, output_channel=2):
     # Interface
     s.istream = IStreamIfc(Bits32)  # Input stream
     s.ostream = OStreamIfc(Bits32)  # Output stream
 
     s.set_metadata( VerilogTranslationPass.explicit_module_name,
-                    'FullyConnected' )
\ No newline at end of file
+                    f'FullyConnected_{batch_size}x{input_channel}x{output_channel}' )
+    s.set_metadata( VerilogPlaceholderPass.src_file,
+                    path.join( path.dirname( __file__ ), 'mnist_fc_layer.v' ) )
+    s.set_metadata( VerilogPlaceholderPass.params, {
+      'BATCH_SIZE'     : batch_size,
+      'INPUT_CHANNEL'  : input_channel,
+      'OUTPUT_CHANNEL' : output_channel,
+    })
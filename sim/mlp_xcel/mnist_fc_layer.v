@@ -91,11 +91,13 @@ module mlp_xcel_FCLayerDpath
   input  logic        pe_en,
   input  logic        clear_accum,
   input  logic        result_wen,
+  input  logic        header_wen,
 
   // Status signals (dpath -> ctrl)
   output logic        msg_type_is_weight,
   output logic        msg_type_is_bias,
   output logic        msg_type_is_input,
+  output logic        msg_type_is_header,
   output logic        input_batch_done,
   output logic        all_outputs_done
 );
@@ -106,6 +108,7 @@ module mlp_xcel_FCLayerDpath
   localparam MSG_TYPE_BIAS   = 2'b01;
   localparam MSG_TYPE_INPUT  = 2'b10;
   localparam MSG_TYPE_OUTPUT = 2'b11;
+  localparam MSG_TYPE_HEADER = 2'b11; // Packed header (input stream only)
   
   // Message parsing
   logic [1:0]  msg_type;
@@ -126,25 +129,101 @@ module mlp_xcel_FCLayerDpath
   logic [3:0]  compute_cycles;
   logic [BATCH_SIZE-1:0] batch_ready;
   
+  //----------------------------------------------------------------------
+  // Packed runs
+  //----------------------------------------------------------------------
+  // A header message starts a run of count weights or inputs, which then
+  // arrive two per message (value 0 in [15:0], value 1 in [31:16]) for
+  // consecutive positions: row-major through the weights, or through the
+  // input channels of one batch. While a run is active, every message is
+  // a data word and its first value is handled like a single weight or
+  // input message for the current position.
+
+  logic        pk_active;      // Data words of a run follow
+  logic        pk_is_input;    // Run of inputs (else weights)
+  logic [3:0]  pk_batch_idx;   // Batch for a run of inputs
+  logic [9:0]  pk_input_idx;   // Position of the next value
+  logic [7:0]  pk_output_idx;
+  logic [10:0] pk_count;       // Values left in the run
+
+  logic        pk_wen1;        // Data word carries a second value
+  logic [11:0] pk_value1;
+  logic [9:0]  pk_input_idx1;  // Position of the second value
+  logic [7:0]  pk_output_idx1;
+  logic [9:0]  pk_input_idx2;  // Position after the data word
+  logic [7:0]  pk_output_idx2;
+
+  assign pk_active = (pk_count != 11'b0);
+  assign pk_wen1   = pk_active && (pk_count != 11'd1);
+  assign pk_value1 = istream_msg[27:16];
+
+  always_comb begin
+    if (pk_is_input) begin
+      pk_input_idx1  = pk_input_idx + 10'd1;
+      pk_output_idx1 = 8'b0;
+      pk_input_idx2  = pk_input_idx + 10'd2;
+      pk_output_idx2 = 8'b0;
+    end
+    else begin
+      pk_input_idx1  = (pk_output_idx == OUTPUT_CHANNEL-1) ? pk_input_idx + 10'd1 : pk_input_idx;
+      pk_output_idx1 = (pk_output_idx == OUTPUT_CHANNEL-1) ? 8'b0 : pk_output_idx + 8'd1;
+      pk_input_idx2  = (pk_output_idx1 == OUTPUT_CHANNEL-1) ? pk_input_idx1 + 10'd1 : pk_input_idx1;
+      pk_output_idx2 = (pk_output_idx1 == OUTPUT_CHANNEL-1) ? 8'b0 : pk_output_idx1 + 8'd1;
+    end
+  end
+
+  always_ff @(posedge clk) begin
+    if (reset) begin
+      pk_is_input   <= 1'b0;
+      pk_batch_idx  <= 4'b0;
+      pk_input_idx  <= 10'b0;
+      pk_output_idx <= 8'b0;
+      pk_count      <= 11'b0;
+    end
+    else if (header_wen) begin
+      pk_is_input   <= istream_msg[29];
+      pk_batch_idx  <= istream_msg[28:25];
+      pk_input_idx  <= istream_msg[29] ? istream_msg[24:15] : istream_msg[28:19];
+      pk_output_idx <= istream_msg[29] ? 8'b0 : istream_msg[18:11];
+      pk_count      <= istream_msg[10:0];
+    end
+    else if (pk_active && (weight_wen || input_wen)) begin
+      pk_input_idx  <= pk_input_idx2;
+      pk_output_idx <= pk_output_idx2;
+      pk_count      <= pk_wen1 ? pk_count - 11'd2 : 11'b0;
+    end
+  end
+
   // Parse message fields
   assign msg_type = istream_msg[31:30];
   
   // Status signals based on message type
-  assign msg_type_is_weight = (msg_type == MSG_TYPE_WEIGHT);
-  assign msg_type_is_bias   = (msg_type == MSG_TYPE_BIAS);
-  assign msg_type_is_input  = (msg_type == MSG_TYPE_INPUT);
+  assign msg_type_is_weight = pk_active ? !pk_is_input : (msg_type == MSG_TYPE_WEIGHT);
+  assign msg_type_is_bias   = !pk_active && (msg_type == MSG_TYPE_BIAS);
+  assign msg_type_is_input  = pk_active ?  pk_is_input : (msg_type == MSG_TYPE_INPUT);
+  assign msg_type_is_header = !pk_active && (msg_type == MSG_TYPE_HEADER);
   
   // Extract message fields
-  assign msg_input_idx  = (msg_type_is_weight) ? istream_msg[29:20] : 
-                         ((msg_type_is_input)  ? istream_msg[25:16] : 10'b0);
-  assign msg_output_idx = (msg_type_is_weight) ? istream_msg[19:12] : 
-                         ((msg_type_is_bias)   ? istream_msg[29:22] : 8'b0);
-  assign msg_batch_idx  = (msg_type_is_input)  ? istream_msg[29:26] : 4'b0;
-  
-  // Extract data value
+  assign msg_input_idx  = (pk_active)          ? pk_input_idx       :
+                         ((msg_type_is_weight) ? istream_msg[29:20] : 
+                         ((msg_type_is_input)  ? istream_msg[25:16] : 10'b0));
+  assign msg_output_idx = (pk_active)          ? pk_output_idx      :
+                         ((msg_type_is_weight) ? istream_msg[19:12] : 
+                         ((msg_type_is_bias)   ? istream_msg[29:22] : 8'b0));
+  assign msg_batch_idx  = (pk_active)          ? pk_batch_idx       :
+                         ((msg_type_is_input)  ? istream_msg[29:26] : 4'b0);
+  
+  // Extract data value (also the first value of a packed data word)
   assign msg_value = istream_msg[11:0];
   
-  // Input batch completion logic
+  // Input batch completion logic. A packed data word can carry two
+  // inputs, so we count the inputs in the message.
+  logic [1:0]  msg_ninputs;
+  logic [10:0] input_count_next;
+
+  assign msg_ninputs      = pk_wen1 ? 2'd2 : 2'd1;
+  assign input_count_next = {3'b0, input_count_regs[msg_batch_idx]} + {9'b0, msg_ninputs};
+
   always_ff @(posedge clk) begin
     if (reset) begin
       for (int i = 0; i < BATCH_SIZE; i++) begin
@@ -154,10 +233,10 @@ module mlp_xcel_FCLayerDpath
     end
     else if (input_wen) begin
       // Increment the input count for the current batch
-      input_count_regs[msg_batch_idx] <= input_count_regs[msg_batch_idx] + 1;
+      input_count_regs[msg_batch_idx] <= input_count_next[7:0];
       
       // Check if this is the last input for the batch
-      if (input_count_regs[msg_batch_idx] == INPUT_CHANNEL-1) begin
+      if (input_count_next >= INPUT_CHANNEL) begin
         batch_ready[msg_batch_idx] <= 1'b1;
       end
     end
@@ -171,7 +250,7 @@ module mlp_xcel_FCLayerDpath
   // Check if a batch has received all inputs
   assign input_batch_done = msg_type_is_input && 
                            ((batch_ready[msg_batch_idx]) || 
-                           (input_count_regs[msg_batch_idx] == INPUT_CHANNEL-1));
+                           (input_count_next >= INPUT_CHANNEL));
   
   // Storage for weights, biases and input buffer
   always_ff @(posedge clk) begin
@@ -186,16 +265,27 @@ module mlp_xcel_FCLayerDpath
         end
       end
     end
-    else if (bias_wen && (msg_output_idx < OUTPUT_CHANNEL)) begin
-      biases[msg_output_idx] <= msg_value;
-    end
-    else if (weight_wen && (msg_input_idx < INPUT_CHANNEL) && (msg_output_idx < OUTPUT_CHANNEL)) begin
-      weight_buffer[msg_input_idx][msg_output_idx] <= msg_value;
+    else begin
+      if (bias_wen && (msg_output_idx < OUTPUT_CHANNEL)) begin
+        biases[msg_output_idx] <= msg_value;
+      end
+
+      if (weight_wen && (msg_input_idx < INPUT_CHANNEL) && (msg_output_idx < OUTPUT_CHANNEL)) begin
+        weight_buffer[msg_input_idx][msg_output_idx] <= msg_value;
+      end
+
+      if (weight_wen && pk_wen1 && (pk_input_idx1 < INPUT_CHANNEL) && (pk_output_idx1 < OUTPUT_CHANNEL)) begin
+        weight_buffer[pk_input_idx1][pk_output_idx1] <= pk_value1;
+      end
     end
     
     if (input_wen && (msg_input_idx < INPUT_CHANNEL)) begin
       input_buffer[msg_input_idx] <= msg_value;
     end
+
+    if (input_wen && pk_wen1 && (pk_input_idx1 < INPUT_CHANNEL)) begin
+      input_buffer[pk_input_idx1] <= pk_value1;
+    end
   end
   
   // Count compute cycles
@@ -251,9 +341,11 @@ module mlp_xcel_FCLayerDpath
           assign pe_sum_in[i][j] = pe_sum_out[i-1][j];
         end
         
-        // Weight loading logic
-        assign pe_wen[i][j] = weight_wen && (msg_input_idx == i) && (msg_output_idx == j);
-        assign pe_weight[i][j] = msg_value;
+        // Weight loading logic (a packed data word loads two PEs)
+        assign pe_wen[i][j] = weight_wen && (((msg_input_idx == i) && (msg_output_idx == j)) ||
+                              (pk_wen1 && (pk_input_idx1 == i) && (pk_output_idx1 == j)));
+        assign pe_weight[i][j] = (pk_wen1 && (pk_input_idx1 == i) && (pk_output_idx1 == j)) ?
+                                 pk_value1 : msg_value;
       end
     end
   endgenerate
@@ -391,11 +483,13 @@ module mlp_xcel_FCLayerCtrl (
   output logic pe_en,         
   output logic clear_accum,
   output logic result_wen,
+  output logic header_wen,
 
   // Status signals (dpath -> ctrl)
   input  logic msg_type_is_weight,
   input  logic msg_type_is_bias,
   input  logic msg_type_is_input,
+  input  logic msg_type_is_header,
   input  logic input_batch_done,
   input  logic all_outputs_done
 );
@@ -464,13 +558,18 @@ module mlp_xcel_FCLayerCtrl (
     
     case (state_reg)
       STATE_IDLE: begin
-        if (istream_val) begin
+        // The first message can already complete a batch (e.g., with one
+        // input channel), so it has to start the computation before the
+        // next message overwrites the input buffer
+        if (istream_val && msg_type_is_input && input_batch_done) begin
+          state_next = STATE_COMPUTE;
+        end else if (istream_val) begin
           state_next = STATE_CONFIG;
         end
       end
       
       STATE_CONFIG: begin
-        if (msg_type_is_input && input_batch_done) begin
+        if (istream_val && msg_type_is_input && input_batch_done) begin
           state_next = STATE_COMPUTE;
         end else begin
           state_next = STATE_WAIT_INPUTS;
@@ -524,6 +623,7 @@ module mlp_xcel_FCLayerCtrl (
     pe_en = 1'b0;
     clear_accum = 1'b0;
     result_wen = 1'b0;
+    header_wen = 1'b0;
     
     case (state_reg)
       STATE_IDLE, STATE_CONFIG, STATE_WAIT_INPUTS: begin
@@ -533,6 +633,7 @@ module mlp_xcel_FCLayerCtrl (
           weight_wen = msg_type_is_weight;
           bias_wen = msg_type_is_bias;
           input_wen = msg_type_is_input;
+          header_wen = msg_type_is_header;
         end
       end
       
@@ -569,6 +670,7 @@ module mlp_xcel_FCLayerCtrl (
         pe_en = 1'b0;
         clear_accum = 1'b0;
         result_wen = 1'b0;
+        header_wen = 1'b0;
       end
     endcase
   end
@@ -580,7 +682,11 @@ endmodule
 //========================================================================
 
 module mlp_xcel_FullyConnected 
-(
+#(
+  parameter BATCH_SIZE = 2,
+  parameter INPUT_CHANNEL = 3,
+  parameter OUTPUT_CHANNEL = 2
+)(
   input  logic        clk,
   input  logic        reset,
 
@@ -599,16 +705,24 @@ module mlp_xcel_FullyConnected
   logic pe_en;
   logic clear_accum;
   logic result_wen;
+  logic header_wen;
 
   // Status signals
   logic msg_type_is_weight;
   logic msg_type_is_bias;
   logic msg_type_is_input;
+  logic msg_type_is_header;
   logic input_batch_done;
   logic all_outputs_done;
 
   // Instantiate datapath
-  mlp_xcel_FCLayerDpath dpath (
+  mlp_xcel_FCLayerDpath
+  #(
+    .BATCH_SIZE       (BATCH_SIZE),
+    .INPUT_CHANNEL    (INPUT_CHANNEL),
+    .OUTPUT_CHANNEL   (OUTPUT_CHANNEL)
+  )
+  dpath (
     .clk              (clk),
     .reset            (reset),
     .istream_msg      (istream_msg),
@@ -619,9 +733,11 @@ module mlp_xcel_FullyConnected
     .pe_en            (pe_en),
     .clear_accum      (clear_accum),
     .result_wen       (result_wen),
+    .header_wen       (header_wen),
     .msg_type_is_weight (msg_type_is_weight),
     .msg_type_is_bias   (msg_type_is_bias),
     .msg_type_is_input  (msg_type_is_input),
+    .msg_type_is_header (msg_type_is_header),
     .input_batch_done   (input_batch_done),
     .all_outputs_done   (all_outputs_done)
   );
@@ -640,9 +756,11 @@ module mlp_xcel_FullyConnected
     .pe_en            (pe_en),
     .clear_accum      (clear_accum),
     .result_wen       (result_wen),
+    .header_wen       (header_wen),
     .msg_type_is_weight (msg_type_is_weight),
     .msg_type_is_bias   (msg_type_is_bias),
     .msg_type_is_input  (msg_type_is_input),
+    .msg_type_is_header (msg_type_is_header),
     .input_batch_done   (input_batch_done),
     .all_outputs_done   (all_outputs_done)
   );
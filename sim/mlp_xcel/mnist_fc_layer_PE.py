@@ -3,6 +3,7 @@
 #=========================================================================
 
 from pymtl3 import *
+from os import path
 from pymtl3.passes.backends.verilog import *
 
 class SystolicPE(VerilogPlaceholder, Component):
@@ -13,4 +14,7 @@ class SystolicPE(VerilogPlaceholder, Component):
         s.sum_in    = InPort(32)
         
         s.act_out   = OutPort(32)
-        s.sum_out   = OutPort(32)
\ No newline at end of file
+        s.sum_out   = OutPort(32)
+
+        s.set_metadata( VerilogPlaceholderPass.src_file,
+                        path.join( path.dirname( __file__ ), 'mnist_fc_layer_PE.v' ) )
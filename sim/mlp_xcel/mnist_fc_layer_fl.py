@@ -50,11 +50,18 @@ KEY CONSIDERATIONS:
 '''
 
 
+from collections import deque
+
+import numpy as np
+
 from pymtl3 import *
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
 from pymtl3.stdlib.stream import IStreamDeqAdapterFL, OStreamEnqAdapterFL
 from pymtl3.passes.backends.verilog import *
 
+from common.burst       import pack_words
+from common.fixed_point import fc_datapath, sign_extend, to_unsigned
+
 # Define bit widths
 Bits2 = mk_bits(2)
 Bits4 = mk_bits(4)
@@ -68,6 +75,59 @@ Bits22 = mk_bits(22)
 Bits24 = mk_bits(24)
 Bits32 = mk_bits(32)
 
+#-------------------------------------------------------------------------
+# fc_dot
+#-------------------------------------------------------------------------
+# Computes the 12-bit accumulators of a layer for one input vector the way
+# the datapath does (see fc_datapath in common/fixed_point.py): only the
+# low 12 bits of every product are kept, and the bias and products are
+# summed with 12-bit wraparound. The accumulators are returned as
+# unsigned 12-bit values.
+#
+#  inputs  : (input_channel,) array of 12-bit values
+#  weights : (input_channel, output_channel) array of 12-bit values
+#  biases  : (output_channel,) array of 12-bit values
+
+def fc_dot( inputs, weights, biases ):
+  return to_unsigned( fc_datapath.matmul( inputs, weights, biases ), 12 )
+
+#-------------------------------------------------------------------------
+# fc_output_words/fc_output_msgs
+#-------------------------------------------------------------------------
+# Turns the 12-bit accumulators for one batch into output messages of
+# out_per_cycle 32-bit words each. A word is either one output message
+# with the result sign-extended to 18 bits, or with packed=True two
+# results sign-extended to 16 bits (the result for the lower output
+# channel in the lower half), or with tagged=True one tagged output
+# message with the 12-bit result (batch_idx is then the tag). The words
+# of a batch are never mixed with the words of another batch in one
+# message, and unused words or halves at the end of a batch are zero.
+
+num_batch_tags = 256
+
+def fc_output_words( batch_idx, accums, packed=False, tagged=False ):
+  if tagged:
+    channels = np.arange( len(accums) )
+    last     = ( channels == len(accums)-1 ).astype( np.int64 )
+    return ( ( 3 << 30 ) | ( batch_idx << 22 ) | ( channels << 14 )
+             | ( last << 13 ) | to_unsigned( accums, 12 ) )
+  accums = sign_extend( accums, 12 )
+  if packed:
+    results = to_unsigned( accums, 16 )
+    if len( results ) % 2:
+      results = np.append( results, 0 )
+    return results[0::2] | ( results[1::2] << 16 )
+  results = to_unsigned( accums, 18 )
+  headers = ( 3 << 30 ) | ( batch_idx << 26 ) | ( np.arange( len(accums) ) << 18 )
+  return headers | results
+
+def fc_output_msgs( batch_idx, accums, out_per_cycle=1, packed=False,
+                    tagged=False ):
+  OutType = mk_bits( 32*out_per_cycle )
+  words   = fc_output_words( batch_idx, accums, packed, tagged ).tolist()
+  return [ OutType( pack_words( words[i:i+out_per_cycle] ) )
+           for i in range( 0, len(words), out_per_cycle ) ]
+
 class FullyConnected_FL(Component):
   """
   Fully Connected Neural Network Layer (Functional Level Model)
@@ -96,117 +156,258 @@ class FullyConnected_FL(Component):
   [29:26] - Batch Index (max 10)
   [25:18] - Output Channel Index (max 256)
   [17:0]  - Output Value (18-bit q4.7 fixed-point with extra precision)
+
+  For Packed Weight Header (Type 3, input stream only):
+  [31:30] - Message Type (11)
+  [29]    - Packed Kind (0 for weights)
+  [28:19] - Start Input Channel Index (max 1024)
+  [18:11] - Start Output Channel Index (max 256)
+  [10:0]  - Count (number of weights which follow, max 2047)
+
+  For Packed Input Header (Type 3, input stream only):
+  [31:30] - Message Type (11)
+  [29]    - Packed Kind (1 for inputs)
+  [28:25] - Batch Index (max 10)
+  [24:15] - Start Input Channel Index (max 1024)
+  [10:0]  - Count (number of inputs which follow, max 2047)
+
+  For Packed Data (the ceil(count/2) messages after a header):
+  [31:16] - Value 2i+1 (12-bit weight or 16-bit input)
+  [15:0]  - Value 2i (12-bit weight or 16-bit input)
+
+  Packed weights go in row-major order (output channel fastest) from the
+  start position, and packed inputs go to consecutive input channels of
+  one batch. Each packed value is handled exactly like a weight or input
+  message for its position, so loading a layer takes about half as many
+  messages.
+
+  For Packed Output Data (packed=True):
+  [31:16] - Output Value for Output Channel 2i+1 (16-bit)
+  [15:0]  - Output Value for Output Channel 2i (16-bit)
+
+  Each output stream message holds out_per_cycle of these 32-bit words
+  (the first in the least significant bits). Packed words carry no batch
+  index, so the results for a batch come in output channel order right
+  after the results for the batch before it.
+
+  Tagged Batches (tagged=True):
+
+  The batch index above only has 4 bits and names one of the batch_size
+  input slots directly, so at most 16 batches can be in flight. With
+  tagged=True every batch is instead named by an 8-bit tag which the
+  model maps to a free slot when the first input of the tag arrives and
+  releases when the batch completes, so batch_size can be as large as
+  256 and producers number their batches modulo 256. Weight and bias
+  messages and packed weight headers do not change, while the messages
+  which carry a batch index become:
+
+  For Tagged Input Data (Type 2):
+  [31:30] - Message Type (10)
+  [29:22] - Tag
+  [21:12] - Input Channel Index (max 1024)
+  [11:0]  - Input Value (12-bit q4.7)
+
+  For Tagged Packed Input Header (Type 3, input stream only):
+  [31:30] - Message Type (11)
+  [29]    - Packed Kind (1 for inputs)
+  [28:21] - Tag
+  [20:11] - Start Input Channel Index (max 1024)
+  [10:0]  - Count (number of inputs which follow, max 2047)
+
+  For Tagged Output Data (Type 3):
+  [31:30] - Message Type (11)
+  [29:22] - Tag
+  [21:14] - Output Channel Index (max 256)
+  [13]    - Last (set on the last output of the batch)
+  [12]    - Reserved (0)
+  [11:0]  - Output Value (12-bit q4.7)
+
+  Batches complete as soon as all of their inputs have arrived, so a
+  producer which interleaves the inputs of several batches gets their
+  outputs in the order they complete rather than the order they
+  started. Flow control is credit-based: the producer starts with
+  batch_size credits, spends one on the first input of each new tag, and
+  gets it back with the output which has Last set. A tag can be reused
+  once its credit has come back. A new tag while every slot is in use
+  means the producer did not wait for a credit, and reusing a tag before
+  its output with Last set was sent means the producer did not wait for
+  the credit of that tag, which are both errors.
+  Packed outputs carry no tag, so they cannot be used with tagged
+  batches.
+
+  Weights, biases and inputs are kept as the low 12 bits of their fields
+  in NumPy integer arrays (see fc_dot). Output messages wait in an output
+  buffer of out_depth messages which sends one message per cycle. New
+  input messages are accepted while earlier results are still being
+  sent, but only while the buffer has room for the outputs of a whole
+  batch, so a slow consumer stalls the input stream. By default the
+  buffer holds the outputs of two batches.
   """
-  def construct(s, batch_size=4, input_channel=3, output_channel=2):
+  def construct(s, batch_size=4, input_channel=3, output_channel=2,
+                out_per_cycle=1, packed=False, tagged=False, out_depth=None):
+    OutType = mk_bits(32*out_per_cycle)
+
+    # Output messages for one batch
+    out_words = (output_channel + 1)//2 if packed else output_channel
+    out_msgs = (out_words + out_per_cycle - 1)//out_per_cycle
+    if out_depth is None:
+      out_depth = 2*out_msgs
+
+    assert not (tagged and packed), \
+      "Packed outputs cannot be used with tagged batches!"
+    assert out_depth >= out_msgs, \
+      f"Output buffer must hold the {out_msgs} output messages of a batch!"
+    assert not tagged or batch_size <= num_batch_tags, \
+      f"At most {num_batch_tags} slots with tagged batches!"
+
     # Interface
     s.istream = IStreamIfc(Bits32)  # Input stream
-    s.ostream = OStreamIfc(Bits32)  # Output stream
+    s.ostream = OStreamIfc(OutType) # Output stream
     
     # Queue Adapters
     s.istream_q = IStreamDeqAdapterFL(Bits32)
-    s.ostream_q = OStreamEnqAdapterFL(Bits32)
+    s.ostream_q = OStreamEnqAdapterFL(OutType)
     
     s.istream //= s.istream_q.istream
     s.ostream //= s.ostream_q.ostream
     
     # Internal storage for weights, biases, and inputs
-    s.weights = [[Wire(Bits12) for _ in range(output_channel)] for _ in range(input_channel)]
-    s.biases = [Wire(Bits12) for _ in range(output_channel)]
-    s.inputs = [[Wire(Bits12) for _ in range(input_channel)] for _ in range(batch_size)]
-    s.input_counts = [Wire(Bits16) for _ in range(batch_size)]
+    s.weights = np.zeros((input_channel, output_channel), dtype=np.int64)
+    s.biases = np.zeros(output_channel, dtype=np.int64)
+    s.inputs = np.zeros((batch_size, input_channel), dtype=np.int64)
+    s.input_counts = np.zeros(batch_size, dtype=np.int64)
 
-    # Pending FIFO for output messages
-    s.pending = []
+    # Output buffer, at most out_depth messages
+    s.pending = deque()
+
+    # Tagged batches: the slot of every tag in flight, the free slots, and
+    # the tags of complete batches whose output with Last set was not sent
+    s.slot_of = {}
+    s.free_slots = deque(range(batch_size))
+    s.unsent_tags = set()
+
+    # Packed run in progress: number of values left, whether they are
+    # weights or inputs, the batch (or tag) for inputs, and the position
+    # of the next value (flat row-major index into the weights for
+    # weights, the input channel for inputs)
+    s.pk_count = 0
+    s.pk_is_input = False
+    s.pk_batch = 0
+    s.pk_idx = 0
+
+    def write_weight(input_idx, output_idx, value):
+      if input_idx < input_channel and output_idx < output_channel:
+        s.weights[input_idx, output_idx] = value & 0xfff
+
+    # Slot for the inputs of a tag, taking a free slot for a new tag
+    def tag_slot(tag):
+      if tag not in s.slot_of:
+        assert tag not in s.unsent_tags, \
+          f"Tag {tag} reused before its credit came back!"
+        assert s.free_slots, \
+          f"No free slot for tag {tag}, the producer has no credit!"
+        s.slot_of[tag] = s.free_slots.popleft()
+      return s.slot_of[tag]
+
+    def write_input(batch_idx, channel_idx, value):
+      if channel_idx >= input_channel:
+        return
+      if tagged:
+        slot = tag_slot(batch_idx)
+      elif batch_idx < batch_size:
+        slot = batch_idx
+      else:
+        return
+
+      # Store input value and count it
+      s.inputs[slot, channel_idx] = value & 0xfff
+      s.input_counts[slot] += 1
+
+      # Check if we've received all inputs for this batch
+      if s.input_counts[slot] == input_channel:
+        accums = fc_dot(s.inputs[slot], s.weights, s.biases)
+
+        # enqueue all generated outputs into pending FIFO
+        s.pending.extend(fc_output_msgs(batch_idx, accums, out_per_cycle,
+                                        packed, tagged))
+        # Reset counter and release the slot of a tag
+        s.input_counts[slot] = 0
+        if tagged:
+          del s.slot_of[batch_idx]
+          s.free_slots.append(slot)
+          s.unsent_tags.add(batch_idx)
     
     # FL block
     @update_once
     def block():
-      tmp_product = Bits24(0)
-      output_msgs = []
 
-      # send one pending packet per cycle if any
+      # send one pending message per cycle if any
       if s.pending and s.ostream_q.enq.rdy():
-        s.ostream_q.enq(s.pending.pop(0))
-        return
+        s.ostream_q.enq(s.pending.popleft())
+
+      # Every message can complete a batch, so only take one if its
+      # outputs are guaranteed to fit into the output buffer
+      if s.istream_q.deq.rdy() and len(s.pending) + out_msgs <= out_depth:
+        msg = s.istream_q.deq().uint()
 
-      if s.istream_q.deq.rdy() and s.ostream_q.enq.rdy():
-        msg = s.istream_q.deq()
+        # Data word of a packed run: each value is handled exactly like
+        # a single weight/input message for the next position
+        if s.pk_count > 0:
+          for value in (msg & 0xffff, msg >> 16):
+            if s.pk_count == 0:
+              break
+            if s.pk_is_input:
+              write_input(s.pk_batch, s.pk_idx, value)
+            else:
+              write_weight(s.pk_idx // output_channel,
+                           s.pk_idx % output_channel, value)
+            s.pk_idx += 1
+            s.pk_count -= 1
+          return
         
-        # Extract message parts using bit slicing
-        msg_type_bits = msg[30:32]
+        # Extract message parts
+        msg_type = msg >> 30
         
         # Process based on message type
-        if msg_type_bits == 0:  # Weight config
-          # Extract indices
-          input_idx_bits = msg[20:30]
-          output_idx_bits = msg[12:20]
-          value_bits = msg[0:12]
-          input_idx = input_idx_bits.uint()
-          output_idx = output_idx_bits.uint()
-          
-          if input_idx < input_channel and output_idx < output_channel:
-            s.weights[input_idx][output_idx] @= value_bits
-        elif msg_type_bits == 1:  # Bias config
-          # Extract data
-          output_idx_bits = msg[22:30]
-          value_bits = msg[0:12]
-          
-          output_idx = output_idx_bits.uint()
+        if msg_type == 0:  # Weight config
+          input_idx = (msg >> 20) & 0x3ff
+          output_idx = (msg >> 12) & 0xff
+          write_weight(input_idx, output_idx, msg)
+        elif msg_type == 1:  # Bias config
+          output_idx = (msg >> 22) & 0xff
           
           if output_idx < output_channel:
-            s.biases[output_idx] @= value_bits
-        elif msg_type_bits == 2:  # Input data
-          # Extract data
-          batch_idx_bits = msg[26:30]
-          channel_idx_bits = msg[16:26]
-          value_bits = msg[0:12]
-          
-          batch_idx = batch_idx_bits.uint()
-          channel_idx = channel_idx_bits.uint()
-          
-          if batch_idx < batch_size and channel_idx < input_channel:
-            # Store input value
-            s.inputs[batch_idx][channel_idx] @= value_bits
-            # Update input counter using new_count for correct checking.
-            tmp_count = s.input_counts[batch_idx]
-            new_count = tmp_count + 1
-            s.input_counts[batch_idx] @= new_count
-            
-            # Check if we've received all inputs for this batch
-            if (tmp_count) == input_channel:
-              # Process all outputs one by one
-              for j in range(output_channel):
-                # Start with bias
-                accum = s.biases[j]
-                # Do dot product with proper Q4.7 fixed-point arithmetic
-                for k in range(input_channel):
-                  input_extended = concat(Bits12(0), s.inputs[batch_idx][k])
-                  weight_extended = concat(Bits12(0), s.weights[k][j])
-
-                  tmp_product = input_extended * weight_extended
-
-                  product_shifted = tmp_product[0:12]
-
-                  accum = product_shifted + accum
-
-                sign_bit = accum[11]
-                sign_ext = Bits6(0) if sign_bit == 0 else Bits6(0x3F)
-                result_value = concat(sign_ext, accum)
-
-                type_bits = Bits2(3)
-                batch_bits = Bits4(batch_idx)
-                output_bits = Bits8(j)
-
-                upper_part = concat(type_bits, batch_bits)
-                header = concat(upper_part, output_bits)
-                output_msg = concat(header, result_value)
-                output_msgs.append(output_msg)
-
-              # enqueue all generated outputs into pending FIFO
-              s.pending.extend(output_msgs)
-              # Reset counter
-              s.input_counts[batch_idx] @= Bits16(0)
+            s.biases[output_idx] = msg & 0xfff
+        elif msg_type == 2 and tagged:  # Tagged input data
+          write_input((msg >> 22) & 0xff, (msg >> 12) & 0x3ff, msg)
+        elif msg_type == 2:  # Input data
+          batch_idx = (msg >> 26) & 0xf
+          channel_idx = (msg >> 16) & 0x3ff
+          write_input(batch_idx, channel_idx, msg)
+        else:  # Packed header
+          s.pk_count = msg & 0x7ff
+          s.pk_is_input = bool((msg >> 29) & 1)
+          if s.pk_is_input and tagged:
+            s.pk_batch = (msg >> 21) & 0xff
+            s.pk_idx = (msg >> 11) & 0x3ff
+          elif s.pk_is_input:
+            s.pk_batch = (msg >> 25) & 0xf
+            s.pk_idx = (msg >> 15) & 0x3ff
+          else:
+            s.pk_idx = ((msg >> 19) & 0x3ff)*output_channel + ((msg >> 11) & 0xff)
     
+    # The credit of a tag comes back when its output with Last set leaves
+    # the output stream
+    if tagged:
+      @update_ff
+      def up_tag_credit():
+        if s.ostream.val & s.ostream.rdy:
+          msg = int(s.ostream.msg)
+          for i in range(out_per_cycle):
+            word = msg >> (32*i)
+            if (word >> 13) & 1:
+              s.unsent_tags.discard((word >> 22) & 0xff)
+
   # Line tracing
   def line_trace(s):
     return f"{s.istream}(){s.ostream}"
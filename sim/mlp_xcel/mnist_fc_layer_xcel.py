@@ -0,0 +1,169 @@
+#=========================================================================
+# FC_Layer Xcel Wrapper
+#=========================================================================
+# Wraps a stream FC layer (FullyConnected_FL or the RTL FullyConnected)
+# in the accelerator register interface, so the processor can run a
+# layer stored in memory on it. The register interface, the memory
+# layout and the results are the ones of FullyConnectedXcel_FL (see
+# fc_xcel_base.py and mnist_fc_layer_xcel_fl.py): one value per 32-bit
+# word, only the low 12 bits of each weight, bias and input are used,
+# and each output is the 12-bit accumulator sign-extended to 32 bits.
+#
+# The wrapped layer has a fixed input_channel x output_channel array and
+# batch_size input slots (the RTL FullyConnected is 3x2 with 2 slots, the
+# parameters of mnist_fc_layer.v). Larger layers are run one weight tile
+# at a time following fc_tile_schedule (see fc_tiling.py) with the whole
+# batch per weight tile:
+#
+#  - a weight tile is sent as packed weight messages, padded with zero
+#    weights to the size of the array
+#  - before each input vector, the biases are set to its partial sums
+#    (the layer biases on the first input tile), which is exact since
+#    the datapath sums with 12-bit wraparound
+#  - the slice of the input vector is sent as packed input messages,
+#    padded with zero inputs, and the outputs of the array are read back
+#    right away as the new partial sums
+#
+# Input vectors use the input slots in turn, since the RTL model hands
+# out its results one slot after the other. Only the biases which differ
+# from the ones already in the array are sent.
+#
+# The control which fetches operands from memory and drives the stream
+# is an FL model. The cycles spent in the wrapped layer are the cycles
+# of the wrapped model, but the whole accelerator cannot be translated
+# to Verilog even with the RTL layer.
+
+import numpy as np
+
+from pymtl3 import *
+from pymtl3.stdlib.stream import OStreamBlockingAdapterFL
+from pymtl3.stdlib.stream import IStreamBlockingAdapterFL
+
+from common.fixed_point import to_unsigned
+
+from mlp_xcel.fc_xcel_base import FullyConnectedXcelBase
+
+#-------------------------------------------------------------------------
+# Stream messages
+#-------------------------------------------------------------------------
+# See FullyConnected_FL for the message formats. A packed run holds at
+# most 2046 values (the count field is 11 bits), so longer runs are split
+# over several headers.
+
+max_packed_count = 2046
+
+def fc_packed_data_words( values ):
+  values = to_unsigned( values, 16 )
+  if len( values ) % 2:
+    values = np.append( values, 0 )
+  return ( values[0::2] | ( values[1::2] << 16 ) ).tolist()
+
+# All the weights of an input_channel x output_channel array in
+# row-major order
+
+def fc_weight_msgs( weights ):
+  output_channel = weights.shape[1]
+  weights = weights.ravel()
+  msgs    = []
+  for i in range( 0, len(weights), max_packed_count ):
+    run = weights[i:i+max_packed_count]
+    in_idx, out_idx = divmod( i, output_channel )
+    msgs.append( ( 3 << 30 ) | ( in_idx << 19 ) | ( out_idx << 11 ) | len(run) )
+    msgs.extend( fc_packed_data_words( run ) )
+  return msgs
+
+# The inputs of one input slot starting from input channel 0
+
+def fc_input_msgs( slot, inputs ):
+  msgs = []
+  for i in range( 0, len(inputs), max_packed_count ):
+    run = inputs[i:i+max_packed_count]
+    msgs.append( ( 3 << 30 ) | ( 1 << 29 ) | ( slot << 25 ) | ( i << 15 )
+                 | len(run) )
+    msgs.extend( fc_packed_data_words( run ) )
+  return msgs
+
+def fc_bias_msg( out_idx, bias ):
+  return ( 1 << 30 ) | ( out_idx << 22 ) | ( int(bias) & 0xfff )
+
+#=========================================================================
+# FullyConnectedXcel
+#=========================================================================
+
+class FullyConnectedXcel( FullyConnectedXcelBase ):
+
+  def construct( s, fc, batch_size=2, input_channel=3, output_channel=2,
+                 nwords=4 ):
+
+    up_fc_xcel = s.construct_xcel( nwords, input_channel, output_channel )
+
+    # Wrapped FC layer and the adapters which drive its streams
+
+    s.fc = fc
+
+    s.fcreq_q  = OStreamBlockingAdapterFL( Bits32 )
+    s.fcresp_q = IStreamBlockingAdapterFL( Bits32 )
+
+    connect( s.fcreq_q.ostream, s.fc.istream  )
+    connect( s.fc.ostream,      s.fcresp_q.istream )
+
+    # State of the wrapped layer: its size, the biases in the array (None
+    # until known) and the next input slot
+
+    s.batch_size     = batch_size
+    s.input_channel  = input_channel
+    s.output_channel = output_channel
+
+    s.loaded_biases = [ None ] * output_channel
+    s.slot          = 0
+
+    # The streams of the array are only driven in the tile methods, which
+    # the scheduler cannot see, so order the block like a block which
+    # calls fcreq_q.enq and fcresp_q.deq directly: after fcreq_q clears
+    # the message it sent last cycle and before it sends the next one,
+    # and before fcresp_q updates its rdy. Otherwise messages are sent
+    # twice or lost, and fcresp_q can take a message it did not signal
+    # rdy for.
+
+    s.add_constraints(
+      U( s.fcreq_q.get_update_block( "up_clear" ) ) < U( up_fc_xcel ),
+      U( up_fc_xcel ) < U( s.fcreq_q.get_update_block( "up_send" ) ),
+      U( up_fc_xcel ) < U( s.fcresp_q.get_update_block( "up_recv_rdy" ) ),
+    )
+
+  # Send the weight tile padded with zeros to the array size
+
+  def load_weight_tile( s, weights ):
+    padded = np.zeros( ( s.input_channel, s.output_channel ), dtype=np.int64 )
+    padded[ :weights.shape[0], :weights.shape[1] ] = weights
+    for msg in fc_weight_msgs( padded ):
+      s.fcreq_q.enq( Bits32( msg ) )
+
+  # Each input vector starts from its partial sums: send the biases
+  # which differ from the ones in the array, then the inputs padded with
+  # zeros, and read back the accumulators of all output channels
+
+  def apply_tile( s, inputs, psums ):
+
+    for j, bias in enumerate( psums ):
+      if s.loaded_biases[j] != bias:
+        s.fcreq_q.enq( Bits32( fc_bias_msg( j, bias ) ) )
+        s.loaded_biases[j] = bias
+
+    padded = np.zeros( s.input_channel, dtype=np.int64 )
+    padded[ :len(inputs) ] = inputs
+
+    for msg in fc_input_msgs( s.slot, padded ):
+      s.fcreq_q.enq( Bits32( msg ) )
+    s.slot = ( s.slot + 1 ) % s.batch_size
+
+    accums = np.zeros( s.output_channel, dtype=np.int64 )
+    for _ in range( s.output_channel ):
+      msg = int( s.fcresp_q.deq() )
+      accums[ ( msg >> 18 ) & 0xff ] = msg & 0xfff
+    return accums[ :len(psums) ]
+
+  # Line tracing
+
+  def line_trace( s ):
+    return f"{s.xcel.reqstream}({s.fc.line_trace()}){s.xcel.respstream}"
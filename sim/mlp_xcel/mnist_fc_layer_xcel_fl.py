@@ -0,0 +1,59 @@
+#=========================================================================
+# FC_Layer Xcel FL Model
+#=========================================================================
+# Fully connected layer accelerator which fetches its operands from
+# memory itself instead of receiving them one message at a time over a
+# stream like FullyConnected_FL. The register interface is the one of
+# FullyConnectedXcelBase (see fc_xcel_base.py).
+#
+# Every value is stored in its own 32-bit word:
+#
+#  - weights : input_channel x output_channel matrix in row-major order
+#              (all the weights of input channel 0 first)
+#  - biases  : output_channel words
+#  - inputs  : batch x input_channel matrix in row-major order
+#  - outputs : batch x output_channel matrix in row-major order
+#
+# The layer computes exactly what FullyConnected_FL computes (see fc_dot
+# in mnist_fc_layer_fl.py): only the low 12 bits of each weight, bias and
+# input are used, and each output is the 12-bit accumulator sign-extended
+# to a full 32-bit word. All registers keep their values across layers,
+# so software only has to rewrite the registers which change (e.g., the
+# input and output bases for the next batch).
+#
+# Weights, biases and inputs are read and outputs are written with burst
+# memory transactions of nwords words each (see common/burst.py), so the
+# memory port carries 32*nwords-bit data.
+#
+# The array holds a tile_in x tile_out block of weights and partial sums
+# for tile_batch input vectors (None means as many as the layer needs).
+# Layers which do not fit are run one weight tile at a time following
+# fc_tile_schedule (see fc_tiling.py): a weight tile is loaded, applied
+# to the slice of each input vector it covers, and the partial sums are
+# written out after the last input tile.
+
+from mlp_xcel.mnist_fc_layer_fl import fc_dot
+from mlp_xcel.fc_xcel_base      import FullyConnectedXcelBase
+
+class FullyConnectedXcel_FL( FullyConnectedXcelBase ):
+
+  def construct( s, nwords=4, tile_in=None, tile_out=None, tile_batch=None ):
+    s.construct_xcel( nwords, tile_in, tile_out, tile_batch )
+
+    # Weight tile in the array
+
+    s.weights = None
+
+  # Passing the partial sums as the biases to fc_dot accumulates the
+  # products of this tile
+
+  def load_weight_tile( s, weights ):
+    s.weights = weights
+
+  def apply_tile( s, inputs, psums ):
+    return fc_dot( inputs, s.weights, psums )
+
+  # Line tracing
+
+  def line_trace( s ):
+    return f"{s.xcel.reqstream}(){s.xcel.respstream}"
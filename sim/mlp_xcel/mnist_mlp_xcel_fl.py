@@ -0,0 +1,211 @@
+#=========================================================================
+# MNIST MLP Xcel FL Model
+#=========================================================================
+# Fused MLP accelerator which runs a whole three layer inference
+# (FC1->ReLU->FC2->ReLU->FC3, optionally followed by argmax) in one job.
+# The activations of the hidden layers never leave the accelerator, so
+# the processor only sets up the job and waits for the outputs instead
+# of moving every layer in and out of memory. Accelerator register
+# interface (in the order of the mnist_inference arguments):
+#
+#  xr0  : go/done
+#  xr1  : base address of inputs  [batch_size][input_size]
+#  xr2  : base address of FC1 weights [input_size][hidden1_size]
+#  xr3  : base address of FC1 biases  [hidden1_size]
+#  xr4  : base address of FC2 weights [hidden1_size][hidden2_size]
+#  xr5  : base address of FC2 biases  [hidden2_size]
+#  xr6  : base address of FC3 weights [hidden2_size][output_size]
+#  xr7  : base address of FC3 biases  [output_size]
+#  xr8  : base address of outputs
+#  xr9  : batch size
+#  xr10 : input size
+#  xr11 : hidden1 size
+#  xr12 : hidden2 size
+#  xr13 : output size
+#  xr14 : mode (see MLPMode)
+#
+# Accelerator protocol involves the following steps:
+#  1. Write the base addresses, sizes and mode via xr1-14
+#  2. Tell accelerator to go by writing xr0
+#  3. Wait for accelerator to finish by reading xr0, result will be 1
+#
+# Every value is a signed Q4.7 number in its own 32-bit word, and the
+# layers compute exactly what mnist_inference in app/ubmark/ubmark-mlp.c
+# computes: each product is rounded back to Q4.7 with (a*b + 64) >> 7
+# and the products are summed onto the bias in 32-bit two's complement.
+# ReLU is applied to both hidden layers. The outputs are the FC3 logits
+# [batch_size][output_size], or with argmax one word per input vector
+# holding the index of its largest logit (the lowest index on ties).
+#
+# All registers keep their values across jobs. Operands are read and
+# outputs are written with burst memory transactions of nwords words
+# each (see common/burst.py).
+
+import numpy as np
+
+from pymtl3 import *
+from pymtl3.stdlib.mem.ifcs  import MemRequesterIfc
+from pymtl3.stdlib.mem       import MemRequesterAdapterFL
+from pymtl3.stdlib.xcel.ifcs import XcelResponderIfc
+from pymtl3.stdlib.xcel      import XcelMsgType, mk_xcel_msg
+from pymtl3.stdlib.stream    import OStreamBlockingAdapterFL
+from pymtl3.stdlib.stream    import IStreamBlockingAdapterFL
+
+from common             import fixed_point
+from common.burst       import mk_burst_mem_msg, BurstAdapter
+from common.fixed_point import c_fixed_mult
+
+#-------------------------------------------------------------------------
+# MLPMode
+#-------------------------------------------------------------------------
+# Bits of the mode register (xr14)
+
+class MLPMode:
+  ARGMAX = 0x1 # write the index of the largest logit instead of the logits
+
+#-------------------------------------------------------------------------
+# mlp_layer
+#-------------------------------------------------------------------------
+# One layer for a batch of input vectors with the arithmetic of
+# mnist_inference (see c_fixed_mult in common/fixed_point.py).
+#
+#  inputs  : (batch_size, input_channel) array
+#  weights : (input_channel, output_channel) array
+#  biases  : (output_channel,) array
+
+def mlp_layer( inputs, weights, biases, relu ):
+  accums = c_fixed_mult.matmul( inputs, weights, biases )
+  return fixed_point.relu( accums ) if relu else accums
+
+#-------------------------------------------------------------------------
+# mlp_inference
+#-------------------------------------------------------------------------
+# The whole network: layers is a list of (weights, biases) pairs and
+# every layer but the last one is followed by ReLU.
+
+def mlp_inference( inputs, layers, argmax=False ):
+  acts = np.asarray( inputs, dtype=np.int64 )
+  for n, ( weights, biases ) in enumerate( layers ):
+    acts = mlp_layer( acts, weights, biases, relu=( n < len(layers)-1 ) )
+  if argmax:
+    return np.argmax( acts, axis=1 ).astype( np.int32 )
+  return acts.astype( np.int32 )
+
+#=========================================================================
+# MLPXcel_FL
+#=========================================================================
+
+class MLPXcel_FL( Component ):
+
+  def construct( s, nwords=4 ):
+
+    MemReqMsg,  MemRespMsg  = mk_burst_mem_msg( nwords )
+    XcelReqMsg, XcelRespMsg = mk_xcel_msg( 5, 32 )
+
+    # Interface
+
+    s.xcel = XcelResponderIfc( XcelReqMsg, XcelRespMsg )
+    s.mem  = MemRequesterIfc( MemReqMsg, MemRespMsg )
+
+    # Proc <-> Xcel Adapters
+
+    s.xcelreq_q  = IStreamBlockingAdapterFL( XcelReqMsg  )
+    s.xcelresp_q = OStreamBlockingAdapterFL( XcelRespMsg )
+
+    connect( s.xcelreq_q.istream,  s.xcel.reqstream  )
+    connect( s.xcelresp_q.ostream, s.xcel.respstream )
+
+    # Xcel <-> Memory Adapters
+
+    s.mem_adapter = MemRequesterAdapterFL( MemReqMsg, MemRespMsg )
+
+    connect( s.mem, s.mem_adapter.requester )
+
+    s.burst = BurstAdapter( s.mem_adapter, nwords )
+
+    # Storage (xr1-14)
+
+    s.regs = [ 0 ] * 15
+
+    # Reads count words starting at addr as signed 32-bit values
+
+    def read_values( addr, count ):
+      words = s.burst.read_words( addr, count )
+      return np.array( words, dtype=np.uint32 ).view( np.int32 )
+
+    @update_once
+    def up_mlp_xcel():
+
+      # We loop handling accelerator requests. We are only expecting
+      # writes to xr0-14, so any other requests are an error. We exit the
+      # loop when we see the write to xr0.
+
+      go = False
+      while not go:
+
+        xcelreq_msg = s.xcelreq_q.deq()
+
+        if xcelreq_msg.type_ == XcelMsgType.WRITE:
+          assert xcelreq_msg.addr < 15, \
+            "Only reg writes to 0-14 allowed during setup!"
+
+          # Use xcel register address to configure accelerator
+
+          if xcelreq_msg.addr == 0:
+            go = True
+          else:
+            s.regs[ int(xcelreq_msg.addr) ] = int( xcelreq_msg.data )
+
+          # Send xcel response message
+
+          s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.WRITE, 0 ) )
+
+      input_base  = s.regs[1]
+      param_bases = s.regs[2:8]
+      output_base = s.regs[8]
+      batch_size  = s.regs[9]
+      sizes       = s.regs[10:14]
+      mode        = s.regs[14]
+
+      # Fetch the weights and biases of all three layers
+
+      layers = []
+      for n in range( 3 ):
+        weight_base, bias_base = param_bases[2*n:2*n+2]
+        weights = read_values( weight_base, sizes[n]*sizes[n+1] )
+        biases  = read_values( bias_base, sizes[n+1] )
+        layers.append( ( weights.reshape( sizes[n], sizes[n+1] ), biases ) )
+
+      # Run the whole batch through the network, the activations between
+      # the layers stay on chip
+
+      inputs  = read_values( input_base, batch_size*sizes[0] )
+      outputs = mlp_inference( inputs.reshape( batch_size, sizes[0] ), layers,
+                               argmax=bool( mode & MLPMode.ARGMAX ) )
+
+      words = outputs.ravel().view( np.uint32 ).tolist()
+      s.burst.write_words( output_base, words )
+
+      # Now wait for read of xr0
+
+      xcelreq_msg = s.xcelreq_q.deq()
+
+      # Only expecting read from xr0, so any other request is an xcel
+      # protocol error.
+
+      assert xcelreq_msg.type_ == XcelMsgType.READ, \
+        "Only reg reads allowed during done phase!"
+
+      assert xcelreq_msg.addr == 0, \
+        "Only reg read to 0 allowed during done phase!"
+
+      # Send xcel response message indicating xcel is done
+
+      s.xcelresp_q.enq( XcelRespMsg( XcelMsgType.READ, 1 ) )
+
+    s.burst.schedule_caller( s, up_mlp_xcel )
+
+  # Line tracing
+
+  def line_trace( s ):
+    return f"{s.xcel.reqstream}(){s.xcel.respstream}"
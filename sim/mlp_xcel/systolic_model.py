@@ -0,0 +1,419 @@
+#=========================================================================
+# systolic_model
+#=========================================================================
+# Cycle-level model of a weight-stationary systolic array running a
+# fully connected layer. The FC datapath only exists for one array size,
+# so this model is how we estimate what other array shapes would cost
+# without writing RTL:
+#
+#  >>> model = SystolicArrayModel( 16, 16, in_bw=4 )
+#  >>> est   = model.estimate( 784, 128, 8 )
+#  >>> est.cycles, est.utilization, est.in_demand
+#
+# The array has rows x cols PEs built like SystolicPE: PE (i,j) holds
+# weight (i,j) of the current weight tile, multiplies the activation
+# coming from the west with it, and adds the product to the partial sum
+# coming from the north. The activation and the sum are registered at
+# the outputs of the PE, so both move one PE per cycle (east and south).
+#
+# Input vectors are injected skewed: element i of a vector enters row i
+# i cycles after element 0 entered row 0, so that it meets the partial
+# sums of the vector in every column. Column j starts from the partial
+# sums of the vector j cycles after the vector starts, and the finished
+# sums leave the bottom of the column rows cycles later. A new vector
+# can start every cycle, so with enough bandwidth the last sums of a
+# weight tile applied to n vectors leave the array n + rows + cols - 1
+# cycles after the first vector started, the extra rows + cols - 1 being
+# the fill and drain of the skewed wavefront.
+#
+# Layers larger than the array are run one weight tile at a time
+# following fc_tile_schedule (see fc_tiling.py) with tiles of rows input
+# channels by cols output channels and acc_depth input vectors per
+# group. The partial sums between input tiles stay in accumulators below
+# the array (one row of cols sums per input vector), which feed them back
+# in at the top of the columns for the next input tile. A tile which is
+# smaller than the array still goes through all of it, with zero weights
+# and inputs in the unused rows.
+#
+# The array is fed by three streams, each with a limited number of words
+# per cycle:
+#
+#  - in_bw     : input activations, fetched into an input buffer which
+#                holds in_buffer vectors. A vector only starts once all
+#                of its elements are in the buffer, otherwise row 0 gets
+#                a bubble (starve).
+#  - weight_bw : weights, and the biases on the first input tile of an
+#                output tile. The array holds one weight tile, so a new
+#                tile is only loaded once the array has drained, shifting
+#                one row of weights into the top of the columns per
+#                ceil(cols/weight_bw) cycles.
+#  - out_bw    : finished outputs, which go through an output buffer of
+#                out_buffer words. The whole array freezes while the
+#                outputs leaving it in a cycle do not fit (stall).
+#
+# Only the used part of each tile goes over the streams. Bandwidths of
+# None mean the stream keeps up with the array (rows input words, cols
+# weight words and cols output words per cycle).
+#
+# The PEs compute with the given FixedPoint arithmetic (fc_datapath by
+# default), one multiply-accumulate at a time in input channel order, so
+# the outputs of the model are exactly arith.matmul of the layer.
+
+import math
+
+import numpy as np
+
+from common.fixed_point import fc_datapath, fit
+
+from mlp_xcel.fc_tiling import fc_tile_schedule, weight_reloads
+
+#=========================================================================
+# SystolicEstimate
+#=========================================================================
+# Result of the model for one layer. Stream traffic is counted in words.
+# Every cycle is a load cycle, a stall cycle, or a cycle where the array
+# advances; the advancing cycles where no vector starts are counted as
+# drain cycles when the current weight tile has no vectors left to start
+# and as starve cycles when the next vector is still being fetched.
+
+class SystolicEstimate:
+
+  def __init__( self, rows, cols, cycles, macs, load_cycles, drain_cycles,
+                stall_cycles, starve_cycles, in_words, weight_words,
+                out_words, weight_reloads, outputs=None ):
+    self.rows           = rows
+    self.cols           = cols
+    self.cycles         = cycles
+    self.macs           = macs
+    self.load_cycles    = load_cycles
+    self.drain_cycles   = drain_cycles
+    self.stall_cycles   = stall_cycles
+    self.starve_cycles  = starve_cycles
+    self.in_words       = in_words
+    self.weight_words   = weight_words
+    self.out_words      = out_words
+    self.weight_reloads = weight_reloads
+    self.outputs        = outputs
+
+  # Fraction of the PE cycles which did useful multiply-accumulates
+
+  @property
+  def utilization( self ):
+    if self.cycles == 0:
+      return 0.0
+    return self.macs / ( self.rows * self.cols * self.cycles )
+
+  # Average words per cycle on each stream
+
+  @property
+  def in_demand( self ):
+    return self.in_words / max( self.cycles, 1 )
+
+  @property
+  def weight_demand( self ):
+    return self.weight_words / max( self.cycles, 1 )
+
+  @property
+  def out_demand( self ):
+    return self.out_words / max( self.cycles, 1 )
+
+  def __repr__( self ):
+    return ( f"SystolicEstimate({self.rows}x{self.cols}, "
+             f"cycles={self.cycles}, "
+             f"utilization={self.utilization:.2f})" )
+
+#=========================================================================
+# SystolicArrayModel
+#=========================================================================
+
+class SystolicArrayModel:
+
+  def __init__( self, rows, cols, in_bw=None, weight_bw=None, out_bw=None,
+                acc_depth=None, in_buffer=2, out_buffer=None,
+                arith=fc_datapath ):
+
+    if rows < 1 or cols < 1:
+      raise ValueError( f"array must have at least one PE ({rows}x{cols})" )
+
+    self.rows       = rows
+    self.cols       = cols
+    self.in_bw      = in_bw     or rows
+    self.weight_bw  = weight_bw or cols
+    self.out_bw     = out_bw    or cols
+    self.acc_depth  = acc_depth
+    self.in_buffer  = max( 1, in_buffer )
+    self.out_buffer = max( cols, out_buffer or 2*cols )
+    self.arith      = arith
+
+  # Cycles and words to load the weights of a tile (and its biases on
+  # the first input tile), one row of the tile at a time
+
+  def load_cycles( self, tile ):
+    in_len  = tile.in_end  - tile.in_start
+    out_len = tile.out_end - tile.out_start
+    return ( in_len + tile.first ) * math.ceil( out_len / self.weight_bw )
+
+  def weight_words( self, tile ):
+    in_len  = tile.in_end  - tile.in_start
+    out_len = tile.out_end - tile.out_start
+    return ( in_len + tile.first ) * out_len
+
+  #-----------------------------------------------------------------------
+  # run
+  #-----------------------------------------------------------------------
+  # Simulates the layer cycle by cycle and returns the estimate with the
+  # outputs of shape (batch_size, output_channel). With trace, prints one
+  # line per cycle.
+
+  def run( self, inputs, weights, biases, trace=False ):
+
+    inputs  = np.asarray( inputs,  dtype=np.int64 )
+    weights = np.asarray( weights, dtype=np.int64 )
+    biases  = np.asarray( biases,  dtype=np.int64 )
+
+    batch_size, input_channel = inputs.shape
+    output_channel            = weights.shape[1]
+
+    R, C  = self.rows, self.cols
+    arith = self.arith
+
+    schedule = fc_tile_schedule( input_channel, output_channel, batch_size,
+                                 R, C, self.acc_depth )
+
+    # Partial sums (and in the end the outputs) of every input vector
+
+    psums = np.zeros( ( batch_size, output_channel ), dtype=np.int64 )
+
+    # The vectors in the order they go through the array, numbered by a
+    # sequence number which also tags their values in the array
+
+    vec_tile  = []
+    vec_b     = []
+    tile_end  = []
+    for k, tile in enumerate( schedule ):
+      for b in range( tile.batch_start, tile.batch_end ):
+        vec_tile.append( k )
+        vec_b.append( b )
+      tile_end.append( len( vec_b ) )
+
+    vec_tile  = np.array( vec_tile, dtype=np.int64 )
+    vec_b     = np.array( vec_b,    dtype=np.int64 )
+    nvecs     = len( vec_b )
+
+    t_in_len    = np.array( [ t.in_end - t.in_start   for t in schedule ], dtype=np.int64 )
+    t_out_start = np.array( [ t.out_start             for t in schedule ], dtype=np.int64 )
+    t_out_len   = np.array( [ t.out_end - t.out_start for t in schedule ], dtype=np.int64 )
+    t_last      = np.array( [ t.last                  for t in schedule ], dtype=bool )
+
+    # Registers of the PEs: activation, partial sum, and the sequence
+    # number and valid bit of the vector they belong to
+
+    act   = np.zeros( ( R, C ), dtype=np.int64 )
+    psum  = np.zeros( ( R, C ), dtype=np.int64 )
+    tag   = np.zeros( ( R, C ), dtype=np.int64 )
+    valid = np.zeros( ( R, C ), dtype=bool )
+
+    # Skew delay lines: entry [d,i] is injected into row i (the top of
+    # column i) d+1 cycles from now
+
+    skew_act   = np.zeros( ( R, R ), dtype=np.int64 )
+    skew_tag   = np.zeros( ( R, R ), dtype=np.int64 )
+    skew_valid = np.zeros( ( R, R ), dtype=bool )
+    top_psum   = np.zeros( ( C, C ), dtype=np.int64 )
+
+    row_idx = np.arange( R )
+    col_idx = np.arange( C )
+
+    # Weights of the current tile padded with zeros to the array
+
+    W = np.zeros( ( R, C ), dtype=np.int64 )
+
+    def load_weights( tile ):
+      W[:] = 0
+      W[ :tile.in_end-tile.in_start, :tile.out_end-tile.out_start ] = \
+        weights[ tile.in_start:tile.in_end, tile.out_start:tile.out_end ]
+
+    # Stream and control state
+
+    cur_tile  = 0
+    load_left = 0
+    start_seq = 0   # next vector to start
+    fetch_seq = 0   # next vector to fetch
+    fetch_pos = 0   # words of it fetched so far
+    out_count = 0   # words in the output buffer
+
+    stats = dict( load=0, drain=0, stall=0, starve=0, macs=0,
+                  in_words=0, weight_words=0, out_words=0 )
+
+    if schedule:
+      load_left = self.load_cycles( schedule[0] )
+      load_weights( schedule[0] )
+      stats["weight_words"] += self.weight_words( schedule[0] )
+
+    t = 0
+    while True:
+
+      if ( start_seq == nvecs and load_left == 0 and out_count == 0
+           and not valid.any() and not skew_valid.any() ):
+        break
+
+      # Output stream
+
+      out_count -= min( self.out_bw, out_count )
+
+      state = "."
+
+      if load_left > 0:
+        load_left -= 1
+        stats["load"] += 1
+        state = "L"
+
+      else:
+
+        # Sums leaving the bottom of the array this cycle (only the used
+        # columns of their tile)
+
+        j    = np.nonzero( valid[-1] )[0]
+        seqs = tag[-1, j]
+        tk   = vec_tile[seqs]
+        keep = j < t_out_len[tk]
+        j, seqs, tk = j[keep], seqs[keep], tk[keep]
+        nout = int( np.count_nonzero( t_last[tk] ) )
+
+        if nout > self.out_buffer - out_count:
+          stats["stall"] += 1
+          state = "S"
+
+        else:
+
+          psums[ vec_b[seqs], t_out_start[tk] + j ] = psum[-1, j]
+          out_count          += nout
+          stats["out_words"] += nout
+
+          # Values injected into the rows and the tops of the columns
+
+          inj_act   = skew_act[0].copy()
+          inj_tag   = skew_tag[0].copy()
+          inj_valid = skew_valid[0].copy()
+          inj_top   = top_psum[0].copy()
+
+          skew_act[:-1]   = skew_act[1:]
+          skew_tag[:-1]   = skew_tag[1:]
+          skew_valid[:-1] = skew_valid[1:]
+          top_psum[:-1]   = top_psum[1:]
+          skew_act[-1]    = 0
+          skew_valid[-1]  = False
+          top_psum[-1]    = 0
+
+          # Start the next vector of the current tile if it is fetched
+
+          if start_seq < tile_end[cur_tile]:
+
+            if start_seq < fetch_seq:
+
+              tile = schedule[cur_tile]
+              b    = vec_b[start_seq]
+
+              x = np.zeros( R, dtype=np.int64 )
+              x[:tile.in_end-tile.in_start] = inputs[ b, tile.in_start:tile.in_end ]
+
+              top = np.zeros( C, dtype=np.int64 )
+              if tile.first:
+                top[:tile.out_end-tile.out_start] = biases[ tile.out_start:tile.out_end ]
+              else:
+                top[:tile.out_end-tile.out_start] = psums[ b, tile.out_start:tile.out_end ]
+
+              inj_act[0], inj_tag[0], inj_valid[0] = x[0], start_seq, True
+              inj_top[0] = top[0]
+
+              skew_act  [ row_idx[1:]-1, row_idx[1:] ] = x[1:]
+              skew_tag  [ row_idx[1:]-1, row_idx[1:] ] = start_seq
+              skew_valid[ row_idx[1:]-1, row_idx[1:] ] = True
+              top_psum  [ col_idx[1:]-1, col_idx[1:] ] = top[1:]
+
+              stats["macs"] += ( tile.in_end - tile.in_start ) \
+                             * ( tile.out_end - tile.out_start )
+
+              start_seq += 1
+              state = "#"
+
+            else:
+              stats["starve"] += 1
+
+          else:
+            stats["drain"] += 1
+
+          # Every PE takes the activation from the west and the partial
+          # sum from the north, which must belong to the same vector
+
+          west_act   = np.concatenate( ( inj_act[:,None],   act[:,:-1]   ), axis=1 )
+          west_tag   = np.concatenate( ( inj_tag[:,None],   tag[:,:-1]   ), axis=1 )
+          west_valid = np.concatenate( ( inj_valid[:,None], valid[:,:-1] ), axis=1 )
+
+          north_psum  = np.concatenate( ( inj_top[None,:],        psum[:-1]  ) )
+          north_valid = np.concatenate( ( west_valid[:1],         valid[:-1] ) )
+          north_tag   = np.concatenate( ( west_tag[:1],           tag[:-1]   ) )
+
+          assert np.array_equal( west_valid, north_valid ) and \
+                 np.array_equal( west_tag[west_valid], north_tag[west_valid] ), \
+            f"activations and partial sums out of step in cycle {t}"
+
+          psum  = np.where( west_valid,
+                            fit( north_psum + arith.mul( west_act, W ),
+                                 arith.acc_bits, arith.overflow ), 0 )
+          act   = west_act
+          tag   = west_tag
+          valid = west_valid
+
+          # Move on to the next tile once every vector of this one has
+          # started. A new weight tile has to wait for the array to drain.
+
+          if ( start_seq == tile_end[cur_tile] and cur_tile+1 < len(schedule) ):
+            nxt = schedule[cur_tile+1]
+            if not nxt.load_weights:
+              cur_tile += 1
+            elif not valid.any() and not skew_valid.any():
+              cur_tile += 1
+              load_left = self.load_cycles( nxt )
+              load_weights( nxt )
+              stats["weight_words"] += self.weight_words( nxt )
+
+      # Input stream: fetch up to in_bw words of the next vectors as long
+      # as the input buffer has room for them
+
+      budget = self.in_bw
+      while ( budget > 0 and fetch_seq < nvecs
+              and fetch_seq - start_seq < self.in_buffer ):
+        in_len = int( t_in_len[ vec_tile[fetch_seq] ] )
+        n      = min( budget, in_len - fetch_pos )
+        budget            -= n
+        fetch_pos         += n
+        stats["in_words"] += n
+        if fetch_pos == in_len:
+          fetch_seq += 1
+          fetch_pos  = 0
+
+      if trace:
+        print( f"{t:6}: {state} tile {cur_tile:4} "
+               f"in {fetch_seq-start_seq}/{self.in_buffer} "
+               f"out {out_count:3}/{self.out_buffer} "
+               f"pes {int(np.count_nonzero(valid)):5}" )
+
+      t += 1
+
+    return SystolicEstimate( R, C, t, stats["macs"], stats["load"],
+                             stats["drain"], stats["stall"], stats["starve"],
+                             stats["in_words"], stats["weight_words"],
+                             stats["out_words"], weight_reloads( schedule ),
+                             psums )
+
+  #-----------------------------------------------------------------------
+  # estimate
+  #-----------------------------------------------------------------------
+  # The timing does not depend on the values, so we can run a layer of
+  # zeros when only the cycles are of interest.
+
+  def estimate( self, input_channel, output_channel, batch_size ):
+    return self.run( np.zeros( ( batch_size, input_channel ), dtype=np.int64 ),
+                     np.zeros( ( input_channel, output_channel ), dtype=np.int64 ),
+                     np.zeros( output_channel, dtype=np.int64 ) )
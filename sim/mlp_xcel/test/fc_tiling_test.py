@@ -0,0 +1,84 @@
+#=========================================================================
+# fc_tiling_test
+#=========================================================================
+
+import pytest
+
+from mlp_xcel.fc_tiling import fc_tile_schedule, weight_reloads, format_schedule
+
+#-------------------------------------------------------------------------
+# test_coverage
+#-------------------------------------------------------------------------
+# Every (input channel, output channel, input vector) is covered by
+# exactly one tile, the partial sums of each output tile start from the
+# biases on its first input tile and are written out on its last.
+
+@pytest.mark.parametrize("input_channel, output_channel, batch_size, tile_in, tile_out, tile_batch",
+    [(17, 9, 3, 4, 2, None), (17, 9, 3, 5, 4, 2), (40, 20, 5, 64, 16, 2),
+     (3, 2, 2, 1, 1, 1), (784, 128, 4, 64, 16, 3)])
+def test_coverage(input_channel, output_channel, batch_size, tile_in,
+                  tile_out, tile_batch):
+    schedule = fc_tile_schedule(input_channel, output_channel, batch_size,
+                                tile_in, tile_out, tile_batch)
+
+    covered = {}
+    for tile in schedule:
+        assert tile.in_end - tile.in_start <= tile_in
+        assert tile.out_end - tile.out_start <= tile_out
+        assert tile.first == (tile.in_start == 0)
+        assert tile.last == (tile.in_end == input_channel)
+        for b in range(tile.batch_start, tile.batch_end):
+            for j in range(tile.out_start, tile.out_end):
+                covered[b, j] = covered.get((b, j), 0) + \
+                    tile.in_end - tile.in_start
+
+    assert covered == {(b, j): input_channel for b in range(batch_size)
+                       for j in range(output_channel)}
+
+    # Partial sums of an output tile are finished before the next one
+
+    for prev, tile in zip(schedule, schedule[1:]):
+        if not tile.first:
+            assert tile.in_start == prev.in_end
+            assert (tile.out_start, tile.batch_start) == \
+                   (prev.out_start, prev.batch_start)
+
+#-------------------------------------------------------------------------
+# test_reloads
+#-------------------------------------------------------------------------
+
+def test_reloads():
+
+    # MNIST layers on a 64x16 array with the whole batch on chip
+
+    assert weight_reloads(fc_tile_schedule(784, 128, 4, 64, 16)) == 13*8
+    assert weight_reloads(fc_tile_schedule(128, 64, 4, 64, 16)) == 2*4
+    assert weight_reloads(fc_tile_schedule(64, 10, 4, 64, 16)) == 1
+
+    # With two input vectors at a time the weights are loaded twice
+
+    assert weight_reloads(fc_tile_schedule(784, 128, 4, 64, 16, 2)) == 2*13*8
+
+    # A layer which fits is loaded once no matter how the batch is split
+
+    schedule = fc_tile_schedule(64, 10, 4, 64, 16, 1)
+    assert len(schedule) == 4
+    assert weight_reloads(schedule) == 1
+
+    # No tile sizes means the array covers the whole layer
+
+    assert len(fc_tile_schedule(784, 128, 4)) == 1
+    assert fc_tile_schedule(0, 10, 4) == []
+    assert fc_tile_schedule(64, 10, 0) == []
+
+#-------------------------------------------------------------------------
+# test_format_schedule
+#-------------------------------------------------------------------------
+
+def test_format_schedule():
+    lines = format_schedule(fc_tile_schedule(10, 5, 2, 4, 4)).splitlines()
+    assert len(lines) == 7
+    assert lines[0].split() == ["0", "wb-", "in", "0:4", "out", "0:4",
+                                "batch", "0:2"]
+    assert lines[2].split()[1] == "w-o"
+    assert lines[-1] == "6 tiles, 6 weight reloads"
@@ -0,0 +1,82 @@
+#=========================================================================
+# mlp_datasets_test
+#=========================================================================
+
+import os
+
+import numpy as np
+
+from mlp_xcel.mlp_datasets import gen_fc_dataset, gen_mlp_dataset
+from mlp_xcel.mlp_datasets import format_dat, parse_dat
+
+ubmark_dir = os.path.join(os.path.dirname(__file__), "..", "..", "..",
+                          "app", "ubmark")
+
+# FIXED_MULT layer from app/ubmark/ubmark-fclayer.c one element at a time
+def ref_fc_layer(inputs, weights, biases, relu=False):
+    outputs = []
+    for row in inputs:
+        out = []
+        for j in range(len(biases)):
+            accum = int(biases[j])
+            for i in range(len(row)):
+                accum += (int(row[i])*int(weights[i][j]) + 64) >> 7
+            out.append(max(accum, 0) if relu else accum)
+        outputs.append(out)
+    return outputs
+
+#-------------------------------------------------------------------------
+# test_fc_dataset
+#-------------------------------------------------------------------------
+
+def test_fc_dataset():
+    arrays = dict(gen_fc_dataset(8, 32, 32, seed=1))
+    assert arrays["eval_size"] == 8*32
+    assert arrays["eval_input"].shape == (8, 32)
+    assert arrays["eval_ref"].tolist() == ref_fc_layer(
+        arrays["eval_input"], arrays["eval_weight"], arrays["eval_bias"])
+
+    # The same seed gives the same data set
+
+    assert format_dat("fclayer", gen_fc_dataset(8, 32, 32, seed=1)) == \
+           format_dat("fclayer", gen_fc_dataset(8, 32, 32, seed=1))
+
+def test_fc_xcel_dataset():
+
+    # Low 12 bits of each product summed with 12-bit wraparound, written
+    # sign-extended like the FC layer accelerators do
+
+    arrays = dict(gen_fc_dataset(2, 16, 8, seed=3, arith="fc-datapath"))
+    for b, row in enumerate(arrays["eval_input"]):
+        for j in range(8):
+            accum = arrays["eval_bias"][j] & 0xfff
+            for i in range(16):
+                accum = (accum + (row[i]*arrays["eval_weight"][i][j] & 0xfff)) & 0xfff
+            assert arrays["eval_ref"][b][j] == (accum ^ 0x800) - 0x800
+
+def test_mlp_dataset():
+    arrays = dict(gen_mlp_dataset(2, [20, 8, 6, 10], seed=1))
+    acts = arrays["eval_input"]
+    for n in range(3):
+        acts = ref_fc_layer(acts, arrays[f"eval_weight_{n}"],
+                            arrays[f"eval_bias_{n}"], relu=(n < 2))
+    assert arrays["eval_size"] == 20
+    assert arrays["eval_ref"].tolist() == acts
+
+#-------------------------------------------------------------------------
+# test_format_dat
+#-------------------------------------------------------------------------
+
+def test_format_dat():
+    arrays = gen_mlp_dataset(1, [4, 3, 2, 2], seed=2)
+    parsed = parse_dat(format_dat("mlp", arrays))
+    assert set(parsed) == {name for name, _ in arrays}
+    for name, values in arrays:
+        assert np.array_equal(np.ravel(parsed[name]), np.ravel(values))
+
+    # The data set of ubmark-mlp-eval is exact
+
+    with open(os.path.join(ubmark_dir, "ubmark-mlp.dat")) as f:
+        parsed = parse_dat(f.read())
+    assert parsed["eval_size"] == 2
+    assert parsed["eval_ref"].tolist() == [29, -13]
@@ -3,20 +3,31 @@
 #=========================================================================
 
 import pytest
+import random
+
+from collections import deque
+
+import numpy as np
+
 from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import OStreamIfc
 from pymtl3.stdlib.test_utils import mk_test_case_table, run_sim
 from pymtl3.stdlib.stream import StreamSourceFL, StreamSinkFL
-from mlp_xcel.mnist_fc_layer_fl import FullyConnected_FL
+from mlp_xcel.mnist_fc_layer_fl import FullyConnected_FL, fc_dot, fc_output_msgs
+from mlp_xcel.mnist_fc_layer_fl import num_batch_tags
+
+from common.burst  import pack_words
+from common.stream import LazyStreamSinkFL
 
 #-------------------------------------------------------------------------
 # TestHarness
 #-------------------------------------------------------------------------
 
 class TestHarness(Component):
-    def construct(s, dut):
+    def construct(s, dut, out_nbits=32):
         # Instantiate models
         s.src = StreamSourceFL(Bits32)
-        s.sink = StreamSinkFL(Bits32)
+        s.sink = StreamSinkFL(mk_bits(out_nbits))
         s.dut = dut
 
         # Connect
@@ -38,6 +49,7 @@ MSG_WEIGHT = 0
 MSG_BIAS = 1
 MSG_INPUT = 2
 MSG_OUTPUT = 3  # Output message type
+MSG_PACKED = 3  # Packed header (input stream only)
 
 # Helper function to create weight message
 def mk_weight_msg(in_channel, out_channel, value):
@@ -55,6 +67,89 @@ def mk_input_msg(batch_idx, in_channel, value):
 def mk_output_msg(batch_idx, out_channel, value):
     return concat(concat(concat(Bits2(MSG_OUTPUT), Bits4(batch_idx)), Bits8(out_channel)), Bits18(value))
 
+# Helper functions to create packed messages: a header for a run of count
+# weights (row-major from the given position) or inputs (consecutive
+# input channels of one batch), followed by data messages with two values
+# each
+def mk_weight_header_msg(in_channel, out_channel, count):
+    return concat(Bits2(MSG_PACKED), Bits1(0), Bits10(in_channel), Bits8(out_channel), Bits11(count))
+
+def mk_input_header_msg(batch_idx, in_channel, count):
+    return concat(Bits2(MSG_PACKED), Bits1(1), Bits4(batch_idx), Bits10(in_channel), Bits4(0), Bits11(count))
+
+def mk_packed_data_msg(value0, value1=0):
+    return concat(Bits16(value1), Bits16(value0))
+
+# Converts a list of weight, bias and input messages into the packed
+# format. Runs of weight messages for consecutive row-major positions of
+# a layer with output_channel outputs, and runs of input messages for
+# consecutive input channels of one batch, become a header plus data
+# messages (at most max_count values per header); everything else is
+# left alone.
+
+def mk_packed_msgs(msgs, output_channel, max_count=2046):
+
+    def position(msg):
+        if msg[30:32] == MSG_WEIGHT:
+            return (MSG_WEIGHT, 0, msg[20:30].uint()*output_channel + msg[12:20].uint())
+        if msg[30:32] == MSG_INPUT:
+            return (MSG_INPUT, msg[26:30].uint(), msg[16:26].uint())
+        return None
+
+    runs = []
+    for msg in msgs:
+        pos = position(msg)
+        if (pos is not None and runs and runs[-1][0] is not None
+                and runs[-1][0][:2] == pos[:2]
+                and runs[-1][0][2] + len(runs[-1][1]) == pos[2]
+                and len(runs[-1][1]) < max_count):
+            runs[-1][1].append(msg)
+        else:
+            runs.append((pos, [msg]))
+
+    packed_msgs = []
+    for pos, run in runs:
+        if len(run) == 1:
+            packed_msgs.extend(run)
+            continue
+        kind, batch_idx, idx = pos
+        if kind == MSG_WEIGHT:
+            packed_msgs.append(mk_weight_header_msg(idx // output_channel,
+                                                    idx % output_channel, len(run)))
+            values = [msg[0:12].uint() for msg in run]
+        else:
+            packed_msgs.append(mk_input_header_msg(batch_idx, idx, len(run)))
+            values = [msg[0:16].uint() for msg in run]
+        for i in range(0, len(values), 2):
+            packed_msgs.append(mk_packed_data_msg(*values[i:i+2]))
+    return packed_msgs
+
+# Regroups expected output messages into messages of out_per_cycle words,
+# optionally packing two 16-bit results per word, like the FL model does
+# when configured with out_per_cycle/packed. The output messages of each
+# batch have to be consecutive and in output channel order, so a new
+# batch starts whenever the batch index changes or the channel is zero.
+
+def mk_wide_output_msgs(output_msgs, out_per_cycle=1, packed=False):
+    batches = []
+    for msg in output_msgs:
+        if not batches or batches[-1][0] != msg[26:30] or msg[18:26] == 0:
+            batches.append((msg[26:30], []))
+        batches[-1][1].append(msg)
+
+    OutType = mk_bits(32*out_per_cycle)
+    wide_msgs = []
+    for _, msgs in batches:
+        if packed:
+            values = [msg[0:16].uint() for msg in msgs] + [0]
+            words = [values[i] | (values[i+1] << 16) if i+1 < len(msgs) else values[i]
+                     for i in range(0, len(msgs), 2)]
+        else:
+            words = [msg.uint() for msg in msgs]
+        for i in range(0, len(words), out_per_cycle):
+            wide_msgs.append(OutType(pack_words(words[i:i+out_per_cycle])))
+    return wide_msgs
+
 def mk_imsg( a, b ):
   return concat( Bits32( a, trunc_int=True ), Bits32( b, trunc_int=True ) )
 
@@ -98,13 +193,62 @@ small_fc_msgs = [
     mk_output_msg(1, 1, 84),
 ]
 
+#-------------------------------------------------------------------------
+# Random layers
+#-------------------------------------------------------------------------
+# Reference for the layer which works on one element at a time like the
+# datapath: 12-bit operands, the low 12 bits of each product, and a 12-bit
+# accumulator which wraps around, sign-extended to an 18-bit output.
+
+def ref_fc_layer(weights, biases, inputs):
+    outputs = []
+    for batch in inputs:
+        row = []
+        for j in range(len(biases)):
+            accum = biases[j] & 0xfff
+            for k in range(len(batch)):
+                product = ((batch[k] & 0xfff) * (weights[k][j] & 0xfff)) & 0xfff
+                accum = (accum + product) & 0xfff
+            row.append(accum | 0x3f000 if accum & 0x800 else accum)
+        outputs.append(row)
+    return outputs
+
+# Messages for configuring a random layer and sending a batch of random
+# inputs (including values with bits above the 12 the layer keeps),
+# interleaved with the expected outputs
+
+def mk_random_fc_msgs(batch_size, input_channel, output_channel, seed=0):
+    rng = random.Random(seed)
+    weights = [[rng.randint(0, 0xfff) for _ in range(output_channel)]
+               for _ in range(input_channel)]
+    biases = [rng.randint(0, 0x3fffff) for _ in range(output_channel)]
+    inputs = [[rng.randint(0, 0xffff) for _ in range(input_channel)]
+              for _ in range(batch_size)]
+
+    msgs = []
+    for i in range(input_channel):
+        for j in range(output_channel):
+            msgs.append(mk_weight_msg(i, j, weights[i][j]))
+    for j in range(output_channel):
+        msgs.append(mk_bias_msg(j, biases[j]))
+
+    outputs = ref_fc_layer(weights, biases, inputs)
+    for b in range(batch_size):
+        for k in range(input_channel):
+            msgs.append(mk_input_msg(b, k, inputs[b][k]))
+        for j in range(output_channel):
+            msgs.append(mk_output_msg(b, j, outputs[b][j]))
+    return msgs
+
 #-------------------------------------------------------------------------
 # Test Case Table
 #-------------------------------------------------------------------------
 
 test_case_table = mk_test_case_table([
-    (             "msgs              dut_params                                src_delay sink_delay"),
-    [ "small_fc",  small_fc_msgs,   {"batch_size": 2, "input_channel": 3, "output_channel": 2}, 0,        0         ],
+    (                    "msgs              dut_params                                src_delay sink_delay packed"),
+    [ "small_fc",         small_fc_msgs,   {"batch_size": 2, "input_channel": 3, "output_channel": 2}, 0,        0,         False  ],
+    [ "small_fc_packed",  small_fc_msgs,   {"batch_size": 2, "input_channel": 3, "output_channel": 2}, 0,        0,         True   ],
+    [ "small_fc_packed_delay", small_fc_msgs, {"batch_size": 2, "input_channel": 3, "output_channel": 2}, 3,   5,         True   ],
     # Add more test cases here with different parameters/delays
 ])
 
@@ -135,6 +279,8 @@ def test_fully_connected_fl(test_params):
         else:  # If it's an input message (weight, bias, or input)
             # print(f"Input message: {msg}")
             input_msgs.append(msg)
+    if test_params.packed:
+        input_msgs = mk_packed_msgs(input_msgs, test_params.dut_params["output_channel"])
     # print(f"Test case: {input_msgs}")
     # Configure the source and sink
     th.set_param("top.src.construct",
@@ -151,6 +297,485 @@ def test_fully_connected_fl(test_params):
     # Run simulation
     run_sim(th)
 
+#-------------------------------------------------------------------------
+# test_random_fc
+#-------------------------------------------------------------------------
+# Random layers of other shapes (the RTL tests share the table above
+# with a fixed shape, so these only run on the FL model).
+
+@pytest.mark.parametrize("batch_size, input_channel, output_channel, src_delay, sink_delay",
+    [(3, 17, 9, 0, 0), (3, 17, 9, 3, 5), (10, 1, 1, 0, 0), (1, 40, 20, 0, 2)])
+def test_random_fc(batch_size, input_channel, output_channel, src_delay, sink_delay):
+    msgs = mk_random_fc_msgs(batch_size, input_channel, output_channel,
+                             seed=input_channel)
+    dut = FullyConnected_FL(batch_size=batch_size, input_channel=input_channel,
+                            output_channel=output_channel)
+    th = TestHarness(dut)
+
+    th.set_param("top.src.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT],
+        initial_delay=src_delay+3,
+        interval_delay=src_delay)
+    th.set_param("top.sink.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() == MSG_OUTPUT],
+        initial_delay=sink_delay+3,
+        interval_delay=sink_delay)
+
+    run_sim(th)
+
+#-------------------------------------------------------------------------
+# test_packed
+#-------------------------------------------------------------------------
+# Random layers loaded with packed weights and inputs, including runs
+# which are split over several headers and runs with an odd number of
+# values.
+
+@pytest.mark.parametrize("batch_size, input_channel, output_channel, max_count",
+    [(3, 17, 9, 2046), (3, 17, 9, 7), (2, 5, 1, 2046), (1, 40, 20, 100)])
+def test_packed(batch_size, input_channel, output_channel, max_count):
+    msgs = mk_random_fc_msgs(batch_size, input_channel, output_channel,
+                             seed=input_channel)
+    input_msgs = [msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT]
+    packed_msgs = mk_packed_msgs(input_msgs, output_channel, max_count)
+
+    assert len(packed_msgs) < len(input_msgs)
+
+    dut = FullyConnected_FL(batch_size=batch_size, input_channel=input_channel,
+                            output_channel=output_channel)
+    th = TestHarness(dut)
+
+    th.set_param("top.src.construct", msgs=packed_msgs, initial_delay=3)
+    th.set_param("top.sink.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() == MSG_OUTPUT],
+        initial_delay=3)
+
+    run_sim(th)
+
+#-------------------------------------------------------------------------
+# test_packed_traffic
+#-------------------------------------------------------------------------
+# Loading the weights and inputs of a layer takes half as many messages
+# plus one header per run of up to 2046 values.
+
+def test_packed_traffic():
+    msgs = mk_random_fc_msgs(2, 100, 50)
+    input_msgs = [msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT]
+    packed_msgs = mk_packed_msgs(input_msgs, 50)
+
+    # Two values per data message, 50 bias messages, and three headers
+    # for the 5000 weights plus one for the inputs of each batch
+
+    assert len(input_msgs) == 5000 + 50 + 2*100
+    assert len(packed_msgs) == (5000 + 2*100)//2 + 50 + 3 + 2
+
+#-------------------------------------------------------------------------
+# test_out_per_cycle
+#-------------------------------------------------------------------------
+# Wider and packed output messages.
+
+@pytest.mark.parametrize("out_per_cycle, packed", [(1, True), (2, False),
+    (2, True), (4, False), (3, True)])
+@pytest.mark.parametrize("src_delay, sink_delay", [(0, 0), (3, 5)])
+def test_out_per_cycle(out_per_cycle, packed, src_delay, sink_delay):
+    msgs = mk_random_fc_msgs(3, 7, 9, seed=out_per_cycle)
+    dut = FullyConnected_FL(batch_size=3, input_channel=7, output_channel=9,
+                            out_per_cycle=out_per_cycle, packed=packed)
+    th = TestHarness(dut, out_nbits=32*out_per_cycle)
+
+    output_msgs = [msg for msg in msgs if msg[30:].uint() == MSG_OUTPUT]
+
+    th.set_param("top.src.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT],
+        initial_delay=src_delay+3,
+        interval_delay=src_delay)
+    th.set_param("top.sink.construct",
+        msgs=mk_wide_output_msgs(output_msgs, out_per_cycle, packed),
+        initial_delay=sink_delay+3,
+        interval_delay=sink_delay)
+
+    run_sim(th)
+
+#-------------------------------------------------------------------------
+# test_throughput
+#-------------------------------------------------------------------------
+# Many small batches: the input messages for the next batch are accepted
+# while the outputs of the previous one are sent, so we need about one
+# cycle per input message (two per batch) rather than one cycle per input
+# and output message, plus a few cycles of harness overhead (see
+# lab1_imul/test/IntMulVar_perf_test.py).
+
+def test_throughput():
+    nbatches = 10
+    msgs = []
+    for _ in range(4):
+        msgs += mk_random_fc_msgs(nbatches, 2, 2, seed=len(msgs))
+
+    dut = FullyConnected_FL(batch_size=nbatches, input_channel=2, output_channel=2)
+    th = TestHarness(dut)
+
+    th.set_param("top.src.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT],
+        initial_delay=3)
+    th.set_param("top.sink.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() == MSG_OUTPUT],
+        initial_delay=3)
+
+    run_sim(th)
+
+    ninputs = len([msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT])
+    assert th.sim_cycle_count() <= ninputs + 20
+
+#-------------------------------------------------------------------------
+# test_slow_sink
+#-------------------------------------------------------------------------
+# With a slow sink the output buffer fills up, so the model has to stop
+# taking input messages instead of buffering every result. The harness
+# counts the cycles in which the input stream is stalled and the largest
+# number of buffered output messages.
+
+class StallTestHarness(TestHarness):
+    def construct(s, dut, out_nbits=32):
+        super().construct(dut, out_nbits)
+
+        s.stalls = 0
+        s.max_pending = 0
+
+        @update_ff
+        def up_count():
+            if s.dut.istream.val & ~s.dut.istream.rdy:
+                s.stalls += 1
+            if len(s.dut.pending) > s.max_pending:
+                s.max_pending = len(s.dut.pending)
+
+@pytest.mark.parametrize("out_per_cycle, packed, out_depth, max_pending",
+    [(1, False, None, 16), (1, False, 9, 9), (2, True, 2, 2)])
+def test_slow_sink(out_per_cycle, packed, out_depth, max_pending):
+    msgs = mk_random_fc_msgs(6, 2, 8, seed=out_per_cycle)
+    dut = FullyConnected_FL(batch_size=6, input_channel=2, output_channel=8,
+                            out_per_cycle=out_per_cycle, packed=packed,
+                            out_depth=out_depth)
+    th = StallTestHarness(dut, out_nbits=32*out_per_cycle)
+
+    output_msgs = [msg for msg in msgs if msg[30:].uint() == MSG_OUTPUT]
+
+    th.set_param("top.src.construct",
+        msgs=[msg for msg in msgs if msg[30:].uint() != MSG_OUTPUT],
+        initial_delay=3)
+    th.set_param("top.sink.construct",
+        msgs=mk_wide_output_msgs(output_msgs, out_per_cycle, packed),
+        initial_delay=3, interval_delay=10)
+
+    run_sim(th)
+
+    assert th.stalls > 0
+    assert th.max_pending <= max_pending
+
+def test_out_depth_too_small():
+    with pytest.raises(AssertionError):
+        FullyConnected_FL(output_channel=8, out_depth=7).elaborate()
+
+#-------------------------------------------------------------------------
+# test_fc_dot
+#-------------------------------------------------------------------------
+# The vectorized dot products match the element-by-element reference,
+# including a full MNIST hidden layer.
+
+@pytest.mark.parametrize("batch_size, input_channel, output_channel",
+    [(1, 1, 1), (2, 3, 2), (4, 31, 7), (1, 784, 128)])
+def test_fc_dot(batch_size, input_channel, output_channel):
+    rng = np.random.default_rng(input_channel)
+    weights = rng.integers(0, 0x1000, (input_channel, output_channel))
+    biases = rng.integers(0, 0x1000, output_channel)
+    inputs = rng.integers(0, 0x1000, (batch_size, input_channel))
+
+    ref = ref_fc_layer(weights.tolist(), biases.tolist(), inputs.tolist())
+    for b in range(batch_size):
+        msgs = fc_output_msgs(b, fc_dot(inputs[b], weights, biases))
+        assert msgs == [mk_output_msg(b, j, ref[b][j]) for j in range(output_channel)]
+
+#-------------------------------------------------------------------------
+# Tagged batches
+#-------------------------------------------------------------------------
+
+def mk_tagged_input_msg(tag, in_channel, value):
+    return concat(Bits2(MSG_INPUT), Bits8(tag), Bits10(in_channel), Bits12(value))
+
+def mk_tagged_input_header_msg(tag, in_channel, count):
+    return concat(Bits2(MSG_PACKED), Bits1(1), Bits8(tag), Bits10(in_channel), Bits11(count))
+
+def mk_tagged_output_msg(tag, out_channel, value, last):
+    return concat(Bits2(MSG_OUTPUT), Bits8(tag), Bits8(out_channel), Bits1(last), Bits1(0), Bits12(value))
+
+# Messages for configuring a random layer, and for each of nbatches
+# batches (tagged modulo num_batch_tags) the chunks of input messages
+# and the expected outputs. A chunk is either a single input message or
+# a packed run, which must not be interleaved with other messages. The
+# single input messages of a batch come in a random channel order.
+
+def mk_tagged_fc_msgs(nbatches, input_channel, output_channel, packed=False,
+                      seed=0):
+    rng = random.Random(seed)
+    weights = [[rng.randint(0, 0xfff) for _ in range(output_channel)]
+               for _ in range(input_channel)]
+    biases = [rng.randint(0, 0xfff) for _ in range(output_channel)]
+    inputs = [[rng.randint(0, 0xfff) for _ in range(input_channel)]
+              for _ in range(nbatches)]
+
+    config_msgs = [mk_weight_msg(i, j, weights[i][j])
+                   for i in range(input_channel) for j in range(output_channel)]
+    config_msgs += [mk_bias_msg(j, biases[j]) for j in range(output_channel)]
+
+    outputs = ref_fc_layer(weights, biases, inputs)
+
+    batches = []
+    output_msgs = []
+    for b in range(nbatches):
+        tag = b % num_batch_tags
+        if packed:
+            values = inputs[b] + [0]
+            chunk = [mk_tagged_input_header_msg(tag, 0, input_channel)]
+            chunk += [mk_packed_data_msg(values[k], values[k+1])
+                      for k in range(0, input_channel, 2)]
+            batches.append([chunk])
+        else:
+            channels = list(range(input_channel))
+            rng.shuffle(channels)
+            batches.append([[mk_tagged_input_msg(tag, k, inputs[b][k])]
+                            for k in channels])
+        output_msgs += [mk_tagged_output_msg(tag, j, outputs[b][j] & 0xfff,
+                                             j == output_channel-1)
+                        for j in range(output_channel)]
+
+    return config_msgs, batches, output_msgs
+
+# Source which sends the configuration messages and then the batches,
+# following the credit protocol: a batch is only started with a credit,
+# and the harness hands a credit back whenever the output with the last
+# bit set is sent. The chunks of up to max_open started batches are sent
+# in a random order, so the batches complete out of order.
+
+class CreditSourceFL(Component):
+    def construct(s, config_msgs, batches, credits, max_open=None, seed=0,
+                  initial_delay=0, interval_delay=0):
+        s.ostream = OStreamIfc(Bits32)
+        s.credit = InPort()
+
+        s.nbatches = len(batches)
+        max_open = max_open or credits
+
+        def reset_state():
+            s.config = deque(config_msgs)
+            s.next_batch = 0
+            s.open = []        # chunks left of each started batch
+            s.current = None   # messages left of the chunk being sent
+            s.credits = credits
+            s.count = initial_delay
+            s.rng = random.Random(seed)
+
+        reset_state()
+
+        @update_ff
+        def up_src():
+            if s.reset:
+                reset_state()
+                s.ostream.val <<= 0
+
+            else:
+                if s.ostream.val & s.ostream.rdy:
+                    s.current.popleft()
+                    if not s.current:
+                        s.current = None
+                    s.count = interval_delay
+
+                if s.credit:
+                    s.credits += 1
+
+                # Start new batches while we have credits
+
+                while (not s.config and s.credits > 0
+                       and len(s.open) < max_open
+                       and s.next_batch < s.nbatches):
+                    s.open.append(deque(batches[s.next_batch]))
+                    s.next_batch += 1
+                    s.credits -= 1
+
+                # Pick the next chunk
+
+                if s.current is None:
+                    if s.config:
+                        s.current = deque([s.config.popleft()])
+                    elif s.open:
+                        i = s.rng.randrange(len(s.open))
+                        s.current = deque(s.open[i].popleft())
+                        if not s.open[i]:
+                            s.open.pop(i)
+
+                if s.count > 0:
+                    s.count -= 1
+                    s.ostream.val <<= 0
+                elif s.current:
+                    s.ostream.val <<= 1
+                    s.ostream.msg <<= s.current[0]
+                else:
+                    s.ostream.val <<= 0
+
+    def done(s):
+        return (not s.config and not s.open and s.current is None
+                and s.next_batch == s.nbatches)
+
+    def line_trace(s):
+        return f"{s.credits:3} {s.ostream}"
+
+class CreditTestHarness(Component):
+    def construct(s, dut):
+        s.src = CreditSourceFL()
+        s.sink = LazyStreamSinkFL(Bits32)
+        s.dut = dut
+
+        s.src.ostream //= s.dut.istream
+        s.dut.ostream //= s.sink.istream
+
+        # A credit comes back with every output which has the last bit set
+
+        @update
+        def up_credit():
+            s.src.credit @= s.dut.ostream.val & s.dut.ostream.rdy & s.dut.ostream.msg[13]
+
+    def done(s):
+        return s.src.done() and s.sink.done()
+
+    def line_trace(s):
+        return s.src.line_trace() + " > " + s.dut.line_trace() + " > " + s.sink.line_trace()
+
+def run_tagged_test(cmdline_opts, nbatches, slots, input_channel,
+                    output_channel, packed=False, max_open=None, src_delay=0,
+                    sink_delay=0, seed=0, max_cycles=10000, out_depth=None):
+    config_msgs, batches, output_msgs = \
+        mk_tagged_fc_msgs(nbatches, input_channel, output_channel, packed, seed)
+
+    dut = FullyConnected_FL(batch_size=slots, input_channel=input_channel,
+                            output_channel=output_channel, tagged=True,
+                            out_depth=out_depth)
+    th = CreditTestHarness(dut)
+
+    # Batches which started later can complete earlier, but never once
+    # the credit of an earlier batch was reused
+
+    th.set_param("top.src.construct", config_msgs=config_msgs,
+        batches=batches, credits=slots, max_open=max_open, seed=seed,
+        initial_delay=src_delay+3, interval_delay=src_delay)
+    th.set_param("top.sink.construct", msgs=output_msgs,
+        initial_delay=sink_delay+3, interval_delay=sink_delay,
+        reorder_window=slots*output_channel)
+
+    cmdline_opts = dict(cmdline_opts)
+    if cmdline_opts['max_cycles'] is None:
+        cmdline_opts['max_cycles'] = max_cycles
+
+    run_sim(th, cmdline_opts)
+    return th, len(config_msgs) + sum(len(chunk) for batch in batches
+                                      for chunk in batch)
+
+#-------------------------------------------------------------------------
+# test_tagged
+#-------------------------------------------------------------------------
+# More slots than the 4-bit batch index allows, more batches than tags,
+# and a slow sink which holds back the credits.
+
+@pytest.mark.parametrize("nbatches, slots, input_channel, output_channel, packed, src_delay, sink_delay",
+    [(10, 4, 3, 2, False, 0, 0), (40, 32, 7, 3, False, 0, 0),
+     (300, 16, 5, 2, True, 0, 0), (30, 4, 6, 5, False, 3, 5),
+     (20, 2, 17, 9, True, 0, 4), (20, 1, 4, 1, False, 0, 0)])
+def test_tagged(cmdline_opts, nbatches, slots, input_channel, output_channel,
+                packed, src_delay, sink_delay):
+    run_tagged_test(cmdline_opts, nbatches, slots, input_channel,
+                    output_channel, packed, src_delay=src_delay,
+                    sink_delay=sink_delay, seed=nbatches)
+
+#-------------------------------------------------------------------------
+# test_tagged_throughput
+#-------------------------------------------------------------------------
+# A long stream of small batches with their inputs interleaved: with
+# enough slots (and an output buffer for the outputs of all of them) the
+# producer never waits, so we need about one cycle per input message,
+# while with a single slot the producer waits for the outputs of every
+# batch before it can start the next.
+
+def test_tagged_throughput(cmdline_opts):
+    th, nmsgs = run_tagged_test(cmdline_opts, 600, 16, 4, 2, seed=1,
+                                out_depth=16*2)
+    assert th.sim_cycle_count() <= nmsgs + 20
+
+    th, nmsgs = run_tagged_test(cmdline_opts, 600, 1, 4, 2, seed=1,
+                                max_cycles=20000)
+    assert th.sim_cycle_count() >= nmsgs + 600
+
+#-------------------------------------------------------------------------
+# test_tagged_no_credit
+#-------------------------------------------------------------------------
+# Starting a third batch with two slots and no batch complete
+
+def test_tagged_no_credit():
+    dut = FullyConnected_FL(batch_size=2, input_channel=2, output_channel=1,
+                            tagged=True)
+    th = TestHarness(dut)
+
+    th.set_param("top.src.construct",
+        msgs=[mk_tagged_input_msg(tag, 0, 1) for tag in range(3)],
+        initial_delay=3)
+    th.set_param("top.sink.construct", msgs=[], initial_delay=3)
+
+    with pytest.raises(AssertionError):
+        run_sim(th)
+
+#-------------------------------------------------------------------------
+# test_tagged_reuse
+#-------------------------------------------------------------------------
+# Reusing a tag while the output with its credit is still held back by
+# the sink, even though a slot is free. Once the sink took the output
+# the tag can be reused. Without weights and biases every output is 0.
+
+def test_tagged_reuse():
+    def run(sink_delay):
+        dut = FullyConnected_FL(batch_size=2, input_channel=1,
+                                output_channel=1, tagged=True)
+        th = TestHarness(dut)
+
+        th.set_param("top.src.construct",
+            msgs=[mk_tagged_input_msg(0, 0, 1), mk_tagged_input_msg(0, 0, 2)],
+            initial_delay=3, interval_delay=10)
+        th.set_param("top.sink.construct",
+            msgs=[mk_tagged_output_msg(0, 0, 0, 1)]*2,
+            initial_delay=sink_delay)
+
+        run_sim(th)
+
+    run(3)
+
+    with pytest.raises(AssertionError, match="reused"):
+        run(30)
+
+#-------------------------------------------------------------------------
+# test_tagged_output_msgs
+#-------------------------------------------------------------------------
+
+def test_tagged_output_msgs():
+    accums = np.array([0x123, 0xfff, 0x800])
+    msgs = fc_output_msgs(200, accums, tagged=True)
+    assert msgs == [mk_tagged_output_msg(200, 0, 0x123, 0),
+                    mk_tagged_output_msg(200, 1, 0xfff, 0),
+                    mk_tagged_output_msg(200, 2, 0x800, 1)]
+
+    # Two tagged outputs per message
+
+    msgs = fc_output_msgs(3, accums, out_per_cycle=2, tagged=True)
+    assert len(msgs) == 2
+    assert msgs[1][0:32] == mk_tagged_output_msg(3, 2, 0x800, 1)
+    assert msgs[1][32:64] == 0
+
+    with pytest.raises(AssertionError):
+        FullyConnected_FL(tagged=True, packed=True).elaborate()
+
 if __name__ == "__main__":
     # Run directly (not using pytest)
     test_fully_connected_fl(test_case_table["small_fc"])
\ No newline at end of file
@@ -6,7 +6,8 @@ import pytest
 from pymtl3 import *
 from pymtl3.stdlib.test_utils import run_sim
 from mlp_xcel.mnist_fc_layer import FullyConnected
-from mlp_xcel.test.mnist_fc_layer_fl_test import TestHarness, test_case_table
+from mlp_xcel.test.mnist_fc_layer_fl_test import TestHarness, test_case_table, mk_packed_msgs
+from mlp_xcel.test.mnist_fc_layer_fl_test import mk_random_fc_msgs
 
 @pytest.mark.parametrize( **test_case_table )
 def test( test_params, cmdline_opts ):
@@ -22,6 +23,9 @@ def test( test_params, cmdline_opts ):
     else:
       input_msgs.append(msg)
 
+  if test_params.packed:
+    input_msgs = mk_packed_msgs( input_msgs, test_params.dut_params["output_channel"] )
+
   th.set_param("top.src.construct",
     msgs=input_msgs,
     initial_delay=test_params.src_delay+3,
@@ -35,3 +39,31 @@ def test( test_params, cmdline_opts ):
   run_sim( th, cmdline_opts, duts=['dut'] )
 
 
+
+#-------------------------------------------------------------------------
+# test_random
+#-------------------------------------------------------------------------
+# Random layers of other shapes. The compute phase takes a fixed number of
+# cycles, which covers up to three input channels. With one input channel
+# the first message after the previous batch's outputs completes the next
+# batch.
+
+@pytest.mark.parametrize( "batch_size, input_channel, output_channel, src_delay, sink_delay",
+  [ (4, 1, 2, 0, 0), (4, 1, 2, 3, 0), (2, 3, 2, 0, 4), (3, 2, 3, 2, 2), (2, 3, 4, 0, 0) ] )
+def test_random( batch_size, input_channel, output_channel, src_delay, sink_delay, cmdline_opts ):
+  msgs = mk_random_fc_msgs( batch_size, input_channel, output_channel,
+                            seed=input_channel )
+  dut = FullyConnected( batch_size, input_channel, output_channel )
+  th = TestHarness( dut )
+
+  th.set_param("top.src.construct",
+    msgs=[ msg for msg in msgs if msg[30:].uint() != 3 ],
+    initial_delay=src_delay+3,
+    interval_delay=src_delay )
+
+  th.set_param("top.sink.construct",
+    msgs=[ msg for msg in msgs if msg[30:].uint() == 3 ],
+    initial_delay=sink_delay+3,
+    interval_delay=sink_delay )
+
+  run_sim( th, cmdline_opts, duts=['dut'] )
@@ -0,0 +1,282 @@
+#=========================================================================
+# mnist_fc_layer_xcel_fl_test
+#=========================================================================
+
+import pytest
+import random
+
+import numpy as np
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import run_sim
+from pymtl3.stdlib.stream import StreamSourceFL, StreamSinkFL
+from pymtl3.stdlib.mem import MemoryFL, mk_mem_msg
+from pymtl3.stdlib.xcel import XcelMsgType, mk_xcel_msg
+
+from common.mem_staging import write_array, read_array, check_array
+
+from mlp_xcel.mnist_fc_layer_xcel_fl import FullyConnectedXcel_FL
+from mlp_xcel.fc_tiling import fc_tile_schedule, weight_reloads
+from mlp_xcel.test.mnist_fc_layer_fl_test import ref_fc_layer
+
+XcelReqMsg, XcelRespMsg = mk_xcel_msg(5, 32)
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+
+class TestHarness(Component):
+    def construct(s, xcel, nwords=4):
+        # Instantiate models
+        s.src = StreamSourceFL(XcelReqMsg)
+        s.sink = StreamSinkFL(XcelRespMsg)
+        s.xcel = xcel
+        s.mem = MemoryFL(1, mem_ifc_dtypes=[mk_mem_msg(8, 32, 32*nwords)])
+
+        # Connect
+        s.src.ostream //= s.xcel.xcel.reqstream
+        s.sink.istream //= s.xcel.xcel.respstream
+        s.mem.ifc[0] //= s.xcel.mem
+
+    def done(s):
+        return s.src.done() and s.sink.done()
+
+    def line_trace(s):
+        return s.src.line_trace() + " > " + s.xcel.line_trace() + " > " + \
+               s.sink.line_trace() + " | " + s.mem.line_trace()
+
+#-------------------------------------------------------------------------
+# Message creation helpers
+#-------------------------------------------------------------------------
+
+# Memory layout of the tests
+WEIGHT_BASE = 0x1000
+BIAS_BASE = 0x40000
+INPUT_BASE = 0x41000
+OUTPUT_BASE = 0x48000
+
+def xreq(type_, raddr, data):
+    if type_ == 'rd':
+        return XcelReqMsg(XcelMsgType.READ, raddr, data)
+    else:
+        return XcelReqMsg(XcelMsgType.WRITE, raddr, data)
+
+def xresp(type_, data):
+    if type_ == 'rd':
+        return XcelRespMsg(XcelMsgType.READ, data)
+    else:
+        return XcelRespMsg(XcelMsgType.WRITE, data)
+
+# Messages for one layer: the registers given as (xr, value) pairs, then
+# go and wait for done. Registers keep their values across layers, so a
+# later layer only has to write the registers which change.
+def gen_xcel_protocol_msgs(regs):
+    msgs = []
+    for xr, value in regs:
+        msgs += [xreq('wr', xr, value), xresp('wr', 0)]
+    return msgs + [
+        xreq('wr', 0, 0), xresp('wr', 0),
+        xreq('rd', 0, 0), xresp('rd', 1),
+    ]
+
+def layer_regs(input_channel, output_channel, batch_size,
+               input_base=INPUT_BASE, output_base=OUTPUT_BASE):
+    return [(1, WEIGHT_BASE), (2, BIAS_BASE), (3, input_base),
+            (4, output_base), (5, input_channel), (6, output_channel),
+            (7, batch_size)]
+
+# Random operands (including values with bits above the 12 the layer
+# keeps) and the expected outputs as the 32-bit words in memory
+def mk_random_layer(batch_size, input_channel, output_channel, seed=0):
+    rng = random.Random(seed)
+    weights = [[rng.randint(0, 0xffffffff) for _ in range(output_channel)]
+               for _ in range(input_channel)]
+    biases = [rng.randint(0, 0xffffffff) for _ in range(output_channel)]
+    inputs = [[rng.randint(0, 0xffff) for _ in range(input_channel)]
+              for _ in range(batch_size)]
+    outputs = np.array(ref_fc_layer(weights, biases, inputs), dtype=np.uint32)
+    outputs = np.where(outputs & 0x20000, outputs | 0xfffc0000, outputs)
+    return weights, biases, inputs, outputs
+
+#-------------------------------------------------------------------------
+# run_test
+#-------------------------------------------------------------------------
+# Runs the given layers (each a list of xcel register writes) against
+# the arrays staged in memory (a list of (addr, values) pairs) and returns
+# the harness so the caller can check the outputs.
+
+def layer_arrays(weights, biases, inputs):
+    return [(WEIGHT_BASE, weights), (BIAS_BASE, biases), (INPUT_BASE, inputs)]
+
+def run_test(cmdline_opts, layers, arrays, nwords=4, src_delay=0,
+             sink_delay=0, stall=0.0, lat=0, xcel_params={}):
+    msgs = []
+    for regs in layers:
+        msgs += gen_xcel_protocol_msgs(regs)
+
+    xcel = FullyConnectedXcel_FL(nwords=nwords, **xcel_params)
+    th = TestHarness(xcel, nwords=nwords)
+
+    th.set_param("top.src.construct", msgs=msgs[::2],
+        initial_delay=src_delay+3, interval_delay=src_delay)
+    th.set_param("top.sink.construct", msgs=msgs[1::2],
+        initial_delay=sink_delay+3, interval_delay=sink_delay)
+    th.set_param("top.mem.construct", stall_prob=stall, extra_latency=lat)
+
+    th.elaborate()
+
+    for addr, values in arrays:
+        write_array(th.mem, addr, np.array(values, dtype=np.uint32))
+
+    if cmdline_opts['max_cycles'] is None:
+        cmdline_opts['max_cycles'] = 20000
+
+    run_sim(th, cmdline_opts, duts=['xcel'])
+    return th
+
+#-------------------------------------------------------------------------
+# test_random_layer
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize("batch_size, input_channel, output_channel, nwords, src_delay, sink_delay, stall, lat",
+    [(2, 3, 2, 4, 0, 0, 0.0, 0), (3, 17, 9, 4, 0, 0, 0.0, 0),
+     (3, 17, 9, 1, 0, 0, 0.0, 0), (3, 17, 9, 8, 3, 5, 0.5, 3),
+     (10, 1, 1, 4, 0, 0, 0.0, 0), (1, 40, 20, 4, 0, 2, 0.2, 1)])
+def test_random_layer(cmdline_opts, batch_size, input_channel,
+                      output_channel, nwords, src_delay, sink_delay, stall,
+                      lat):
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel,
+                        seed=input_channel)
+
+    th = run_test(cmdline_opts,
+                  [layer_regs(input_channel, output_channel, batch_size)],
+                  layer_arrays(weights, biases, inputs), nwords, src_delay,
+                  sink_delay, stall, lat)
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+#-------------------------------------------------------------------------
+# test_multiple_batches
+#-------------------------------------------------------------------------
+# The weights stay in memory while we run the layer on one input vector
+# at a time, so every layer after the first only rewrites the input and
+# output bases.
+
+def test_multiple_batches(cmdline_opts):
+    batch_size, input_channel, output_channel = 4, 13, 6
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel, seed=1)
+
+    layers = [layer_regs(input_channel, output_channel, 1)]
+    for b in range(1, batch_size):
+        layers.append([(3, INPUT_BASE + 4*b*input_channel),
+                       (4, OUTPUT_BASE + 4*b*output_channel)])
+
+    th = run_test(cmdline_opts, layers, layer_arrays(weights, biases, inputs))
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+#-------------------------------------------------------------------------
+# test_burst_traffic
+#-------------------------------------------------------------------------
+# The operands and outputs move a line at a time: with 4-word lines a
+# 784x16 layer on 2 inputs takes about a quarter of the memory requests
+# of moving one word per request.
+
+def test_burst_traffic(cmdline_opts):
+    batch_size, input_channel, output_channel = 2, 784, 16
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel, seed=2)
+
+    th = run_test(cmdline_opts,
+                  [layer_regs(input_channel, output_channel, batch_size)],
+                  layer_arrays(weights, biases, inputs))
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+    nwords = input_channel*output_channel + output_channel + \
+             batch_size*(input_channel + output_channel)
+    assert th.xcel.burst.nreqs == nwords // 4
+
+#-------------------------------------------------------------------------
+# test_tiled
+#-------------------------------------------------------------------------
+# Layers which do not fit in the array, including tiles which do not
+# divide the layer evenly. Every tile of the schedule reloads weights
+# unless the whole layer is a single tile.
+
+@pytest.mark.parametrize("batch_size, input_channel, output_channel, tile_in, tile_out, tile_batch",
+    [(3, 17, 9, 4, 2, None), (3, 17, 9, 5, 4, 2), (5, 40, 20, 64, 16, 2),
+     (2, 3, 2, 1, 1, 1), (4, 13, 6, 13, 6, 1)])
+def test_tiled(cmdline_opts, batch_size, input_channel, output_channel,
+               tile_in, tile_out, tile_batch):
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel,
+                        seed=input_channel)
+
+    tile_params = {"tile_in": tile_in, "tile_out": tile_out,
+                   "tile_batch": tile_batch}
+    th = run_test(cmdline_opts,
+                  [layer_regs(input_channel, output_channel, batch_size)],
+                  layer_arrays(weights, biases, inputs), stall=0.2, lat=1,
+                  xcel_params=tile_params)
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+    schedule = fc_tile_schedule(input_channel, output_channel, batch_size,
+                                **tile_params)
+    assert len(th.xcel.schedule) == len(schedule)
+    assert th.xcel.weight_reloads == weight_reloads(schedule)
+
+#-------------------------------------------------------------------------
+# test_mnist_tiled
+#-------------------------------------------------------------------------
+# The three MNIST layers (784->128->64->10) run back to back on a 64x16
+# array, each layer reading the outputs of the previous one. Only the
+# low 12 bits of the sign-extended outputs are used as inputs, so we can
+# chain the reference the same way.
+
+def test_mnist_tiled(cmdline_opts):
+    batch_size = 2
+    channels = [784, 128, 64, 10]
+    rng = random.Random(3)
+
+    weight_bases = [0x1000, 0x70000, 0x80000]
+    bias_bases = [0x90000, 0x90400, 0x90800]
+    act_bases = [0xa0000, 0xa2000, 0xa3000, 0xa4000]
+
+    inputs = [[rng.randint(0, 0xfff) for _ in range(channels[0])]
+              for _ in range(batch_size)]
+    arrays = [(act_bases[0], inputs)]
+    layers = []
+    acts = inputs
+    for n in range(3):
+        ic, oc = channels[n], channels[n+1]
+        weights = [[rng.randint(0, 0xfff) for _ in range(oc)] for _ in range(ic)]
+        biases = [rng.randint(0, 0xfff) for _ in range(oc)]
+        arrays += [(weight_bases[n], weights), (bias_bases[n], biases)]
+        layers.append([(1, weight_bases[n]), (2, bias_bases[n]),
+                       (3, act_bases[n]), (4, act_bases[n+1]), (5, ic),
+                       (6, oc), (7, batch_size)])
+        acts = ref_fc_layer(weights, biases, acts)
+
+    outputs = np.array(acts, dtype=np.uint32)
+    outputs = np.where(outputs & 0x20000, outputs | 0xfffc0000, outputs)
+
+    if cmdline_opts['max_cycles'] is None:
+        cmdline_opts['max_cycles'] = 200000
+
+    th = run_test(cmdline_opts, layers, arrays,
+                  xcel_params={"tile_in": 64, "tile_out": 16})
+
+    result = read_array(th.mem, act_bases[3], batch_size*channels[3])
+    check_array(result, outputs.ravel())
+
+    # 13x8 + 2x4 + 1x1 weight tiles, each loaded once for the whole batch
+
+    assert th.xcel.weight_reloads == 13*8 + 2*4 + 1*1
@@ -0,0 +1,145 @@
+#=========================================================================
+# mnist_fc_layer_xcel_test
+#=========================================================================
+# The FC layer wrapped in the accelerator register interface, once with
+# FullyConnected_FL and once with the RTL FullyConnected. The layers are
+# staged in memory the same way as in mnist_fc_layer_xcel_fl_test and
+# must give the same outputs.
+
+import pytest
+
+import numpy as np
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import run_sim
+
+from common.mem_staging import write_array, read_array, check_array
+
+from mlp_xcel.mnist_fc_layer_fl import FullyConnected_FL
+from mlp_xcel.mnist_fc_layer import FullyConnected
+from mlp_xcel.mnist_fc_layer_xcel import FullyConnectedXcel
+from mlp_xcel.fc_tiling import fc_tile_schedule, weight_reloads
+from mlp_xcel.test.mnist_fc_layer_xcel_fl_test import TestHarness, \
+    gen_xcel_protocol_msgs, layer_regs, layer_arrays, mk_random_layer, \
+    INPUT_BASE, OUTPUT_BASE
+
+# The array of the RTL model (the parameters of mnist_fc_layer.v)
+ARRAY_SIZE = {"batch_size": 2, "input_channel": 3, "output_channel": 2}
+
+def mk_xcel(impl, nwords=4, array_size=ARRAY_SIZE):
+    if impl == "rtl":
+        return FullyConnectedXcel(FullyConnected(), nwords=nwords)
+    return FullyConnectedXcel(FullyConnected_FL(**array_size), nwords=nwords,
+                              **array_size)
+
+#-------------------------------------------------------------------------
+# run_test
+#-------------------------------------------------------------------------
+
+def run_test(cmdline_opts, xcel, layers, arrays, nwords=4, src_delay=0,
+             sink_delay=0, stall=0.0, lat=0):
+    msgs = []
+    for regs in layers:
+        msgs += gen_xcel_protocol_msgs(regs)
+
+    th = TestHarness(xcel, nwords=nwords)
+
+    th.set_param("top.src.construct", msgs=msgs[::2],
+        initial_delay=src_delay+3, interval_delay=src_delay)
+    th.set_param("top.sink.construct", msgs=msgs[1::2],
+        initial_delay=sink_delay+3, interval_delay=sink_delay)
+    th.set_param("top.mem.construct", stall_prob=stall, extra_latency=lat)
+
+    th.elaborate()
+
+    for addr, values in arrays:
+        write_array(th.mem, addr, np.array(values, dtype=np.uint32))
+
+    if cmdline_opts['max_cycles'] is None:
+        cmdline_opts['max_cycles'] = 50000
+
+    run_sim(th, cmdline_opts, duts=['xcel'])
+    return th
+
+#-------------------------------------------------------------------------
+# test_random_layer
+#-------------------------------------------------------------------------
+# A layer which fits in the array, then layers which have to be tiled
+# (including tiles which do not divide the layer evenly)
+
+@pytest.mark.parametrize("impl", ["fl", "rtl"])
+@pytest.mark.parametrize("batch_size, input_channel, output_channel, nwords, src_delay, sink_delay, stall, lat",
+    [(2, 3, 2, 4, 0, 0, 0.0, 0), (3, 7, 5, 4, 0, 0, 0.0, 0),
+     (3, 17, 9, 1, 3, 5, 0.5, 3), (5, 1, 1, 4, 0, 0, 0.0, 0),
+     (1, 40, 20, 8, 0, 2, 0.2, 1)])
+def test_random_layer(cmdline_opts, impl, batch_size, input_channel,
+                      output_channel, nwords, src_delay, sink_delay, stall,
+                      lat):
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel,
+                        seed=input_channel)
+
+    xcel = mk_xcel(impl, nwords)
+    th = run_test(cmdline_opts, xcel,
+                  [layer_regs(input_channel, output_channel, batch_size)],
+                  layer_arrays(weights, biases, inputs), nwords, src_delay,
+                  sink_delay, stall, lat)
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+    schedule = fc_tile_schedule(input_channel, output_channel, batch_size,
+                                ARRAY_SIZE["input_channel"],
+                                ARRAY_SIZE["output_channel"])
+    assert th.xcel.weight_reloads == weight_reloads(schedule)
+
+#-------------------------------------------------------------------------
+# test_multiple_batches
+#-------------------------------------------------------------------------
+# One input vector per job: the array keeps its weights, biases and slot
+# between jobs.
+
+@pytest.mark.parametrize("impl", ["fl", "rtl"])
+def test_multiple_batches(cmdline_opts, impl):
+    batch_size, input_channel, output_channel = 5, 3, 2
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel, seed=1)
+
+    layers = [layer_regs(input_channel, output_channel, 1)]
+    for b in range(1, batch_size):
+        layers.append([(3, INPUT_BASE + 4*b*input_channel),
+                       (4, OUTPUT_BASE + 4*b*output_channel)])
+
+    th = run_test(cmdline_opts, mk_xcel(impl), layers,
+                  layer_arrays(weights, biases, inputs))
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+#-------------------------------------------------------------------------
+# test_array_size
+#-------------------------------------------------------------------------
+# FullyConnected_FL can be configured with a larger array, which needs
+# fewer weight tiles for the same layer
+
+@pytest.mark.parametrize("array_size",
+    [{"batch_size": 1, "input_channel": 8, "output_channel": 4},
+     {"batch_size": 4, "input_channel": 16, "output_channel": 16},
+     {"batch_size": 2, "input_channel": 64, "output_channel": 32}])
+def test_array_size(cmdline_opts, array_size):
+    batch_size, input_channel, output_channel = 3, 40, 20
+    weights, biases, inputs, outputs = \
+        mk_random_layer(batch_size, input_channel, output_channel, seed=2)
+
+    xcel = mk_xcel("fl", array_size=array_size)
+    th = run_test(cmdline_opts, xcel,
+                  [layer_regs(input_channel, output_channel, batch_size)],
+                  layer_arrays(weights, biases, inputs))
+
+    result = read_array(th.mem, OUTPUT_BASE, batch_size*output_channel)
+    check_array(result, outputs.ravel())
+
+    schedule = fc_tile_schedule(input_channel, output_channel, batch_size,
+                                array_size["input_channel"],
+                                array_size["output_channel"])
+    assert th.xcel.weight_reloads == weight_reloads(schedule)
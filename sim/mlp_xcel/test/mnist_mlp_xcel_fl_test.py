@@ -0,0 +1,240 @@
+#=========================================================================
+# mnist_mlp_xcel_fl_test
+#=========================================================================
+
+import pytest
+import random
+
+import numpy as np
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import run_sim
+from pymtl3.stdlib.stream import StreamSourceFL, StreamSinkFL
+from pymtl3.stdlib.mem import MemoryFL, mk_mem_msg
+from pymtl3.stdlib.xcel import XcelMsgType, mk_xcel_msg
+
+from common.mem_staging import write_array, read_array, check_array
+
+from mlp_xcel.mnist_mlp_xcel_fl import MLPXcel_FL, MLPMode, mlp_inference
+
+XcelReqMsg, XcelRespMsg = mk_xcel_msg(5, 32)
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+
+class TestHarness(Component):
+    def construct(s, xcel, nwords=4):
+        # Instantiate models
+        s.src = StreamSourceFL(XcelReqMsg)
+        s.sink = StreamSinkFL(XcelRespMsg)
+        s.xcel = xcel
+        s.mem = MemoryFL(1, mem_ifc_dtypes=[mk_mem_msg(8, 32, 32*nwords)])
+
+        # Connect
+        s.src.ostream //= s.xcel.xcel.reqstream
+        s.sink.istream //= s.xcel.xcel.respstream
+        s.mem.ifc[0] //= s.xcel.mem
+
+    def done(s):
+        return s.src.done() and s.sink.done()
+
+    def line_trace(s):
+        return s.src.line_trace() + " > " + s.xcel.line_trace() + " > " + \
+               s.sink.line_trace() + " | " + s.mem.line_trace()
+
+#-------------------------------------------------------------------------
+# Reference
+#-------------------------------------------------------------------------
+# mnist_inference from app/ubmark/ubmark-mlp.c one element at a time
+
+def to_fixed(x):
+    return int(x*128 + (0.5 if x >= 0 else -0.5))
+
+def wrap32(x):
+    return (x + 0x80000000) % 0x100000000 - 0x80000000
+
+def ref_mnist_inference(inputs, layers, argmax=False):
+    outputs = []
+    for acts in inputs:
+        for n, (weights, biases) in enumerate(layers):
+            row = []
+            for j in range(len(biases)):
+                accum = biases[j]
+                for i in range(len(acts)):
+                    accum = wrap32(accum + ((wrap32(acts[i]*weights[i][j]) + 64) >> 7))
+                row.append(max(accum, 0) if n < len(layers)-1 else accum)
+            acts = row
+        outputs.append([acts.index(max(acts))] if argmax else acts)
+    return outputs
+
+#-------------------------------------------------------------------------
+# Message creation helpers
+#-------------------------------------------------------------------------
+
+# Memory layout of the tests
+INPUT_BASE = 0x1000
+PARAM_BASE = 0x10000
+OUTPUT_BASE = 0x80000
+
+def xreq(type_, raddr, data):
+    if type_ == 'rd':
+        return XcelReqMsg(XcelMsgType.READ, raddr, data)
+    else:
+        return XcelReqMsg(XcelMsgType.WRITE, raddr, data)
+
+def xresp(type_, data):
+    if type_ == 'rd':
+        return XcelRespMsg(XcelMsgType.READ, data)
+    else:
+        return XcelRespMsg(XcelMsgType.WRITE, data)
+
+# Messages for one job: the registers given as (xr, value) pairs, then go
+# and wait for done
+def gen_xcel_protocol_msgs(regs):
+    msgs = []
+    for xr, value in regs:
+        msgs += [xreq('wr', xr, value), xresp('wr', 0)]
+    return msgs + [
+        xreq('wr', 0, 0), xresp('wr', 0),
+        xreq('rd', 0, 0), xresp('rd', 1),
+    ]
+
+# Stages the weights and biases of each layer one after the other from
+# PARAM_BASE and returns the arrays to write to memory with the register
+# writes for a job on all of the inputs
+def mk_job(inputs, layers, mode=0):
+    arrays = [(INPUT_BASE, inputs)]
+    regs = [(1, INPUT_BASE)]
+    addr = PARAM_BASE
+    for n, (weights, biases) in enumerate(layers):
+        arrays += [(addr, weights), (addr + 4*np.size(weights), biases)]
+        regs += [(2+2*n, addr), (3+2*n, addr + 4*np.size(weights))]
+        addr += 4*(np.size(weights) + len(biases))
+    sizes = [len(layers[0][0])] + [len(biases) for _, biases in layers]
+    regs += [(8, OUTPUT_BASE), (9, len(inputs))]
+    regs += [(10+n, size) for n, size in enumerate(sizes)]
+    return arrays, regs + [(14, mode)]
+
+def mk_random_network(batch_size, sizes, seed=0):
+    rng = random.Random(seed)
+    inputs = [[rng.randint(-1024, 1023) for _ in range(sizes[0])]
+              for _ in range(batch_size)]
+    layers = []
+    for ic, oc in zip(sizes, sizes[1:]):
+        weights = [[rng.randint(-256, 255) for _ in range(oc)] for _ in range(ic)]
+        biases = [rng.randint(-256, 255) for _ in range(oc)]
+        layers.append((weights, biases))
+    return inputs, layers
+
+#-------------------------------------------------------------------------
+# run_test
+#-------------------------------------------------------------------------
+# Runs the jobs (each a list of xcel register writes) against the arrays
+# staged in memory (a list of (addr, values) pairs) and returns the
+# harness so the caller can check the outputs.
+
+def run_test(cmdline_opts, jobs, arrays, nwords=4, src_delay=0,
+             sink_delay=0, stall=0.0, lat=0):
+    msgs = []
+    for regs in jobs:
+        msgs += gen_xcel_protocol_msgs(regs)
+
+    th = TestHarness(MLPXcel_FL(nwords=nwords), nwords=nwords)
+
+    th.set_param("top.src.construct", msgs=msgs[::2],
+        initial_delay=src_delay+3, interval_delay=src_delay)
+    th.set_param("top.sink.construct", msgs=msgs[1::2],
+        initial_delay=sink_delay+3, interval_delay=sink_delay)
+    th.set_param("top.mem.construct", stall_prob=stall, extra_latency=lat)
+
+    th.elaborate()
+
+    for addr, values in arrays:
+        write_array(th.mem, addr, np.array(values, dtype=np.int32))
+
+    if cmdline_opts['max_cycles'] is None:
+        cmdline_opts['max_cycles'] = 20000
+
+    run_sim(th, cmdline_opts, duts=['xcel'])
+    return th
+
+def check_outputs(th, ref, addr=OUTPUT_BASE):
+    ref = np.array(ref, dtype=np.int32).ravel()
+    check_array(read_array(th.mem, addr, len(ref), np.int32), ref)
+
+#-------------------------------------------------------------------------
+# test_small
+#-------------------------------------------------------------------------
+# The test case of ubmark-mlp-test and the data set of ubmark-mlp-eval
+
+def test_small(cmdline_opts):
+    inputs = [[to_fixed(x) for x in [0.5, -0.3, 0.7, 0.1]]]
+    layers = [
+        ([[to_fixed(x) for x in row] for row in
+          [[0.1, 0.2, 0.3], [-0.1, 0.1, 0.2], [0.3, 0.1, 0.2], [0.2, 0.3, 0.1]]],
+         [to_fixed(0.1)]*3),
+        ([[to_fixed(x) for x in row] for row in [[0.1, 0.2], [0.3, 0.1], [0.2, 0.3]]],
+         [to_fixed(0.1), to_fixed(0.2)]),
+        ([[to_fixed(x) for x in row] for row in [[0.1, 0.2], [0.3, 0.1]]],
+         [to_fixed(0.1), to_fixed(0.1)]),
+    ]
+    ref = ref_mnist_inference(inputs, layers)
+    assert abs(ref[0][0] - to_fixed(0.2523)) < 3
+    assert abs(ref[0][1] - to_fixed(0.1991)) < 3
+
+    arrays, regs = mk_job(inputs, layers)
+    th = run_test(cmdline_opts, [regs], arrays)
+    check_outputs(th, ref)
+
+def test_eval(cmdline_opts):
+    inputs = [[12, 30, 5, 105]]
+    layers = [
+        ([[11, 50], [-25, -6], [13, -45], [5, 24]], [18, 11]),
+        ([[-48, 11], [-16, 10]], [5, -34]),
+        ([[-46, -30], [-31, 27]], [29, -13]),
+    ]
+    arrays, regs = mk_job(inputs, layers)
+    th = run_test(cmdline_opts, [regs], arrays)
+    check_outputs(th, [29, -13])
+
+#-------------------------------------------------------------------------
+# test_random
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize("batch_size, sizes, mode, nwords, src_delay, sink_delay, stall, lat",
+    [(1, [4, 3, 2, 2], 0, 4, 0, 0, 0.0, 0),
+     (3, [17, 9, 5, 4], 0, 4, 0, 0, 0.0, 0),
+     (3, [17, 9, 5, 4], MLPMode.ARGMAX, 4, 0, 0, 0.0, 0),
+     (4, [30, 16, 8, 10], 0, 1, 3, 5, 0.5, 3),
+     (4, [30, 16, 8, 10], MLPMode.ARGMAX, 8, 0, 2, 0.2, 1)])
+def test_random(cmdline_opts, batch_size, sizes, mode, nwords, src_delay,
+                sink_delay, stall, lat):
+    inputs, layers = mk_random_network(batch_size, sizes, seed=sizes[0])
+    argmax = bool(mode & MLPMode.ARGMAX)
+    ref = ref_mnist_inference(inputs, layers, argmax)
+    check_array(mlp_inference(inputs, layers, argmax).ravel(), np.ravel(ref))
+
+    arrays, regs = mk_job(inputs, layers, mode)
+    th = run_test(cmdline_opts, [regs], arrays, nwords, src_delay,
+                  sink_delay, stall, lat)
+    check_outputs(th, ref)
+
+#-------------------------------------------------------------------------
+# test_multiple_jobs
+#-------------------------------------------------------------------------
+# The registers keep their values, so after the first job we only move
+# the input and output bases to classify one input vector per job.
+
+def test_multiple_jobs(cmdline_opts):
+    batch_size, sizes = 4, [20, 8, 6, 10]
+    inputs, layers = mk_random_network(batch_size, sizes, seed=1)
+
+    arrays, regs = mk_job(inputs[:1], layers, MLPMode.ARGMAX)
+    jobs = [regs]
+    for b in range(1, batch_size):
+        jobs.append([(1, INPUT_BASE + 4*b*sizes[0]), (8, OUTPUT_BASE + 4*b)])
+    arrays[0] = (INPUT_BASE, inputs)
+
+    th = run_test(cmdline_opts, jobs, arrays)
+    check_outputs(th, ref_mnist_inference(inputs, layers, argmax=True))
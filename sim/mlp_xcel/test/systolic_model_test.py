@@ -0,0 +1,163 @@
+#=========================================================================
+# systolic_model_test
+#=========================================================================
+
+import math
+
+import pytest
+
+import numpy as np
+
+from common.fixed_point import FixedPoint, fc_datapath, c_fixed_mult
+
+from mlp_xcel.fc_tiling import fc_tile_schedule, weight_reloads
+from mlp_xcel.systolic_model import SystolicArrayModel
+
+def mk_random_layer(batch_size, input_channel, output_channel, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.integers(-128, 128, size=(batch_size, input_channel)),
+            rng.integers(-128, 128, size=(input_channel, output_channel)),
+            rng.integers(-128, 128, size=output_channel))
+
+#-------------------------------------------------------------------------
+# test_outputs
+#-------------------------------------------------------------------------
+# The values going through the PEs give exactly the layer, whether it
+# fits in the array or has to be tiled, and however the streams limit
+# the array. Saturating sums only match if every column accumulates in
+# input channel order.
+
+@pytest.mark.parametrize("batch_size, input_channel, output_channel",
+    [(1, 3, 2), (5, 4, 4), (3, 17, 9), (7, 40, 20), (2, 1, 1)])
+@pytest.mark.parametrize("rows, cols, params",
+    [(4, 4, {}), (3, 2, {"acc_depth": 2}),
+     (8, 3, {"in_bw": 1, "weight_bw": 1, "out_bw": 1, "acc_depth": 1}),
+     (5, 6, {"in_buffer": 1, "out_buffer": 1})])
+@pytest.mark.parametrize("arith", [fc_datapath, c_fixed_mult,
+    FixedPoint(frac_bits=7, overflow="saturate", acc_bits=12)])
+def test_outputs(batch_size, input_channel, output_channel, rows, cols,
+                 params, arith):
+    inputs, weights, biases = \
+        mk_random_layer(batch_size, input_channel, output_channel,
+                        seed=input_channel)
+
+    model = SystolicArrayModel(rows, cols, arith=arith, **params)
+    est   = model.run(inputs, weights, biases)
+
+    assert np.array_equal(est.outputs, arith.matmul(inputs, weights, biases))
+
+#-------------------------------------------------------------------------
+# test_fill_drain
+#-------------------------------------------------------------------------
+# A layer which fits loads its weights and biases (rows+1 cycles), then
+# starts one vector per cycle, and its last sums leave the array
+# batch + rows + cols - 1 cycles after the first vector started and the
+# output stream one cycle later.
+
+@pytest.mark.parametrize("rows, cols, batch_size",
+    [(4, 4, 10), (1, 1, 1), (8, 2, 3), (2, 16, 50)])
+def test_fill_drain(rows, cols, batch_size):
+    est = SystolicArrayModel(rows, cols).estimate(rows, cols, batch_size)
+
+    assert est.load_cycles == rows + 1
+    assert est.cycles == rows + 1 + batch_size + rows + cols
+    assert est.drain_cycles == rows + cols
+    assert (est.stall_cycles, est.starve_cycles) == (0, 0)
+
+    assert est.macs == batch_size * rows * cols
+    assert est.utilization == est.macs / (rows * cols * est.cycles)
+
+    # Longer batches amortize the fill and drain
+
+    longer = SystolicArrayModel(rows, cols).estimate(rows, cols, 10*batch_size)
+    assert longer.utilization > est.utilization
+
+#-------------------------------------------------------------------------
+# test_tiled
+#-------------------------------------------------------------------------
+# Each weight tile is loaded as often as fc_tile_schedule says, and only
+# the used part of each tile goes over the streams.
+
+@pytest.mark.parametrize("rows, cols, acc_depth",
+    [(4, 4, None), (16, 8, None), (16, 8, 3), (64, 64, 1)])
+def test_tiled(rows, cols, acc_depth):
+    input_channel, output_channel, batch_size = 40, 20, 7
+
+    model = SystolicArrayModel(rows, cols, acc_depth=acc_depth)
+    est   = model.estimate(input_channel, output_channel, batch_size)
+
+    schedule = fc_tile_schedule(input_channel, output_channel, batch_size,
+                                rows, cols, acc_depth)
+    assert est.weight_reloads == weight_reloads(schedule)
+
+    nout_tiles = math.ceil(output_channel / cols)
+    ngroups    = math.ceil(batch_size / (acc_depth or batch_size))
+    if len(schedule) > ngroups:
+        nloads = ngroups
+    else:
+        nloads = 1
+
+    assert est.weight_words == nloads * (input_channel*output_channel
+                                         + output_channel)
+    assert est.in_words  == batch_size * input_channel * nout_tiles
+    assert est.out_words == batch_size * output_channel
+    assert est.macs      == batch_size * input_channel * output_channel
+
+    # Every weight load waits for the array to drain
+
+    assert est.drain_cycles >= est.weight_reloads * (rows + cols - 1)
+
+#-------------------------------------------------------------------------
+# test_stream_limits
+#-------------------------------------------------------------------------
+
+def test_stream_limits():
+    rows, cols, batch_size = 8, 8, 64
+
+    full = SystolicArrayModel(rows, cols).estimate(rows, cols, batch_size)
+
+    # With one input word per cycle a vector can only start every rows
+    # cycles, so row 0 gets bubbles (except for the two vectors which fit
+    # in the input buffer while the weights are loaded)
+
+    est = SystolicArrayModel(rows, cols, in_bw=1).estimate(rows, cols, batch_size)
+    assert est.cycles >= batch_size * rows
+    assert est.starve_cycles >= (batch_size - 2) * (rows - 1)
+    assert est.in_demand <= 1
+    assert est.utilization < full.utilization
+
+    # With one output word per cycle the output buffer fills up and the
+    # array freezes
+
+    est = SystolicArrayModel(rows, cols, out_bw=1).estimate(rows, cols, batch_size)
+    assert est.cycles >= batch_size * cols
+    assert est.stall_cycles > 0
+    assert est.out_demand <= 1
+
+    # Weights only go through the weight stream while the array is idle
+
+    est = SystolicArrayModel(rows, cols, weight_bw=1).estimate(rows, cols, batch_size)
+    assert est.load_cycles == (rows + 1) * cols
+    assert est.cycles == full.cycles - full.load_cycles + est.load_cycles
+
+#-------------------------------------------------------------------------
+# test_array_sizes
+#-------------------------------------------------------------------------
+# On the first MNIST layer larger arrays need fewer weight tiles and
+# fewer cycles, while the utilization always stays below one.
+
+def test_array_sizes():
+    cycles = []
+    for size in [8, 16, 32, 64]:
+        est = SystolicArrayModel(size, size).estimate(784, 128, 8)
+        assert 0 < est.utilization <= 1
+        assert est.weight_reloads == math.ceil(784/size) * math.ceil(128/size)
+        cycles.append(est.cycles)
+    assert cycles == sorted(cycles, reverse=True)
+
+def test_empty():
+    est = SystolicArrayModel(4, 4).estimate(0, 4, 4)
+    assert (est.cycles, est.utilization, est.in_demand) == (0, 0.0, 0.0)
+
+    with pytest.raises(ValueError):
+        SystolicArrayModel(0, 4)
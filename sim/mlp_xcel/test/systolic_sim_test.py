@@ -0,0 +1,44 @@
+#=========================================================================
+# systolic_sim_test
+#=========================================================================
+# Make sure that systolic-sim works.
+
+import pytest
+import os
+
+from subprocess import check_call, CalledProcessError
+
+def run_sim(args):
+
+    # Get path to simulator script
+
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    sim_dir  = os.path.dirname(test_dir)
+    sim      = sim_dir + os.path.sep + 'systolic-sim'
+
+    cmd = [sim] + args
+
+    # Display simulator command line
+
+    print("")
+    print("Simulator command line:", ' '.join(cmd))
+
+    # Run the simulator
+
+    try:
+        check_call(cmd)
+    except CalledProcessError as e:
+        raise Exception("Error running simulator!")
+
+@pytest.mark.parametrize("args",
+    [["--layer", "40,20,5", "--array", "8x4"],
+     ["--layer", "40,20,5", "--array", "8x4", "--in-bw", "1", "--out-bw", "1",
+      "--weight-bw", "2", "--acc-depth", "2"],
+     ["--layer", "16,8,3", "--array", "4x4", "--arith", "fixed-mult",
+      "--trace"]])
+def test(args):
+    run_sim(args)
+
+def test_sweep():
+    run_sim(["--layer", "64,32,4", "--sweep", "--sweep-arrays",
+             "4x4,16x16,8x32", "--jobs", "2"])
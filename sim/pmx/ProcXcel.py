@@ -1,7 +1,8 @@
 #=========================================================================
 # ProcXcel
 #=========================================================================
-# No caches, just processor + accelerator
+# No caches, just processor + accelerator. The accelerator memory port
+# is xmem_nbits wide so accelerators can use burst transactions.
 
 from pymtl3 import *
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
@@ -10,9 +11,10 @@ from pymtl3.stdlib.mem         import mk_mem_msg
 
 class ProcXcel( Component ):
 
-  def construct( s, ProcType, XcelType ):
+  def construct( s, ProcType, XcelType, xmem_nbits=32 ):
 
     CacheReqMsg, CacheRespMsg = mk_mem_msg( 8, 32, 32 )
+    XmemReqMsg,  XmemRespMsg  = mk_mem_msg( 8, 32, xmem_nbits )
 
     # interface to outside ProcMemXcel
 
@@ -39,7 +41,7 @@ class ProcXcel( Component ):
 
     s.imem = MemRequesterIfc( CacheReqMsg, CacheRespMsg )
     s.dmem = MemRequesterIfc( CacheReqMsg, CacheRespMsg )
-    s.xmem = MemRequesterIfc( CacheReqMsg, CacheRespMsg )
+    s.xmem = MemRequesterIfc( XmemReqMsg,  XmemRespMsg  )
 
     s.imem //= s.proc.imem
     s.dmem //= s.proc.dmem
@@ -35,7 +35,7 @@ class RegisterFile(object):
 
 class ProcFL( Component ):
 
-  def construct( s, num_cores=1 ):
+  def construct( s, num_cores=1, mul_trace=None ):
 
     # Interface
 
@@ -79,6 +79,11 @@ class ProcFL( Component ):
     s.R = RegisterFile(32)
     s.raw_inst = None
 
+    # Optional trace of mul operands (e.g., a MulTraceWriter), which gets
+    # the operands of every mul executed while stats are enabled
+
+    s.mul_trace = mul_trace
+
     # We need to save the old PC for line tracing purposes, so that when
     # we do the line trace we are displaying the PC of the current
     # instruction and not the new PC
@@ -133,6 +138,8 @@ class ProcFL( Component ):
           s.R[inst.rd] = s.R[inst.rs1] & s.R[inst.rs2]
           s.PC += 4
         elif inst_name == "mul":
+          if s.mul_trace is not None and s.stats_en:
+            s.mul_trace.append( s.R[inst.rs1], s.R[inst.rs2] )
           s.R[inst.rd] = s.R[inst.rs1] * s.R[inst.rs2]
           s.PC += 4
 
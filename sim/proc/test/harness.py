@@ -51,15 +51,16 @@ class TestHarness(Component):
   # constructor
   #-----------------------------------------------------------------------
 
-  def construct( s, ProcType ):
+  def construct( s, ProcType, XcelType=NullXcelFL, xmem_nbits=32 ):
 
     s.commit_inst = OutPort()
 
     s.src  = StreamSourceFL( Bits32, [] )
     s.sink = StreamSinkFL( Bits32, [] )
     s.proc = ProcType()
-    s.xcel = NullXcelFL()
-    s.mem  = MemoryFL(3, mem_ifc_dtypes=3*[mk_mem_msg(8,32,32)] )
+    s.xcel = XcelType()
+    s.mem  = MemoryFL(3, mem_ifc_dtypes=2*[mk_mem_msg(8,32,32)] +
+                                        [mk_mem_msg(8,32,xmem_nbits)] )
 
     s.proc.commit_inst //= s.commit_inst
 
@@ -139,11 +140,16 @@ class TestHarness(Component):
 # run_test
 #=========================================================================
 
-def run_test( ProcModel, gen_test, delays=False, cmdline_opts=None ):
+# By default the processor is connected to the null accelerator. Tests
+# of other accelerators can pass their FL model and the width of its
+# memory port instead.
+
+def run_test( ProcModel, gen_test, delays=False, cmdline_opts=None,
+              XcelType=NullXcelFL, xmem_nbits=32 ):
 
   # Instantiate model
 
-  model = TestHarness( ProcModel )
+  model = TestHarness( ProcModel, XcelType, xmem_nbits )
 
   # Set parameters
 